@@ -0,0 +1,247 @@
+"""
+Бенчмарк дерева комментариев поста
+
+Создает пост с --comments комментариями: --roots верхнего уровня,
+остальные - ответы, родитель выбирается пропорционально числу его
+ответов (популярные ветки растут быстрее), глубина до --max-depth.
+Сравнивает задержку первой страницы дерева через сервис (запрос, сборка,
+JSON) для сортировок new/top и разной глубины:
+* материализованный путь - один запрос по диапазонам индекса (post_id, path);
+* WITH RECURSIVE по parent_id (с индексом по parent_id) - прежний способ
+  хранения списка смежности.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.comments --comments 50000
+"""
+
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.comments.models import PATH_WIDTH
+from api.comments.repository import CommentsRepository, COMMENT_FIELDS
+from api.comments.service import CommentsService
+from core import settings, db_helper
+from schemas import PaginationSchema
+from utils.serialization import dump_search_response
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+RECURSIVE_TREE = """
+WITH RECURSIVE roots AS (
+    SELECT id FROM comments
+    WHERE post_id = :post_id AND parent_id IS NULL
+    ORDER BY {key} LIMIT :roots
+), tree AS (
+    SELECT c.* FROM comments c JOIN roots r ON c.id = r.id
+    UNION ALL
+    SELECT c.* FROM comments c JOIN tree t ON c.parent_id = t.id
+    WHERE c.depth < :depth
+)
+SELECT u.id AS author_id, u.username, u.email, {fields}
+FROM tree c JOIN users u ON u.id = c.user_id
+ORDER BY c.depth, {key}
+LIMIT :limit
+"""
+SORT_KEYS = {"new": "created_at DESC, id DESC", "top": "score DESC, id DESC"}
+
+
+def generate_comments(args: argparse.Namespace) -> list[tuple]:
+    """Строки комментариев: id, user_id, parent_id, path, depth, score, created_at"""
+    rnd = random.Random(args.seed)
+    started = datetime.now(timezone.utc) - timedelta(days=1)
+    rows = []
+    paths, depths = {}, {}
+    # Каждый комментарий попадает в пул один раз и еще раз за каждый ответ
+    pool = []
+    for comment_id in range(1, args.comments + 1):
+        parent_id = rnd.choice(pool) if comment_id > args.roots else None
+        # Ответ на самый глубокий комментарий становится новым корнем
+        if parent_id is not None and depths[parent_id] + 1 >= args.max_depth:
+            parent_id = None
+
+        own = str(comment_id).zfill(PATH_WIDTH)
+        if parent_id is None:
+            paths[comment_id], depths[comment_id] = own, 0
+        else:
+            paths[comment_id] = paths[parent_id] + own
+            depths[comment_id] = depths[parent_id] + 1
+            pool.append(parent_id)
+        pool.append(comment_id)
+
+        rows.append(
+            (
+                comment_id,
+                rnd.randint(1, args.users),
+                parent_id,
+                paths[comment_id],
+                depths[comment_id],
+                int(rnd.paretovariate(1.2)) - 1,
+                started + timedelta(seconds=comment_id),
+            )
+        )
+    return rows
+
+
+async def seed(args: argparse.Namespace) -> int:
+    async with get_session() as session:
+        await seed_users(session, args.users)
+        post_id = await session.scalar(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) VALUES (1, 'discussed post', 'text', now(), now()) "
+                "RETURNING id"
+            )
+        )
+        columns = list(zip(*generate_comments(args)))
+        await session.execute(
+            text(
+                "INSERT INTO comments (id, post_id, user_id, parent_id, path, depth, "
+                "body, score, replies_count, created_at, updated_at) "
+                "SELECT id, :post_id, user_id, parent_id, path, depth, "
+                "'comment ' || id, score, 0, created_at, created_at "
+                "FROM unnest(CAST(:ids AS int[]), CAST(:users AS int[]), "
+                "CAST(:parents AS int[]), CAST(:paths AS text[]), "
+                "CAST(:depths AS int[]), CAST(:scores AS int[]), "
+                "CAST(:created AS timestamptz[])) "
+                "AS t(id, user_id, parent_id, path, depth, score, created_at)"
+            ),
+            {
+                "post_id": post_id,
+                "ids": columns[0],
+                "users": columns[1],
+                "parents": columns[2],
+                "paths": columns[3],
+                "depths": columns[4],
+                "scores": columns[5],
+                "created": columns[6],
+            },
+        )
+        await session.execute(
+            text(
+                "UPDATE comments c SET replies_count = r.count FROM ("
+                "SELECT parent_id, count(*) FROM comments "
+                "WHERE parent_id IS NOT NULL GROUP BY parent_id) r "
+                "WHERE c.id = r.parent_id"
+            )
+        )
+        await session.execute(
+            text("SELECT setval('comments_id_seq', (SELECT max(id) FROM comments))")
+        )
+        # Индекс, без которого рекурсивный обход читал бы всю таблицу
+        await session.execute(
+            text("CREATE INDEX ix_comments_parent_id ON comments (parent_id)")
+        )
+        await session.commit()
+        await analyze(session)
+    return post_id
+
+
+async def recursive_tree_json(
+    session: AsyncSession,
+    post_id: int,
+    pagination: PaginationSchema,
+    sort: str,
+    depth: int,
+) -> bytes:
+    query = text(
+        RECURSIVE_TREE.format(
+            key=SORT_KEYS[sort],
+            fields=", ".join(f"c.{name}" for name in COMMENT_FIELDS),
+        )
+    )
+    res = await session.execute(
+        query,
+        {
+            "post_id": post_id,
+            "roots": pagination.limit,
+            "depth": depth,
+            "limit": pagination.limit + settings.comments.max_replies,
+        },
+    )
+    rows = []
+    for row in res.mappings():
+        comment = {name: row[name] for name in COMMENT_FIELDS}
+        comment["author"] = {
+            "id": row["author_id"],
+            "username": row["username"],
+            "email": row["email"],
+        }
+        rows.append(comment)
+    roots = CommentsService._build_tree(rows)
+    return dump_search_response(roots, pagination, len(roots), None)
+
+
+async def main(args: argparse.Namespace) -> None:
+    await reset_database()
+    post_id = await seed(args)
+    pagination = PaginationSchema(limit=args.limit)
+
+    async with get_session() as session:
+        service = CommentsService(CommentsRepository(session))
+        stats = await session.execute(
+            text(
+                "SELECT count(*) FILTER (WHERE parent_id IS NULL), max(depth), "
+                "max(replies_count) FROM comments"
+            )
+        )
+        roots, max_depth, max_replies = stats.one()
+        print(
+            f"Комментариев: {args.comments}, верхнего уровня: {roots}, "
+            f"наибольшая глубина: {max_depth}, больше всего ответов: {max_replies}"
+        )
+
+        rows = []
+        for sort in ("new", "top"):
+            for depth in args.depths:
+                cases = {
+                    "path range": lambda: service.get_comment_tree_json(
+                        post_id, pagination, sort=sort, depth=depth
+                    ),
+                    "WITH RECURSIVE": lambda: recursive_tree_json(
+                        session, post_id, pagination, sort=sort, depth=depth
+                    ),
+                }
+                for name, load in cases.items():
+                    timings = await measure(load, repeat=args.repeat)
+                    rows.append(
+                        [
+                            sort,
+                            depth,
+                            name,
+                            timings["p50"],
+                            timings["p95"],
+                            timings["mean"],
+                        ]
+                    )
+
+    print(f"Загрузок на вариант: {args.repeat}, корней на странице: {args.limit}")
+    print_table(
+        ["sort", "depth", "query", "p50 ms", "p95 ms", "mean ms"],
+        rows,
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--comments", type=int, default=50_000)
+    parser.add_argument("--roots", type=int, default=2000)
+    parser.add_argument("--max-depth", type=int, default=15)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 10])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
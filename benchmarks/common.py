@@ -0,0 +1,91 @@
+"""
+Общие помощники бенчмарков
+
+Бенчмарки пересоздают схему, поэтому запускаются только на тестовой базе
+(как и тесты): RUN__MODE=TEST и имя базы с суффиксом _test/_pytest
+"""
+
+import asyncio
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, AsyncIterator
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import settings, db_helper
+
+
+def check_test_database() -> None:
+    assert settings.run.mode == "TEST"
+    assert "_pytest" in settings.db.name or "_test" in settings.db.name
+
+
+async def reset_database() -> None:
+    """Пересоздает схему базы миграциями"""
+    check_test_database()
+    alembic_cfg = Config(settings.files.alembic_ini)
+    alembic_cfg.set_main_option("script_location", str(settings.files.alembic_dir))
+    alembic_cfg.set_main_option("sqlalchemy.url", str(settings.db.POSTGRES_DSN))
+
+    await asyncio.to_thread(command.downgrade, alembic_cfg, "base")
+    await asyncio.to_thread(command.upgrade, alembic_cfg, "head")
+
+
+@asynccontextmanager
+async def get_session() -> AsyncIterator[AsyncSession]:
+    async for session in db_helper.session_getter():
+        yield session
+
+
+async def seed_users(session: AsyncSession, count: int) -> None:
+    """Создает пользователей с id от 1 до count"""
+    await session.execute(
+        text(
+            "INSERT INTO users (username, email, password, is_active, is_superuser, "
+            "created_at, updated_at) "
+            "SELECT 'user' || g, 'user' || g || '@example.com', NULL, true, false, "
+            "now(), now() FROM generate_series(1, :count) g"
+        ),
+        {"count": count},
+    )
+    await session.commit()
+
+
+async def analyze(session: AsyncSession) -> None:
+    """Обновляет статистику планировщика после массовой вставки"""
+    await session.execute(text("ANALYZE"))
+    await session.commit()
+
+
+async def measure(
+    func: Callable[[], Awaitable[object]],
+    repeat: int,
+) -> dict[str, float]:
+    """Замеряет задержку вызовов в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p95": timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        "mean": statistics.fmean(timings),
+    }
+
+
+def print_table(headers: list[str], rows: list[list[object]]) -> None:
+    cells = [headers] + [
+        [f"{v:.2f}" if isinstance(v, float) else str(v) for v in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for idx, row in enumerate(cells):
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
+        if idx == 0:
+            print("  ".join("-" * w for w in widths))
@@ -0,0 +1,200 @@
+"""
+Бенчмарк гибридной ленты (push/pull)
+
+Для нескольких значений settings.feed.celebrity_threshold рассылает одни и те же
+посты и сравнивает:
+* усиление записи - сколько строк users_feed приходится на один пост;
+* время рассылки всех постов;
+* задержку чтения первой и пятой (по курсору) страницы ленты.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.feed_hybrid --users 5000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+
+from api.feeds.repository import FeedRepository
+from api.feeds.service import FeedService
+from api.follows.repository import FollowsRepository
+from core import settings, db_helper
+from schemas import PaginationSchema
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+PAGE_SIZE = 20
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_session() as session:
+        await seed_users(session, args.users)
+
+        # Популярные авторы: id 1..celebs, на каждого подписана доля пользователей
+        await session.execute(
+            text(
+                "INSERT INTO follows (follower_id, followee_id, created_at, updated_at) "
+                "SELECT u, c, now(), now() "
+                "FROM generate_series(1, :celebs) c, generate_series(1, :users) u "
+                "WHERE u <> c AND random() < :share"
+            ),
+            {"celebs": args.celebs, "users": args.users, "share": args.celeb_share},
+        )
+        # Обычные авторы: каждый пользователь подписан на нескольких случайных
+        await session.execute(
+            text(
+                "INSERT INTO follows (follower_id, followee_id, created_at, updated_at) "
+                "SELECT DISTINCT u, :celebs + 1 + floor(random() * :authors)::int, "
+                "now(), now() "
+                "FROM generate_series(1, :users) u, generate_series(1, :per_user) "
+                "ON CONFLICT DO NOTHING"
+            ),
+            {
+                "celebs": args.celebs,
+                "authors": args.authors,
+                "users": args.users,
+                "per_user": args.follows_per_user,
+            },
+        )
+        # Посты вперемешку от популярных и обычных авторов
+        await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, updated_at) "
+                "SELECT CASE WHEN g % 10 = 0 "
+                "THEN 1 + g % :celebs "
+                "ELSE :celebs + 1 + g % :authors END, "
+                "'post ' || g, 'benchmark', now(), now() "
+                "FROM generate_series(1, :posts) g"
+            ),
+            {"celebs": args.celebs, "authors": args.authors, "posts": args.posts},
+        )
+        await session.commit()
+        await analyze(session)
+
+
+async def run_threshold(
+    threshold: int | None,
+    readers: list[int],
+    posts: list[tuple[int, int]],
+) -> list[object]:
+    settings.feed.celebrity_threshold = threshold
+
+    async with get_session() as session:
+        await session.execute(text("TRUNCATE users_feed"))
+        await session.execute(text("UPDATE posts SET is_pulled = false"))
+        await session.commit()
+
+    # Рассылка
+    async with get_session() as session:
+        service = FeedService(FeedRepository(session), FollowsRepository(session))
+        started = time.perf_counter()
+        for post_id, author_id in posts:
+            await service.create_event_for_users(author_id=author_id, post_id=post_id)
+        fanout_s = time.perf_counter() - started
+
+        rows = await session.scalar(text("SELECT count(*) FROM users_feed"))
+        pulled = await session.scalar(text("SELECT count(*) FROM posts WHERE is_pulled"))
+        await analyze(session)
+
+    # Чтение
+    async with get_session() as session:
+        service = FeedService(FeedRepository(session), FollowsRepository(session))
+
+        async def first_page():
+            await service.get_user_events(
+                random.choice(readers), PaginationSchema(limit=PAGE_SIZE)
+            )
+
+        # Курсоры пятой страницы собираем заранее, замеряем только ее чтение
+        deep_cursors = []
+        for reader_id in readers:
+            pagination = PaginationSchema(limit=PAGE_SIZE)
+            for _ in range(4):
+                page = await service.get_user_events(reader_id, pagination)
+                if not page.next_cursor:
+                    break
+                pagination = PaginationSchema(limit=PAGE_SIZE, cursor=page.next_cursor)
+            else:
+                deep_cursors.append((reader_id, pagination))
+
+        async def deep_page():
+            reader_id, pagination = random.choice(deep_cursors)
+            await service.get_user_events(reader_id, pagination)
+
+        first = await measure(first_page, repeat=len(readers))
+        deep = await measure(deep_page, repeat=len(readers)) if deep_cursors else None
+
+    return [
+        "push all" if threshold is None else threshold,
+        pulled,
+        rows,
+        rows / len(posts),
+        fanout_s,
+        first["p50"],
+        first["p95"],
+        deep["p50"] if deep else "-",
+        deep["p95"] if deep else "-",
+    ]
+
+
+async def main(args: argparse.Namespace) -> None:
+    await reset_database()
+    await seed(args)
+
+    async with get_session() as session:
+        posts = (
+            await session.execute(text("SELECT id, user_id FROM posts ORDER BY id"))
+        ).all()
+    readers = random.sample(range(1, args.users + 1), k=min(args.readers, args.users))
+
+    rows = []
+    for threshold in args.thresholds:
+        rows.append(await run_threshold(threshold, readers, posts))
+
+    print_table(
+        [
+            "threshold",
+            "pulled posts",
+            "feed rows",
+            "rows/post",
+            "fan-out s",
+            "p1 p50 ms",
+            "p1 p95 ms",
+            "p5 p50 ms",
+            "p5 p95 ms",
+        ],
+        rows,
+    )
+    await db_helper.dispose()
+
+
+def parse_threshold(value: str) -> int | None:
+    return None if value == "none" else int(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--celebs", type=int, default=5)
+    parser.add_argument("--celeb-share", type=float, default=0.5)
+    parser.add_argument("--authors", type=int, default=500)
+    parser.add_argument("--follows-per-user", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument(
+        "--thresholds",
+        type=parse_threshold,
+        nargs="+",
+        default=[None, 2000, 500, 100],
+    )
+    asyncio.run(main(parser.parse_args()))
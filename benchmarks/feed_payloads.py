@@ -0,0 +1,145 @@
+"""
+Бенчмарк готовых новостей ленты (settings.feed.compact_payloads)
+
+Рассылает одни и те же посты и сравнивает чтение страницы ленты:
+* через загрузку постов с авторами и сборку FeedDetailSchema;
+* из готовых JSON новостей feed_items.
+Заодно печатает место под feed_items по сравнению с таблицами posts и users.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.feed_payloads --users 5000
+"""
+
+import argparse
+import asyncio
+import random
+
+import orjson
+from sqlalchemy import text
+
+from api.feeds.repository import FeedRepository
+from api.feeds.service import FeedService
+from api.follows.repository import FollowsRepository
+from core import settings, db_helper
+from schemas import PaginationSchema, SearchResponseSchema
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_session() as session:
+        await seed_users(session, args.users)
+
+        # Каждый пользователь подписан на нескольких случайных авторов
+        await session.execute(
+            text(
+                "INSERT INTO follows (follower_id, followee_id, created_at, "
+                "updated_at) SELECT DISTINCT u, 1 + floor(random() * :authors)::int, "
+                "now(), now() "
+                "FROM generate_series(1, :users) u, generate_series(1, :per_user) "
+                "ON CONFLICT DO NOTHING"
+            ),
+            {
+                "authors": args.authors,
+                "users": args.users,
+                "per_user": args.follows_per_user,
+            },
+        )
+        await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) SELECT 1 + g % :authors, 'post ' || g, "
+                "repeat('benchmark ', :words), now(), now() "
+                "FROM generate_series(1, :posts) g"
+            ),
+            {"authors": args.authors, "posts": args.posts, "words": args.words},
+        )
+        await session.commit()
+        await analyze(session)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.feed.celebrity_threshold = None
+    settings.feed.compact_payloads = True
+    await reset_database()
+    await seed(args)
+
+    async with get_session() as session:
+        service = FeedService(FeedRepository(session), FollowsRepository(session))
+        posts = (
+            await session.execute(text("SELECT id, user_id FROM posts ORDER BY id"))
+        ).all()
+        for post_id, author_id in posts:
+            await service.plan_fan_out(f"benchmark-{post_id}", author_id, post_id)
+            await service.create_event_for_users(author_id=author_id, post_id=post_id)
+        await analyze(session)
+
+    readers = random.sample(range(1, args.users + 1), k=min(args.readers, args.users))
+    pagination = PaginationSchema(limit=args.page_size)
+
+    async with get_session() as session:
+        service = FeedService(FeedRepository(session), FollowsRepository(session))
+
+        async def join_page():
+            page = await service.get_user_events(random.choice(readers), pagination)
+            # Как и FastAPI, сериализуем ответ в JSON
+            SearchResponseSchema.model_dump_json(page)
+
+        async def compact_page():
+            await service.get_user_events_compact(random.choice(readers), pagination)
+
+        # Ответы обоих путей совпадают
+        reader_id = readers[0]
+        join_json = (await service.get_user_events(reader_id, pagination)).model_dump(
+            mode="json"
+        )
+        compact_json = orjson.loads(
+            await service.get_user_events_compact(reader_id, pagination)
+        )
+        assert join_json == compact_json
+
+        join = await measure(join_page, repeat=args.repeat)
+        compact = await measure(compact_page, repeat=args.repeat)
+        stats = await service.get_feed_items_stats()
+
+    print_table(
+        ["path", "p50 ms", "p95 ms", "mean ms"],
+        [
+            ["join", join["p50"], join["p95"], join["mean"]],
+            ["feed_items", compact["p50"], compact["p95"], compact["mean"]],
+        ],
+    )
+    print()
+    print_table(
+        ["items", "payload KiB", "feed_items KiB", "posts+users KiB", "overhead"],
+        [
+            [
+                stats.items,
+                stats.payload_bytes / 1024,
+                stats.table_bytes / 1024,
+                stats.join_tables_bytes / 1024,
+                stats.overhead_ratio,
+            ]
+        ],
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--authors", type=int, default=500)
+    parser.add_argument("--follows-per-user", type=int, default=20)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))
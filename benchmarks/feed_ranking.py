@@ -0,0 +1,171 @@
+"""
+Бенчмарк сортировок ленты new, hot и top
+
+Заполняет ленту одного читателя большим числом новостей со случайным счетом,
+пересчитывает рейтинги фоновым пересчетом и сравнивает чтение страниц:
+* по копиям рейтинга в users_feed (индекс получателя);
+* с сортировкой по рейтингу из posts при каждом чтении.
+Печатает план запроса первой страницы hot.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.feed_ranking --feed-size 200000
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from api.feeds.repository import FeedRepository
+from api.feeds.service import FeedService
+from api.follows.repository import FollowsRepository
+from core import settings, db_helper
+from schemas import PaginationSchema
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+READER_ID = 1
+
+# Сортировка по рейтингу поста при чтении, без копий в users_feed
+SORT_ON_READ = """
+SELECT users_feed.post_id FROM users_feed
+JOIN posts ON posts.id = users_feed.post_id
+WHERE users_feed.recipient_id = :reader_id
+ORDER BY posts.{column} DESC, posts.id DESC
+LIMIT :limit
+"""
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_session() as session:
+        await seed_users(session, args.authors + 1)
+        await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) SELECT 2 + g % :authors, 'post ' || g, NULL, "
+                "now() - (:posts - g) * interval '10 seconds', now() "
+                "FROM generate_series(1, :posts) g"
+            ),
+            {"authors": args.authors, "posts": args.feed_size},
+        )
+        # Лента читателя и ленты соседей по секции
+        await session.execute(
+            text(
+                "INSERT INTO users_feed (author_id, recipient_id, post_id) "
+                "SELECT user_id, r, id FROM posts, generate_series(1, :readers) r "
+                "WHERE r = :reader_id OR id % :readers = r - 1"
+            ),
+            {"readers": args.readers, "reader_id": READER_ID},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO users_feed_counters (recipient_id, events_count) "
+                "SELECT recipient_id, count(*) FROM users_feed GROUP BY recipient_id"
+            )
+        )
+        # Счет по степенному закону: у большинства постов голосов почти нет
+        await session.execute(
+            text(
+                "UPDATE posts SET score = floor(power(random(), 4) * 5000)::int - 10, "
+                "rank_dirty = true"
+            )
+        )
+        await session.commit()
+        await analyze(session)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.feed_cache.enabled = False
+    settings.feed.retention_max_age = None
+    settings.feed.ranking_batch = args.ranking_batch
+    await reset_database()
+    await seed(args)
+
+    async with get_session() as session:
+        service = FeedService(FeedRepository(session), FollowsRepository(session))
+
+        started = time.perf_counter()
+        refreshed = await service.refresh_rankings()
+        elapsed = time.perf_counter() - started
+        print(
+            f"Пересчитан рейтинг {refreshed} постов за {elapsed:.1f} с "
+            f"({refreshed / elapsed:.0f} постов/с)"
+        )
+        await analyze(session)
+
+        rows = []
+        pagination = PaginationSchema(limit=args.page_size)
+        for sort in ("new", "hot", "top"):
+            # Курсор страницы pages_deep для чтения глубоко в ленте
+            cursor = None
+            for _ in range(args.pages_deep):
+                page = PaginationSchema(limit=args.page_size, cursor=cursor)
+                _, cursor = await service._get_page_post_ids(READER_ID, page, sort)
+            deep = PaginationSchema(limit=args.page_size, cursor=cursor)
+
+            first = await measure(
+                lambda: service._get_page_post_ids(READER_ID, pagination, sort),
+                repeat=args.repeat,
+            )
+            deeper = await measure(
+                lambda: service._get_page_post_ids(READER_ID, deep, sort),
+                repeat=args.repeat,
+            )
+            row = [sort, first["p50"], first["p95"], deeper["p50"]]
+
+            if sort == "new":
+                row.append("-")
+            else:
+                column = "hot_score" if sort == "hot" else "score"
+                query = text(SORT_ON_READ.format(column=column))
+                params = {"reader_id": READER_ID, "limit": args.page_size}
+                on_read = await measure(
+                    lambda: session.execute(query, params), repeat=args.repeat
+                )
+                row.append(on_read["p50"])
+            rows.append(row)
+
+        plan = await session.execute(
+            text(
+                "EXPLAIN SELECT post_id FROM users_feed "
+                "WHERE recipient_id = :reader_id "
+                "ORDER BY hot_score DESC, post_id DESC LIMIT :limit"
+            ),
+            {"reader_id": READER_ID, "limit": args.page_size},
+        )
+        plan_lines = plan.scalars().all()
+
+    print(f"Лента читателя: {args.feed_size} новостей, страница {args.page_size}")
+    print_table(
+        [
+            "sort",
+            "first p50 ms",
+            "first p95 ms",
+            f"page {args.pages_deep + 1} p50 ms",
+            "sort on read p50 ms",
+        ],
+        rows,
+    )
+    print()
+    print("\n".join(plan_lines))
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--feed-size", type=int, default=200_000)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--pages-deep", type=int, default=20)
+    parser.add_argument("--ranking-batch", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
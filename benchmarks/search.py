@@ -0,0 +1,242 @@
+"""
+Бенчмарк полнотекстового поиска постов
+
+Создает --posts постов из словаря --vocabulary слов (буквы md5 номера)
+с распределением частот, близким к естественному: первые слова словаря
+встречаются в большей части постов, последние - в единицах.
+GIN индекс строится после вставки, как при миграции существующей таблицы.
+Замеряет задержку GET /api/search/posts на уровне сервиса (поиск,
+ранжирование, подсчет найденных и JSON) для слов разной частоты,
+пары слов и фразы: первая страница и следующая по курсору.
+Движки (--backends):
+* postgres - tsvector с GIN индексом и ts_rank;
+* embedded - встроенный индекс BM25 во временном каталоге: также
+  замеряются его построение, открытие, сегменты изменений и слияние.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.search --posts 1000000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+from api.search.index import SearchIndex, SearchIndexWriter
+from api.search.repository import SearchRepository, EmbeddedSearchRepository
+from api.search.service import SearchService
+from api.tasks.search_tasks import rebuild_index
+from core import settings, db_helper
+from schemas import PaginationSchema
+from utils.cursor import encode_cursor
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+INSERT_BATCH = 100_000
+
+# Слово из букв md5 номера: словарь не передается в базу
+DIGITS_TO_LETTERS = str.maketrans("0123456789", "ghijklmnop")
+SQL_WORD = "left(translate(md5(n::text), '0123456789', 'ghijklmnop'), 4 + n % 6)"
+
+
+def vocabulary_word(number: int) -> str:
+    """Слово словаря с номером number, как его строит SQL_WORD"""
+    digest = hashlib.md5(str(number).encode()).hexdigest()
+    return digest.translate(DIGITS_TO_LETTERS)[: 4 + number % 6]
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_session() as session:
+        await seed_users(session, args.users)
+        # Индекс строится после вставки, а не пополняется построчно
+        await session.execute(text("DROP INDEX ix_posts_search_vector"))
+        # Номер слова - n * u^3: частота слова убывает с его номером.
+        # Ссылка на g заставляет считать подзапрос для каждого поста
+        words = (
+            f"(SELECT string_agg({SQL_WORD}, ' ') FROM ("
+            "SELECT 1 + floor(:size * power(random(), 3))::int AS n "
+            "FROM generate_series(1, {count}) w WHERE w > g - g) words)"
+        )
+        started = time.perf_counter()
+        for after in range(0, args.posts, INSERT_BATCH):
+            await session.execute(
+                text(
+                    "INSERT INTO posts (user_id, title, description, created_at, "
+                    "updated_at) "
+                    f"SELECT 1 + g % :users, {words.format(count=args.title_words)}, "
+                    f"{words.format(count=args.description_words)}, now(), now() "
+                    "FROM generate_series(:after + 1, :upto) g"
+                ),
+                {
+                    "users": args.users,
+                    "size": args.vocabulary,
+                    "after": after,
+                    "upto": min(after + INSERT_BATCH, args.posts),
+                },
+            )
+            await session.commit()
+        print(f"Посты созданы за {time.perf_counter() - started:.0f} с")
+
+        started = time.perf_counter()
+        await session.execute(
+            text(
+                "CREATE INDEX ix_posts_search_vector ON posts "
+                "USING gin (search_vector) WHERE NOT is_hidden"
+            )
+        )
+        await session.commit()
+        size = await session.scalar(
+            text("SELECT pg_size_pretty(pg_relation_size('ix_posts_search_vector'))")
+        )
+        print(f"GIN индекс построен за {time.perf_counter() - started:.0f} с, {size}")
+        await analyze(session)
+
+
+async def build_embedded(args: argparse.Namespace, directory: Path) -> SearchIndex:
+    writer = SearchIndexWriter(
+        directory,
+        title_weight=settings.search.title_weight,
+        max_segments=settings.search.max_segments,
+    )
+    async with get_session() as session:
+        started = time.perf_counter()
+        indexed = await rebuild_index(session, writer)
+        elapsed = time.perf_counter() - started
+    size = sum(path.stat().st_size for path in directory.glob("*.seg"))
+    print(
+        f"Встроенный индекс: {indexed} постов за {elapsed:.0f} с, "
+        f"{size / 2**20:.0f} MB"
+    )
+
+    # Сегменты изменений, как их пишет задача update_search_index
+    async with get_session() as session:
+        docs = await SearchRepository(session).get_index_docs_batch(0, args.updates)
+    started = time.perf_counter()
+    for doc in docs:
+        await asyncio.to_thread(writer.add, [doc], deleted=[doc[0]])
+    elapsed = (time.perf_counter() - started) * 1000 / max(len(docs), 1)
+    print(f"Сегмент изменений из одного поста: {elapsed:.1f} мс")
+
+    started = time.perf_counter()
+    merged = writer.merge()
+    print(f"Слияние {merged} сегментов: {time.perf_counter() - started:.1f} с")
+
+    index = SearchIndex(
+        directory,
+        refresh=settings.search.index_refresh,
+        k1=settings.search.bm25_k1,
+        b=settings.search.bm25_b,
+    )
+    started = time.perf_counter()
+    index.snapshot()
+    print(f"Открытие индекса: {(time.perf_counter() - started) * 1000:.1f} мс")
+    return index
+
+
+async def main(args: argparse.Namespace) -> None:
+    await reset_database()
+    await seed(args)
+
+    word = vocabulary_word
+    queries = {
+        "word #1": word(1),
+        "word #10": word(10),
+        "word #100": word(100),
+        "word #1000": word(1000),
+        "word #5000": word(5000),
+        "#10 and #100": f"{word(10)} {word(100)}",
+        "phrase": f'"{word(10)} {word(11)}"',
+    }
+    pagination = PaginationSchema(limit=args.limit)
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = None
+        if "embedded" in args.backends:
+            index = await build_embedded(args, Path(directory))
+
+        rows = []
+        async with get_session() as session:
+            repos = {
+                "postgres": lambda: SearchRepository(session),
+                "embedded": lambda: EmbeddedSearchRepository(session, index),
+            }
+            for name, query in queries.items():
+                for backend in args.backends:
+                    # Новый репозиторий на каждый вызов, как на каждый запрос
+                    def service() -> SearchService:
+                        return SearchService(repos[backend]())
+
+                    found = await service().search_repo.count_posts(query)
+                    page = await service().search_repo.search_posts_rows(
+                        query, limit=args.limit, offset=0
+                    )
+                    cursor = None
+                    if len(page) == args.limit:
+                        cursor = encode_cursor(page[-1]["rank"], page[-1]["post"]["id"])
+                    next_page = pagination.model_copy(update={"cursor": cursor})
+
+                    first = await measure(
+                        lambda: service().search_posts_json(query, pagination),
+                        repeat=args.repeat,
+                    )
+                    second = await measure(
+                        lambda: service().search_posts_json(query, next_page),
+                        repeat=args.repeat,
+                    )
+                    rows.append(
+                        [
+                            name,
+                            backend,
+                            found,
+                            first["p50"],
+                            first["p95"],
+                            second["p50"] if cursor else "-",
+                            second["p95"] if cursor else "-",
+                        ]
+                    )
+
+    print(f"Постов: {args.posts}, запросов на вариант: {args.repeat}")
+    print_table(
+        [
+            "query",
+            "backend",
+            "found",
+            "page 1 p50",
+            "page 1 p95",
+            "page 2 p50",
+            "page 2 p95",
+        ],
+        rows,
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--title-words", type=int, default=4)
+    parser.add_argument("--description-words", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["postgres", "embedded"],
+        default=["postgres", "embedded"],
+    )
+    # Сколько постов записывается в индекс по одному, как при их изменении
+    parser.add_argument("--updates", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,221 @@
+"""
+Бенчмарк сериализации списков (settings.api.trusted_serialization)
+
+Сравнивает для страниц ленты и постов по 10 и 50 записей:
+* schema - pydantic-схема на каждую строку, затем то, что FastAPI делает
+  с ответом по response_model: повторная проверка и сериализация;
+* trusted - строки из базы сразу пишутся в JSON.
+Печатает строки в секунду только на сериализацию и на весь вызов сервиса
+вместе с запросами к базе.
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.serialization
+"""
+
+import argparse
+import asyncio
+import time
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import text
+
+from api.feeds.repository import FeedRepository
+from api.feeds.schemas import FeedDetailSchema
+from api.feeds.service import FeedService
+from api.follows.repository import FollowsRepository
+from api.posts.repository import PostRepository
+from api.posts.schemas import PostReadSchema
+from api.posts.service import PostService
+from core import settings, db_helper
+from schemas import PaginationSchema, SearchResponseSchema
+from utils.serialization import dump_search_response
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+PAGE_SIZES = (10, 50)
+READER_ID = 1
+AUTHOR_ID = 2
+
+
+def render_response(adapter: TypeAdapter, content) -> bytes:
+    """Обработка ответа FastAPI: model_dump, проверка по response_model, JSON"""
+    prepared = content.model_dump()
+    value = adapter.validate_python(prepared)
+    return orjson.dumps(adapter.dump_python(value, mode="json"))
+
+
+def rows_per_second(func, rows: int, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return rows * repeat / (time.perf_counter() - started)
+
+
+async def seed(args: argparse.Namespace) -> None:
+    async with get_session() as session:
+        await seed_users(session, 2)
+        await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) SELECT :author_id, 'post ' || g, "
+                "repeat('benchmark ', :words), now(), now() "
+                "FROM generate_series(1, :posts) g"
+            ),
+            {"author_id": AUTHOR_ID, "posts": args.posts, "words": args.words},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO users_feed (author_id, recipient_id, post_id) "
+                "SELECT user_id, :reader_id, id FROM posts"
+            ),
+            {"reader_id": READER_ID},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO users_feed_counters (recipient_id, events_count) "
+                "VALUES (:reader_id, :posts)"
+            ),
+            {"reader_id": READER_ID, "posts": args.posts},
+        )
+        await session.commit()
+        await analyze(session)
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings.feed_cache.enabled = False
+    await reset_database()
+    await seed(args)
+
+    feed_adapter = TypeAdapter(SearchResponseSchema[FeedDetailSchema])
+    posts_adapter = TypeAdapter(SearchResponseSchema[PostReadSchema])
+    rows = []
+
+    async with get_session() as session:
+        feed_service = FeedService(FeedRepository(session), FollowsRepository(session))
+        post_repo = PostRepository(session)
+        post_service = PostService(session, post_repo)
+
+        for limit in PAGE_SIZES:
+            pagination = PaginationSchema(limit=limit)
+
+            # Только сериализация уже загруженной страницы
+            post_ids, _ = await feed_service._get_page_post_ids(READER_ID, pagination)
+            feed_posts = await feed_service.feed_repo.get_posts_with_authors(post_ids)
+            feed_rows = await feed_service.feed_repo.get_feed_rows(post_ids)
+            posts = await post_repo.get_user_posts(AUTHOR_ID, limit=limit, offset=0)
+            post_rows = await post_repo.get_user_posts_rows(
+                AUTHOR_ID, limit=limit, offset=0
+            )
+
+            serialization = {
+                "feed": (
+                    lambda: render_response(
+                        feed_adapter,
+                        SearchResponseSchema(
+                            detail=[
+                                feed_service._build_feed_item(post)
+                                for post in feed_posts
+                            ],
+                            pagination=pagination,
+                            total_found=len(post_ids),
+                        ),
+                    ),
+                    lambda: dump_search_response(
+                        feed_rows, pagination, len(post_ids), None
+                    ),
+                ),
+                "posts": (
+                    lambda: render_response(
+                        posts_adapter,
+                        SearchResponseSchema(
+                            detail=[
+                                PostReadSchema.model_validate(post) for post in posts
+                            ],
+                            pagination=pagination,
+                            total_found=len(posts),
+                        ),
+                    ),
+                    lambda: dump_search_response(
+                        post_rows, pagination, len(post_rows), None
+                    ),
+                ),
+            }
+
+            # Оба способа дают одинаковый JSON
+            for schema_func, trusted_func in serialization.values():
+                assert orjson.loads(schema_func()) == orjson.loads(trusted_func())
+
+            # Весь вызов сервиса вместе с запросами к базе
+            async def feed_schema():
+                page = await feed_service.get_user_events(READER_ID, pagination)
+                render_response(feed_adapter, page)
+
+            async def feed_trusted():
+                await feed_service.get_user_events_json(READER_ID, pagination)
+
+            async def posts_schema():
+                page = await post_service.get_posts(AUTHOR_ID, pagination)
+                render_response(posts_adapter, page)
+
+            async def posts_trusted():
+                await post_service.get_posts_json(AUTHOR_ID, pagination)
+
+            service = {
+                "feed": (feed_schema, feed_trusted),
+                "posts": (posts_schema, posts_trusted),
+            }
+
+            for endpoint in ("feed", "posts"):
+                schema_func, trusted_func = serialization[endpoint]
+                schema_ser = rows_per_second(schema_func, limit, args.repeat)
+                trusted_ser = rows_per_second(trusted_func, limit, args.repeat)
+
+                schema_call, trusted_call = service[endpoint]
+                repeat = args.db_repeat
+                schema_ms = (await measure(schema_call, repeat=repeat))["mean"]
+                trusted_ms = (await measure(trusted_call, repeat=repeat))["mean"]
+
+                rows.append(
+                    [
+                        endpoint,
+                        limit,
+                        schema_ser,
+                        trusted_ser,
+                        trusted_ser / schema_ser,
+                        limit * 1000 / schema_ms,
+                        limit * 1000 / trusted_ms,
+                        schema_ms / trusted_ms,
+                    ]
+                )
+
+    print_table(
+        [
+            "endpoint",
+            "page",
+            "ser schema rows/s",
+            "ser trusted rows/s",
+            "x",
+            "call schema rows/s",
+            "call trusted rows/s",
+            "x",
+        ],
+        rows,
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--words", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--db-repeat", type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
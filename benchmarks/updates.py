@@ -0,0 +1,164 @@
+"""
+Бенчмарк обновления поста и пользователя
+
+Сравнивает задержку PATCH на уровне репозиториев:
+* прежний путь - чтение строки, проверка занятого названия (имени),
+  изменение объекта, commit и refresh;
+* UPDATE ... RETURNING одним запросом, занятое название находит
+  уникальный индекс.
+Печатает число SQL запросов на одно обновление (без COMMIT).
+
+Запуск из корня репозитория на тестовой базе:
+
+    PYTHONPATH=src python -m benchmarks.updates --repeat 2000
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import event, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.auth.users.models import User
+from api.auth.users.repository import UserRepository
+from api.auth.users.schemas import UserUpdatePartialSchema
+from api.posts.models import Post
+from api.posts.repository import PostRepository
+from api.posts.schemas import PostUpdatePartialSchema
+from core import db_helper
+from .common import (
+    analyze,
+    get_session,
+    measure,
+    print_table,
+    reset_database,
+    seed_users,
+)
+
+AUTHOR_ID = 1
+
+
+async def legacy_update_post(
+    session: AsyncSession,
+    post_id: int,
+    update_data: PostUpdatePartialSchema,
+) -> Post:
+    post = await session.scalar(
+        select(Post).filter_by(user_id=AUTHOR_ID, id=post_id, is_hidden=False)
+    )
+    await session.scalar(
+        select(Post).filter_by(
+            user_id=AUTHOR_ID, title=update_data.title, is_hidden=False
+        )
+    )
+    for key, value in update_data.model_dump(exclude_unset=True).items():
+        setattr(post, key, value)
+    await session.commit()
+    await session.refresh(post)
+    return post
+
+
+async def legacy_update_user(
+    session: AsyncSession,
+    user_id: int,
+    update_data: UserUpdatePartialSchema,
+) -> User:
+    user = await session.scalar(select(User).filter_by(id=user_id))
+    await session.scalars(
+        select(User).where(
+            or_(User.username == update_data.username, User.email == user.email)
+        )
+    )
+    for key, value in update_data.model_dump(exclude_unset=True).items():
+        setattr(user, key, value)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+async def seed(args: argparse.Namespace) -> int:
+    async with get_session() as session:
+        await seed_users(session, args.users)
+        post_id = await session.scalar(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) SELECT :user_id, 'post ' || g, 'text', now(), now() "
+                "FROM generate_series(1, :posts) g RETURNING id"
+            ),
+            {"user_id": AUTHOR_ID, "posts": args.posts},
+        )
+        await session.commit()
+        await analyze(session)
+    return post_id
+
+
+async def main(args: argparse.Namespace) -> None:
+    await reset_database()
+    post_id = await seed(args)
+
+    async with get_session() as session:
+        statements = 0
+
+        def count_statement(*_) -> None:
+            nonlocal statements
+            statements += 1
+
+        event.listen(
+            session.bind.sync_engine, "before_cursor_execute", count_statement
+        )
+        post_repo = PostRepository(session)
+        user_repo = UserRepository(session)
+        counter = iter(range(10**9))
+
+        def post_data() -> PostUpdatePartialSchema:
+            return PostUpdatePartialSchema(title=f"updated {next(counter)}")
+
+        def user_data() -> UserUpdatePartialSchema:
+            return UserUpdatePartialSchema(username=f"renamed {next(counter)}")
+
+        cases = {
+            ("post", "select + commit + refresh"): lambda: legacy_update_post(
+                session, post_id, post_data()
+            ),
+            ("post", "UPDATE ... RETURNING"): lambda: post_repo.update_post(
+                AUTHOR_ID, post_id, post_data(), partial=True
+            ),
+            ("user", "select + commit + refresh"): lambda: legacy_update_user(
+                session, AUTHOR_ID, user_data()
+            ),
+            ("user", "UPDATE ... RETURNING"): lambda: user_repo.update_user(
+                AUTHOR_ID, user_data(), partial=True
+            ),
+        }
+
+        rows = []
+        for (entity, path), update in cases.items():
+            statements = 0
+            await update()
+            per_update = statements
+            timings = await measure(update, repeat=args.repeat)
+            rows.append(
+                [
+                    entity,
+                    path,
+                    per_update,
+                    timings["p50"],
+                    timings["p95"],
+                    timings["mean"],
+                ]
+            )
+
+    print(f"Обновлений на вариант: {args.repeat}")
+    print_table(
+        ["entity", "path", "queries", "p50 ms", "p95 ms", "mean ms"],
+        rows,
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
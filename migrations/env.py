@@ -15,6 +15,8 @@ from api.auth.users.models import User
 from api.posts.models import Post
 from api.follows.models import Follow
 from api.feeds.models import UserFeed
+from api.votes.models import PostVote
+from api.comments.models import Comment
 
 
 config = context.config
@@ -0,0 +1,34 @@
+"""add users feed recipient index
+
+Revision ID: 4f2a9c1d7e3b
+Revises: 879bcf23daa1
+Create Date: 2026-10-18 10:12:41.204518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f2a9c1d7e3b"
+down_revision: Union[str, Sequence[str], None] = "879bcf23daa1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_users_feed_recipient_id_id",
+        "users_feed",
+        ["recipient_id", sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_feed_recipient_id_id", table_name="users_feed")
@@ -0,0 +1,57 @@
+"""restore users username unique
+
+Revision ID: a2c5e8f17b93
+Revises: f9b1d6e43a57
+Create Date: 2026-10-18 21:48:02.117645
+
+Перед миграцией имена пользователей должны быть уникальны. Пока ограничения
+не было, одинаковые имена могли появиться при одновременной регистрации или
+переименовании. Миграция их не исправляет: она останавливается со списком
+повторяющихся имен, их нужно переименовать вручную и повторить миграцию.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a2c5e8f17b93"
+down_revision: Union[str, Sequence[str], None] = "f9b1d6e43a57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    duplicates = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT username, count(*) FROM users GROUP BY username "
+                "HAVING count(*) > 1 ORDER BY username LIMIT 20"
+            )
+        )
+        .all()
+    )
+    if duplicates:
+        names = ", ".join(f"{username} ({count})" for username, count in duplicates)
+        raise RuntimeError(
+            "Нельзя сделать users.username уникальным: одинаковые имена есть "
+            f"у нескольких пользователей: {names}. Переименуйте их и повторите "
+            "миграцию"
+        )
+
+    # Регистрация и обновление пользователя полагаются на ограничение,
+    # а не на предварительную проверку имени
+    op.create_unique_constraint(
+        op.f("users_username_key"),
+        "users",
+        ["username"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint(op.f("users_username_key"), "users", type_="unique")
@@ -0,0 +1,71 @@
+"""add feed versions
+
+Revision ID: a9e4c2d7b315
+Revises: c3d8f0a41b57
+Create Date: 2026-10-18 13:01:12.408316
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9e4c2d7b315"
+down_revision: Union[str, Sequence[str], None] = "c3d8f0a41b57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "users_feed_counters",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("recipient_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "version", sa.BigInteger(), server_default=sa.text("1"), nullable=False
+        ),
+        sa.Column(
+            "follows_version",
+            sa.BigInteger(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["recipient_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("recipient_id"),
+    )
+    op.create_index(
+        op.f("ix_users_feed_counters_id"), "users_feed_counters", ["id"], unique=False
+    )
+    op.create_table(
+        "pulled_posts_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column(
+            "version", sa.BigInteger(), server_default=sa.text("1"), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_pulled_posts_version_id"),
+        "pulled_posts_version",
+        ["id"],
+        unique=False,
+    )
+    op.execute("INSERT INTO pulled_posts_version (id, version) VALUES (1, 1)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        op.f("ix_pulled_posts_version_id"), table_name="pulled_posts_version"
+    )
+    op.drop_table("pulled_posts_version")
+    op.drop_index(op.f("ix_users_feed_counters_id"), table_name="users_feed_counters")
+    op.drop_table("users_feed_counters")
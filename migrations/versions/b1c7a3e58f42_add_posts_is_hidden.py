@@ -0,0 +1,44 @@
+"""add posts is_hidden
+
+Revision ID: b1c7a3e58f42
+Revises: a6d4e9f27c18
+Create Date: 2026-10-18 17:24:05.610937
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b1c7a3e58f42"
+down_revision: Union[str, Sequence[str], None] = "a6d4e9f27c18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "posts",
+        sa.Column(
+            "is_hidden", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+    op.drop_constraint("unique_title_with_user", "posts", type_="unique")
+    op.create_index(
+        "unique_title_with_user",
+        "posts",
+        ["title", "user_id"],
+        unique=True,
+        postgresql_where=sa.text("NOT is_hidden"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("unique_title_with_user", table_name="posts")
+    op.create_unique_constraint("unique_title_with_user", "posts", ["title", "user_id"])
+    op.drop_column("posts", "is_hidden")
@@ -0,0 +1,35 @@
+"""add posts front index
+
+Revision ID: b3d7f1a94c28
+Revises: a2c5e8f17b93
+Create Date: 2026-10-18 22:31:46.208513
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d7f1a94c28"
+down_revision: Union[str, Sequence[str], None] = "a2c5e8f17b93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_posts_created_at_id_visible",
+        "posts",
+        [sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+        postgresql_where=sa.text("NOT is_hidden"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_created_at_id_visible", table_name="posts")
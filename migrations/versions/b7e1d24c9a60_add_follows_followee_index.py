@@ -0,0 +1,34 @@
+"""add follows followee index
+
+Revision ID: b7e1d24c9a60
+Revises: 4f2a9c1d7e3b
+Create Date: 2026-10-18 11:03:17.630942
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e1d24c9a60"
+down_revision: Union[str, Sequence[str], None] = "4f2a9c1d7e3b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_follows_followee_id_follower_id",
+        "follows",
+        ["followee_id", "follower_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_follows_followee_id_follower_id", table_name="follows")
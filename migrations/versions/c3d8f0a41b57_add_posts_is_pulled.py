@@ -0,0 +1,60 @@
+"""add posts is_pulled
+
+Revision ID: c3d8f0a41b57
+Revises: b7e1d24c9a60
+Create Date: 2026-10-18 12:26:54.118203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3d8f0a41b57"
+down_revision: Union[str, Sequence[str], None] = "b7e1d24c9a60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "posts",
+        sa.Column(
+            "is_pulled", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+    op.create_index(
+        "ix_posts_user_id_id_pulled",
+        "posts",
+        ["user_id", sa.text("id DESC")],
+        unique=False,
+        postgresql_where=sa.text("is_pulled"),
+    )
+    op.drop_index("ix_users_feed_recipient_id_id", table_name="users_feed")
+    op.create_index(
+        "ix_users_feed_recipient_id_post_id",
+        "users_feed",
+        ["recipient_id", sa.text("post_id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_feed_recipient_id_post_id", table_name="users_feed")
+    op.create_index(
+        "ix_users_feed_recipient_id_id",
+        "users_feed",
+        ["recipient_id", sa.text("id DESC")],
+        unique=False,
+    )
+    op.drop_index(
+        "ix_posts_user_id_id_pulled",
+        table_name="posts",
+        postgresql_where=sa.text("is_pulled"),
+    )
+    op.drop_column("posts", "is_pulled")
@@ -0,0 +1,63 @@
+"""add post votes
+
+Revision ID: c5e9a2d71f04
+Revises: b3d7f1a94c28
+Create Date: 2026-10-18 23:04:12.591730
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e9a2d71f04"
+down_revision: Union[str, Sequence[str], None] = "b3d7f1a94c28"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "post_votes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("value", sa.SmallInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["post_id"],
+            ["posts.id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "post_id", name="unique_post_votes"),
+    )
+    op.create_index(op.f("ix_post_votes_id"), "post_votes", ["id"], unique=False)
+    op.create_index("ix_post_votes_post_id", "post_votes", ["post_id"], unique=False)
+
+    op.add_column(
+        "posts",
+        sa.Column("upvotes", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "posts",
+        sa.Column("downvotes", sa.Integer(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("posts", "downvotes")
+    op.drop_column("posts", "upvotes")
+    op.drop_index("ix_post_votes_post_id", table_name="post_votes")
+    op.drop_index(op.f("ix_post_votes_id"), table_name="post_votes")
+    op.drop_table("post_votes")
@@ -0,0 +1,34 @@
+"""add posts user_id id index
+
+Revision ID: c8e2f5a19d63
+Revises: b1c7a3e58f42
+Create Date: 2026-10-18 18:02:44.391528
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e2f5a19d63"
+down_revision: Union[str, Sequence[str], None] = "b1c7a3e58f42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_posts_user_id_id",
+        "posts",
+        ["user_id", sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_user_id_id", table_name="posts")
@@ -0,0 +1,49 @@
+"""add feed items
+
+Revision ID: d4f8b2c60e17
+Revises: c8e2f5a19d63
+Create Date: 2026-10-18 18:49:36.752013
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4f8b2c60e17"
+down_revision: Union[str, Sequence[str], None] = "c8e2f5a19d63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "feed_items",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("source_updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["author_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(["post_id"], ["posts.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("post_id"),
+    )
+    op.create_index(op.f("ix_feed_items_id"), "feed_items", ["id"], unique=False)
+    op.create_index(
+        op.f("ix_feed_items_author_id"), "feed_items", ["author_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_feed_items_author_id"), table_name="feed_items")
+    op.drop_index(op.f("ix_feed_items_id"), table_name="feed_items")
+    op.drop_table("feed_items")
@@ -0,0 +1,79 @@
+"""add comments
+
+Revision ID: d8f4b2c6e197
+Revises: c5e9a2d71f04
+Create Date: 2026-10-18 23:41:37.204518
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d8f4b2c6e197"
+down_revision: Union[str, Sequence[str], None] = "c5e9a2d71f04"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Integer(), nullable=True),
+        sa.Column("path", sa.Text(collation="C"), nullable=False),
+        sa.Column("depth", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("body", sa.String(length=10000), nullable=False),
+        sa.Column("score", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("replies_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["post_id"],
+            ["posts.id"],
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["parent_id"],
+            ["comments.id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_comments_id"), "comments", ["id"], unique=False)
+    op.create_index(
+        "ix_comments_post_id_path", "comments", ["post_id", "path"], unique=False
+    )
+    op.create_index(
+        "ix_comments_post_id_created_at_id_roots",
+        "comments",
+        ["post_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+        postgresql_where=sa.text("parent_id IS NULL"),
+    )
+    op.create_index(
+        "ix_comments_post_id_score_id_roots",
+        "comments",
+        ["post_id", sa.text("score DESC"), sa.text("id DESC")],
+        unique=False,
+        postgresql_where=sa.text("parent_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_comments_post_id_score_id_roots", table_name="comments")
+    op.drop_index("ix_comments_post_id_created_at_id_roots", table_name="comments")
+    op.drop_index("ix_comments_post_id_path", table_name="comments")
+    op.drop_index(op.f("ix_comments_id"), table_name="comments")
+    op.drop_table("comments")
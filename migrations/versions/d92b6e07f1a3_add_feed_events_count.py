@@ -0,0 +1,40 @@
+"""add feed events count
+
+Revision ID: d92b6e07f1a3
+Revises: a9e4c2d7b315
+Create Date: 2026-10-18 13:41:09.552170
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d92b6e07f1a3"
+down_revision: Union[str, Sequence[str], None] = "a9e4c2d7b315"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users_feed_counters",
+        sa.Column(
+            "events_count", sa.BigInteger(), server_default=sa.text("0"), nullable=False
+        ),
+    )
+    op.execute(
+        "INSERT INTO users_feed_counters (recipient_id, events_count) "
+        "SELECT recipient_id, count(*) FROM users_feed GROUP BY recipient_id "
+        "ON CONFLICT (recipient_id) "
+        "DO UPDATE SET events_count = excluded.events_count"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("users_feed_counters", "events_count")
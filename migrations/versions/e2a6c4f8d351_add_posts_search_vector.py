@@ -0,0 +1,66 @@
+"""add posts search vector
+
+Revision ID: e2a6c4f8d351
+Revises: d8f4b2c6e197
+Create Date: 2026-10-19 00:27:05.618342
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a6c4f8d351"
+down_revision: Union[str, Sequence[str], None] = "d8f4b2c6e197"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Конфигурация поиска на момент миграции (api.posts.models.SEARCH_CONFIG)
+SEARCH_CONFIG = "russian"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Хранимая вычисляемая колонка заполняется переписыванием таблицы
+    # под блокировкой posts
+    op.add_column(
+        "posts",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+                "coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    # GIN индекс строится долго: строим его без блокировки записи постов
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_posts_search_vector",
+            "posts",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_where=sa.text("NOT is_hidden"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_posts_search_vector",
+            table_name="posts",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column("posts", "search_vector")
@@ -0,0 +1,31 @@
+"""add feed retention indexes
+
+Revision ID: e5a07c3b9d14
+Revises: d92b6e07f1a3
+Create Date: 2026-10-18 14:58:33.870412
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a07c3b9d14"
+down_revision: Union[str, Sequence[str], None] = "d92b6e07f1a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_users_feed_post_id", "users_feed", ["post_id"], unique=False)
+    op.create_index("ix_posts_created_at", "posts", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_posts_created_at", table_name="posts")
+    op.drop_index("ix_users_feed_post_id", table_name="users_feed")
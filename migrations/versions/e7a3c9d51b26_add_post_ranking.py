@@ -0,0 +1,111 @@
+"""add post ranking
+
+Revision ID: e7a3c9d51b26
+Revises: d4f8b2c60e17
+Create Date: 2026-10-18 20:11:37.852190
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a3c9d51b26"
+down_revision: Union[str, Sequence[str], None] = "d4f8b2c60e17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Формула рейтинга hot на момент миграции (api.posts.ranking)
+HOT_EPOCH = 1134028003
+HOT_DECAY = 45000
+
+# Сколько строк users_feed заполняется одной транзакцией
+COPY_BATCH = 50_000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "posts",
+        sa.Column("score", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "posts",
+        sa.Column(
+            "hot_score",
+            sa.Float(),
+            server_default=sa.text(
+                f"(extract(epoch FROM now()) - {HOT_EPOCH}) / {HOT_DECAY}"
+            ),
+            nullable=False,
+        ),
+    )
+    op.add_column(
+        "posts",
+        sa.Column(
+            "rank_dirty", sa.Boolean(), server_default=sa.false(), nullable=False
+        ),
+    )
+    # У существующих постов голосов нет, рейтинг зависит только от времени
+    op.execute(
+        f"UPDATE posts SET hot_score = "
+        f"(extract(epoch FROM created_at) - {HOT_EPOCH}) / {HOT_DECAY}"
+    )
+    op.create_index(
+        "ix_posts_rank_dirty",
+        "posts",
+        ["id"],
+        postgresql_where=sa.text("rank_dirty"),
+    )
+
+    op.add_column(
+        "users_feed",
+        sa.Column("hot_score", sa.Float(), server_default="0", nullable=False),
+    )
+    op.add_column(
+        "users_feed",
+        sa.Column("score", sa.Integer(), server_default="0", nullable=False),
+    )
+
+    # Копируем рейтинги постов в ленты пачками по id до создания индексов
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT max(id) FROM users_feed")).scalar()
+        after_id = 0
+        while max_id is not None and after_id < max_id:
+            bind.execute(
+                sa.text(
+                    "UPDATE users_feed SET hot_score = posts.hot_score, "
+                    "score = posts.score FROM posts "
+                    "WHERE posts.id = users_feed.post_id "
+                    "AND users_feed.id > :after_id AND users_feed.id <= :upto_id"
+                ),
+                {"after_id": after_id, "upto_id": after_id + COPY_BATCH},
+            )
+            after_id += COPY_BATCH
+
+    op.create_index(
+        "ix_users_feed_recipient_id_hot_score",
+        "users_feed",
+        ["recipient_id", sa.text("hot_score DESC"), sa.text("post_id DESC")],
+    )
+    op.create_index(
+        "ix_users_feed_recipient_id_score",
+        "users_feed",
+        ["recipient_id", sa.text("score DESC"), sa.text("post_id DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_users_feed_recipient_id_score", table_name="users_feed")
+    op.drop_index("ix_users_feed_recipient_id_hot_score", table_name="users_feed")
+    op.drop_column("users_feed", "score")
+    op.drop_column("users_feed", "hot_score")
+    op.drop_index("ix_posts_rank_dirty", table_name="posts")
+    op.drop_column("posts", "rank_dirty")
+    op.drop_column("posts", "hot_score")
+    op.drop_column("posts", "score")
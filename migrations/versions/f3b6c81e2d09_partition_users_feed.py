@@ -0,0 +1,191 @@
+"""partition users_feed by recipient
+
+Revision ID: f3b6c81e2d09
+Revises: e5a07c3b9d14
+Create Date: 2026-10-18 15:42:17.204981
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3b6c81e2d09"
+down_revision: Union[str, Sequence[str], None] = "e5a07c3b9d14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Число hash-секций. Зафиксировано в миграции: ее результат не должен зависеть
+# от настроек окружения, а смена числа секций - это новая миграция.
+# feed.partitions в настройках должен совпадать с ним
+PARTITIONS = 16
+
+# Сколько строк переносится одной транзакцией
+COPY_BATCH = 50_000
+
+# Старые и новые имена ограничений и индексов, которые меняются местами
+RENAMES = (
+    ("users_feed_new_pkey", "users_feed_pkey"),
+    (
+        "users_feed_new_author_id_recipient_id_post_id_key",
+        "users_feed_author_id_recipient_id_post_id_key",
+    ),
+    ("ix_users_feed_new_id", "ix_users_feed_id"),
+    ("ix_users_feed_new_recipient_id_post_id", "ix_users_feed_recipient_id_post_id"),
+    ("ix_users_feed_new_post_id", "ix_users_feed_post_id"),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 1. Секционированная копия таблицы, id берутся из той же последовательности
+    op.create_table(
+        "users_feed_new",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('users_feed_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("recipient_id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["author_id"], ["users.id"], name="users_feed_author_id_fkey"
+        ),
+        sa.ForeignKeyConstraint(
+            ["post_id"], ["posts.id"], name="users_feed_post_id_fkey"
+        ),
+        sa.ForeignKeyConstraint(
+            ["recipient_id"], ["users.id"], name="users_feed_recipient_id_fkey"
+        ),
+        sa.PrimaryKeyConstraint("id", "recipient_id", name="users_feed_new_pkey"),
+        sa.UniqueConstraint(
+            "author_id",
+            "recipient_id",
+            "post_id",
+            name="users_feed_new_author_id_recipient_id_post_id_key",
+        ),
+        postgresql_partition_by="HASH (recipient_id)",
+    )
+    for remainder in range(PARTITIONS):
+        op.execute(
+            f"CREATE TABLE users_feed_p{remainder} PARTITION OF users_feed_new "
+            f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})"
+        )
+    op.create_index("ix_users_feed_new_id", "users_feed_new", ["id"])
+    op.create_index(
+        "ix_users_feed_new_recipient_id_post_id",
+        "users_feed_new",
+        ["recipient_id", sa.text("post_id DESC")],
+    )
+    op.create_index("ix_users_feed_new_post_id", "users_feed_new", ["post_id"])
+
+    # 2. Пока данные переносятся, изменения старой таблицы повторяются в новой
+    op.execute(
+        """
+        CREATE FUNCTION users_feed_mirror() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                DELETE FROM users_feed_new
+                WHERE id = OLD.id AND recipient_id = OLD.recipient_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO users_feed_new (id, author_id, recipient_id, post_id)
+                VALUES (NEW.id, NEW.author_id, NEW.recipient_id, NEW.post_id)
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER users_feed_mirror "
+        "AFTER INSERT OR UPDATE OR DELETE ON users_feed "
+        "FOR EACH ROW EXECUTE FUNCTION users_feed_mirror()"
+    )
+
+    # 3. Переносим строки пачками по id, каждая пачка - своя транзакция.
+    # FOR SHARE не дает удалить строку, пока пачка с ней не закоммичена,
+    # иначе удаление прошло бы мимо новой таблицы
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT max(id) FROM users_feed")).scalar()
+        after_id = 0
+        while max_id is not None and after_id < max_id:
+            bind.execute(
+                sa.text(
+                    "INSERT INTO users_feed_new (id, author_id, recipient_id, post_id) "
+                    "SELECT id, author_id, recipient_id, post_id FROM users_feed "
+                    "WHERE id > :after_id AND id <= :upto_id FOR SHARE "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"after_id": after_id, "upto_id": after_id + COPY_BATCH},
+            )
+            after_id += COPY_BATCH
+
+    # 4. Короткая блокировка: меняем таблицы местами
+    op.execute("LOCK TABLE users_feed IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER users_feed_mirror ON users_feed")
+    op.execute("DROP FUNCTION users_feed_mirror()")
+    op.execute("ALTER SEQUENCE users_feed_id_seq OWNED BY NONE")
+    op.drop_table("users_feed")
+    op.rename_table("users_feed_new", "users_feed")
+    for old_name, new_name in RENAMES:
+        op.execute(f"ALTER INDEX {old_name} RENAME TO {new_name}")
+    op.execute("ALTER SEQUENCE users_feed_id_seq OWNED BY users_feed.id")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Обратный перенос не онлайн: таблица блокируется на время копирования
+    op.execute("LOCK TABLE users_feed IN ACCESS EXCLUSIVE MODE")
+    op.execute(
+        "CREATE TEMPORARY TABLE users_feed_rows ON COMMIT DROP AS "
+        "SELECT id, author_id, recipient_id, post_id FROM users_feed"
+    )
+    op.execute("ALTER SEQUENCE users_feed_id_seq OWNED BY NONE")
+    op.drop_table("users_feed")
+    op.create_table(
+        "users_feed",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('users_feed_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("recipient_id", sa.Integer(), nullable=False),
+        sa.Column("post_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["author_id"],
+            ["users.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["post_id"],
+            ["posts.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["recipient_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("author_id", "recipient_id", "post_id"),
+    )
+    op.create_index(op.f("ix_users_feed_id"), "users_feed", ["id"], unique=False)
+    op.create_index(
+        "ix_users_feed_recipient_id_post_id",
+        "users_feed",
+        ["recipient_id", sa.text("post_id DESC")],
+    )
+    op.create_index("ix_users_feed_post_id", "users_feed", ["post_id"])
+    op.execute(
+        "INSERT INTO users_feed (id, author_id, recipient_id, post_id) "
+        "SELECT id, author_id, recipient_id, post_id FROM users_feed_rows"
+    )
+    op.execute("ALTER SEQUENCE users_feed_id_seq OWNED BY users_feed.id")
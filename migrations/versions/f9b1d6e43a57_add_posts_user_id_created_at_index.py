@@ -0,0 +1,42 @@
+"""add posts user_id created_at index
+
+Revision ID: f9b1d6e43a57
+Revises: e7a3c9d51b26
+Create Date: 2026-10-18 21:05:19.430762
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f9b1d6e43a57"
+down_revision: Union[str, Sequence[str], None] = "e7a3c9d51b26"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_posts_user_id_created_at_id",
+        "posts",
+        ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    # Последние посты автора теперь читаются по новому индексу
+    op.drop_index("ix_posts_user_id_id", table_name="posts")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        "ix_posts_user_id_id",
+        "posts",
+        ["user_id", sa.text("id DESC")],
+        unique=False,
+    )
+    op.drop_index("ix_posts_user_id_created_at_id", table_name="posts")
@@ -5,6 +5,9 @@ from .auth.views import router as auth_router
 from .posts.views import router as posts_router
 from .follows.views import router as follows_router
 from .feeds.views import router as feed_router
+from .votes.views import router as votes_router
+from .comments.views import router as comments_router
+from .search.views import router as search_router
 
 router = APIRouter(prefix="/api")
 
@@ -13,3 +16,6 @@ router.include_router(auth_router)
 router.include_router(posts_router)
 router.include_router(follows_router)
 router.include_router(feed_router)
+router.include_router(votes_router)
+router.include_router(comments_router)
+router.include_router(search_router)
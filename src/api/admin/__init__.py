@@ -1,5 +1,13 @@
 from fastapi import APIRouter
 from .auth.views import router as auth_admin_router
+from .feeds.views import router as feed_admin_router
+from .posts.views import router as post_admin_router
+from .search.views import router as search_admin_router
+from .votes.views import router as vote_admin_router
 
 admin_router = APIRouter(prefix="/admin", tags=["Админка"])
 admin_router.include_router(auth_admin_router)
+admin_router.include_router(feed_admin_router)
+admin_router.include_router(post_admin_router)
+admin_router.include_router(search_admin_router)
+admin_router.include_router(vote_admin_router)
@@ -5,6 +5,7 @@ from api.auth.dependencies import SuperuserDep, get_superuser
 from api.auth.service import AuthServiceDep
 from api.auth.users.schemas import UserReadSchema
 from api.auth.views import http_bearer
+from api.tasks.feed_tasks import enqueue_feed_items_refresh
 
 router = APIRouter(
     prefix="/auth",
@@ -27,6 +28,7 @@ async def update_user(
     update_data: AdminUserUpdateSchema,
 ):
     updated_user = await auth_service.update_user(user_id, update_data, partial=False)
+    await enqueue_feed_items_refresh(author_id=user_id)
     return updated_user
 
 
@@ -37,4 +39,5 @@ async def update_user_partially(
     update_data: AdminUserUpdatePartialSchema,
 ):
     updated_user = await auth_service.update_user(user_id, update_data, partial=True)
+    await enqueue_feed_items_refresh(author_id=user_id)
     return updated_user
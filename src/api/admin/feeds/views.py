@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+
+from api.auth.dependencies import get_superuser
+from api.auth.views import http_bearer
+from api.feeds.cache import timeline_cache
+from api.feeds.schemas import TimelineCacheStatsSchema, FeedItemsStatsSchema
+from api.feeds.service import FeedServiceDep
+
+router = APIRouter(
+    prefix="/feed",
+    dependencies=[
+        Depends(http_bearer),
+        Depends(get_superuser),
+    ],
+)
+
+
+@router.get("/cache", response_model=TimelineCacheStatsSchema)
+async def get_timeline_cache_stats():
+    """Статистика кеша лент текущего процесса"""
+    return timeline_cache.stats()
+
+
+@router.get("/items", response_model=FeedItemsStatsSchema)
+async def get_feed_items_stats(feed_service: FeedServiceDep):
+    """Место под готовые новости по сравнению с чтением ленты через join"""
+    return await feed_service.get_feed_items_stats()
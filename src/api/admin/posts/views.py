@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from api.auth.dependencies import get_superuser
+from api.auth.views import http_bearer
+from api.posts.cache import post_cache
+from api.posts.schemas import PostCacheStatsSchema
+
+router = APIRouter(
+    prefix="/posts",
+    dependencies=[
+        Depends(http_bearer),
+        Depends(get_superuser),
+    ],
+)
+
+
+@router.get("/cache", response_model=PostCacheStatsSchema)
+async def get_post_cache_stats():
+    """Статистика кеша постов текущего процесса"""
+    return post_cache.stats()
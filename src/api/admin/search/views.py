@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends
+from taskiq import AsyncTaskiqTask
+
+from api.auth.dependencies import get_superuser
+from api.auth.views import http_bearer
+from api.search.index import search_index
+from api.search.schemas import SearchIndexStatsSchema
+from api.tasks.search_tasks import rebuild_search_index
+
+router = APIRouter(
+    prefix="/search",
+    dependencies=[
+        Depends(http_bearer),
+        Depends(get_superuser),
+    ],
+)
+
+
+@router.get("/index", response_model=SearchIndexStatsSchema)
+async def get_search_index_stats():
+    """Встроенный поисковый индекс, как его видит текущий процесс"""
+    return search_index.snapshot().stats()
+
+
+@router.post("/index/rebuild")
+async def rebuild_index():
+    """
+    Пересборка встроенного индекса по всем видимым постам фоновой задачей:
+    первое построение или восстановление после сбоя
+    """
+    task: AsyncTaskiqTask = await rebuild_search_index.kiq()
+    return {"task_id": task.task_id}
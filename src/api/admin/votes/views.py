@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from api.auth.dependencies import get_superuser
+from api.auth.views import http_bearer
+from api.votes.buffer import vote_buffer
+from api.votes.schemas import VoteBufferStatsSchema
+
+router = APIRouter(
+    prefix="/votes",
+    dependencies=[
+        Depends(http_bearer),
+        Depends(get_superuser),
+    ],
+)
+
+
+@router.get("/buffer", response_model=VoteBufferStatsSchema)
+async def get_vote_buffer_stats():
+    """Состояние буфера голосов текущего процесса: размер и задержка записи"""
+    return vote_buffer.stats()
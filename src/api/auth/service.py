@@ -75,13 +75,6 @@ class AuthService:
         self.jwt_repo = jwt_repo
 
     async def register_user(self, user_data: UserRegisterSchema) -> int:
-        exists_user = await self.user_repo.check_users_exists(
-            username=user_data.username, email=str(user_data.email)
-        )
-        if exists_user:
-            logger.warning(UserAlreadyExists.message)
-            raise UserAlreadyExists
-
         data = UserRegisterSchema(
             username=user_data.username,
             email=user_data.email,
@@ -90,6 +83,10 @@ class AuthService:
         )
 
         user_id = await self.user_repo.add_user(user_data=data)
+        if user_id is None:
+            logger.warning(UserAlreadyExists.message)
+            raise UserAlreadyExists
+
         logger.info(f"Пользователь {data.username} успешно зарегистрирован!")
         return user_id
 
@@ -133,24 +130,14 @@ class AuthService:
         partial: bool,
     ) -> UserReadSchema:
 
-        user = await self.user_repo.get_user(id=user_id)
-        if not user:
-            raise UserNotFoundException
-
-        # Проверяем существование обновляемых полей
-        exists_user = await self.user_repo.check_users_exists(
-            username=update_user_data.username, email=str(update_user_data.email)
-        )
-        if exists_user:
-            logger.warning(UserAlreadyExists.message)
-            raise UserAlreadyExists
-
         updated_user = await self.user_repo.update_user(
-            user=user,
+            user_id=user_id,
             update_user_data=update_user_data,
             partial=partial,
         )
-        logger.info(f"Пользователь {user} успешно обновлен!")
+        if updated_user is None:
+            raise UserNotFoundException
+        logger.info(f"Пользователь {updated_user} успешно обновлен!")
 
         return UserReadSchema.model_validate(updated_user)
 
@@ -2,11 +2,15 @@ import logging
 from typing import Protocol, Annotated, Optional
 
 from fastapi import Depends
-from sqlalchemy import select, or_
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from core.database import is_unique_violation
 from core.dependencies import SessionDep
 from core.exceptions import BadValidationException
+from .exceptions import UserAlreadyExists
 from .models import User
 from .schemas import UserRegisterSchema, UserUpdateSchema, UserUpdatePartialSchema
 
@@ -15,7 +19,11 @@ logger = logging.getLogger(__name__)
 
 class UserRepositoryProtocol(Protocol):
 
-    async def add_user(self, user_data: UserRegisterSchema) -> int:
+    async def add_user(self, user_data: UserRegisterSchema) -> Optional[int]:
+        """
+        Создаем пользователя одним запросом
+        * возвращает None, если имя пользователя или почта заняты
+        """
         pass
 
     async def get_user(self, *args, **kwargs) -> Optional[User]:
@@ -24,15 +32,17 @@ class UserRepositoryProtocol(Protocol):
     async def check_user_exists(self, *args, **kwargs) -> bool:
         pass
 
-    async def check_users_exists(self, username: str, email: str) -> bool:
-        pass
-
     async def update_user(
         self,
-        user: User,
+        user_id: int,
         update_user_data: UserUpdateSchema | UserUpdatePartialSchema,
         partial: bool,
-    ) -> User:
+    ) -> Optional[User]:
+        """
+        Обновляем пользователя одним запросом UPDATE ... RETURNING
+        * возвращает None, если пользователя нет
+        * UserAlreadyExists, если новое имя пользователя или почта заняты
+        """
         pass
 
 
@@ -41,12 +51,18 @@ class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def add_user(self, user_data: UserRegisterSchema) -> int:
+    async def add_user(self, user_data: UserRegisterSchema) -> Optional[int]:
         logger.debug(f"Создаем пользователя %s ...", user_data.username)
-        user = User(**user_data.model_dump())
-        self.session.add(user)
+        # Занятые имя и почту проверяют уникальные ограничения users
+        stmt = (
+            insert(User)
+            .values(**user_data.model_dump())
+            .on_conflict_do_nothing()
+            .returning(User.id)
+        )
+        user_id = await self.session.scalar(stmt)
         await self.session.commit()
-        return user.id
+        return user_id
 
     async def get_user(self, *args, **kwargs) -> Optional[User]:
         logger.debug(f"Ищем пользователя {kwargs} ...")
@@ -60,32 +76,41 @@ class UserRepository:
         user = await self.session.scalar(query)
         return user is None
 
-    async def check_users_exists(self, username: str, email: str) -> bool:
-        logger.debug(
-            f"Проверяем существует ли пользователи с {username = }, {email = }"
-        )
-        query = select(User).where(or_(User.username == username, User.email == email))
-        res = await self.session.scalars(query)
-        return len(res.all()) > 0
-
     async def update_user(
         self,
-        user: User,
+        user_id: int,
         update_user_data: UserUpdateSchema | UserUpdatePartialSchema,
         partial: bool,
-    ) -> User:
-        logger.debug("Обновляем пользователя ...")
-        for key, value in update_user_data.model_dump(
+    ) -> Optional[User]:
+        logger.debug("Обновляем пользователя #%d ...", user_id)
+        values = update_user_data.model_dump(
             exclude_none=partial,
             exclude_unset=partial,
-        ).items():
-            if not hasattr(user, key):
+        )
+        for key in values:
+            if key not in User.__table__.columns:
                 logger.error(f"Некорректное поле для обновления: {key}")
                 raise BadValidationException(f"Некорректное поле для обновления: {key}")
-            setattr(user, key, value)
-
-        await self.session.commit()
-        await self.session.refresh(user)
+        if not values:
+            return await self.get_user(id=user_id)
+
+        # Занятые имя и почту находят уникальные ограничения users
+        stmt = (
+            update(User)
+            .filter_by(id=user_id)
+            .values(**values)
+            .returning(User)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            user = await self.session.scalar(stmt)
+            await self.session.commit()
+        except IntegrityError as e:
+            if not is_unique_violation(e):
+                raise
+            await self.session.rollback()
+            logger.warning(UserAlreadyExists.message)
+            raise UserAlreadyExists
         return user
 
 
@@ -7,6 +7,8 @@ from fastapi import (
 )
 from fastapi.security import HTTPBearer
 
+from api.tasks.feed_tasks import enqueue_feed_items_refresh
+
 from .dependencies import ActiveUserDep, CurrentUserDep
 from .jwt.schemas import BearerResponseSchema
 from .service import AuthServiceDep
@@ -74,6 +76,7 @@ async def current_user_partial_update(
     updated_cur_user = await auth_service.update_user(
         update_user_data=update_data, user_id=active_user.id, partial=True
     )
+    await enqueue_feed_items_refresh(author_id=active_user.id)
     return updated_cur_user
 
 
@@ -86,4 +89,5 @@ async def current_user_partial_update(
     updated_cur_user = await auth_service.update_user(
         update_user_data=update_data, user_id=active_user.id, partial=False
     )
+    await enqueue_feed_items_refresh(author_id=active_user.id)
     return updated_cur_user
@@ -0,0 +1,10 @@
+from fastapi import status
+
+from core import AppException
+
+
+class CommentNotFoundException(AppException):
+    message: str = "Комментарий не найден"
+
+    def __init__(self, message: str = message):
+        super().__init__(message, status_code=status.HTTP_404_NOT_FOUND)
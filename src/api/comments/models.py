@@ -0,0 +1,45 @@
+from typing import Optional
+
+from sqlalchemy import ForeignKey, Index, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base, DateMixin
+
+# Ширина id в материализованном пути: хватает для любого int4
+PATH_WIDTH = 10
+
+
+class Comment(Base, DateMixin):
+    __tablename__ = "comments"
+    __table_args__ = (
+        # Поддерево комментария - диапазон путей, начинающихся с его пути
+        Index("ix_comments_post_id_path", "post_id", "path"),
+        # Страницы комментариев верхнего уровня по сортировкам new и top
+        Index(
+            "ix_comments_post_id_created_at_id_roots",
+            "post_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_where=text("parent_id IS NULL"),
+        ),
+        Index(
+            "ix_comments_post_id_score_id_roots",
+            "post_id",
+            text("score DESC"),
+            text("id DESC"),
+            postgresql_where=text("parent_id IS NULL"),
+        ),
+    )
+
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    parent_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("comments.id", ondelete="CASCADE")
+    )
+    # id предков и самого комментария, каждый дополнен нулями до PATH_WIDTH.
+    # Побайтовое сравнение (collation C) упорядочивает поддерево по пути
+    path: Mapped[str] = mapped_column(Text(collation="C"))
+    depth: Mapped[int] = mapped_column(default=0, server_default="0")
+    body: Mapped[str] = mapped_column(String(10_000))
+    score: Mapped[int] = mapped_column(default=0, server_default="0")
+    replies_count: Mapped[int] = mapped_column(default=0, server_default="0")
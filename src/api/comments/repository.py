@@ -0,0 +1,264 @@
+import logging
+from typing import Protocol, Annotated, Optional, Any
+
+from fastapi import Depends
+from sqlalchemy import (
+    Text,
+    and_,
+    cast,
+    exists,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from api.auth.users.models import User
+from api.auth.users.schemas import UserSummaryReadSchema
+from api.posts.models import Post
+from core.dependencies import SessionDep
+from utils.serialization import schema_columns
+from .models import Comment, PATH_WIDTH
+from .schemas import CommentCreateSchema, CommentReadSchema, CommentSort
+
+logger = logging.getLogger(__name__)
+
+# Поля комментария в строке, кроме автора
+COMMENT_FIELDS = [name for name in CommentReadSchema.model_fields if name != "author"]
+AUTHOR_FIELDS = list(UserSummaryReadSchema.model_fields)
+
+# Символ сразу после цифр: пути поддерева лежат в [path, path || ':')
+PATH_UPPER_BOUND = ":"
+
+
+class CommentsRepositoryProtocol(Protocol):
+
+    async def create_comment(
+        self,
+        user_id: int,
+        post_id: int,
+        comment_data: CommentCreateSchema,
+    ) -> Optional[dict[str, Any]]:
+        """
+        Создаем комментарий одним запросом и увеличиваем число ответов
+        родителя, возвращаем строку с полями CommentReadSchema
+        * None, если поста или родительского комментария нет
+        """
+        pass
+
+    async def check_post_exists(self, post_id: int) -> bool:
+        pass
+
+    async def get_comment_tree_rows(
+        self,
+        post_id: int,
+        sort: CommentSort,
+        limit: int,
+        offset: int,
+        before: Optional[tuple],
+        depth: int,
+        max_replies: int,
+    ) -> list[dict[str, Any]]:
+        """
+        Получаем одним запросом до limit + 1 комментариев верхнего уровня
+        и до max_replies ответов на первые limit из них не глубже depth уровней
+        * строки с полями CommentReadSchema упорядочены по глубине, затем
+          по сортировке: ответы одного родителя идут в нужном порядке
+        * ближние уровни заполняются первыми, у каждого ответа есть родитель
+        """
+        pass
+
+    async def count_root_comments(self, post_id: int, limit: Optional[int]) -> int:
+        """Считает комментарии верхнего уровня, но не больше limit"""
+        pass
+
+
+class CommentsRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_comment(
+        self,
+        user_id: int,
+        post_id: int,
+        comment_data: CommentCreateSchema,
+    ) -> Optional[dict[str, Any]]:
+        logger.debug("Создаем комментарий к посту #%d ...", post_id)
+        # id нужен заранее: он последним входит в путь комментария
+        new_id = select(func.nextval("comments_id_seq").label("id")).cte("new_id")
+        id_path = func.lpad(cast(new_id.c.id, Text), PATH_WIDTH, "0")
+        post = select(Post.id).where(Post.id == post_id, ~Post.is_hidden)
+
+        if comment_data.parent_id is None:
+            source = select(
+                new_id.c.id,
+                literal(post_id),
+                literal(user_id),
+                null(),
+                id_path,
+                literal(0),
+                literal(comment_data.body),
+            )
+        else:
+            parent = (
+                select(Comment.id, Comment.path, Comment.depth)
+                .where(
+                    Comment.id == comment_data.parent_id,
+                    Comment.post_id == post_id,
+                )
+                .cte("parent")
+            )
+            source = select(
+                new_id.c.id,
+                literal(post_id),
+                literal(user_id),
+                parent.c.id,
+                parent.c.path + id_path,
+                parent.c.depth + 1,
+                literal(comment_data.body),
+            ).join_from(new_id, parent, true())
+
+        inserted = (
+            insert(Comment)
+            .from_select(
+                ["id", "post_id", "user_id", "parent_id", "path", "depth", "body"],
+                source.where(exists(post)),
+            )
+            .returning(
+                *(getattr(Comment, name) for name in COMMENT_FIELDS), Comment.user_id
+            )
+            .cte("inserted")
+        )
+        replied = (
+            update(Comment)
+            .where(Comment.id == select(inserted.c.parent_id).scalar_subquery())
+            .values(
+                replies_count=Comment.replies_count + 1,
+                # Ответ не меняет время редактирования родителя
+                updated_at=Comment.updated_at,
+            )
+            .cte("replied")
+        )
+        query = (
+            select(
+                *schema_columns(UserSummaryReadSchema, User),
+                *(getattr(inserted.c, name) for name in COMMENT_FIELDS),
+            )
+            .join_from(inserted, User, User.id == inserted.c.user_id)
+            .add_cte(replied)
+        )
+        res = await self.session.execute(query)
+        row = res.one_or_none()
+        await self.session.commit()
+        return None if row is None else self._to_dict(row)
+
+    async def check_post_exists(self, post_id: int) -> bool:
+        query = select(exists().where(Post.id == post_id, ~Post.is_hidden))
+        return await self.session.scalar(query)
+
+    async def get_comment_tree_rows(
+        self,
+        post_id: int,
+        sort: CommentSort,
+        limit: int,
+        offset: int,
+        before: Optional[tuple],
+        depth: int,
+        max_replies: int,
+    ) -> list[dict[str, Any]]:
+        logger.debug(
+            "Получаем дерево комментариев поста #%d (%s, глубина %d) ...",
+            post_id,
+            sort,
+            depth,
+        )
+        key = self._sort_key(sort)
+        order = [column.desc() for column in key]
+
+        roots = select(Comment.id, Comment.path).where(
+            Comment.post_id == post_id, Comment.parent_id.is_(None)
+        )
+        if before is not None:
+            roots = roots.where(tuple_(*key) < before)
+        roots = (
+            roots.add_columns(func.row_number().over(order_by=order).label("rn"))
+            .order_by(*order)
+            .limit(limit + 1)
+            .offset(offset)
+            .cte("roots")
+        )
+
+        # Поддерево каждого корня - диапазон индекса (post_id, path).
+        # Лишний корень нужен только чтобы понять, есть ли следующая страница.
+        # MATERIALIZED: иначе планировщик ради LIMIT читает и сортирует
+        # все комментарии поста вместо диапазонов по корням страницы
+        tree = (
+            select(Comment)
+            .join(
+                roots,
+                and_(
+                    Comment.path >= roots.c.path,
+                    Comment.path < roots.c.path + PATH_UPPER_BOUND,
+                ),
+            )
+            .where(
+                Comment.post_id == post_id,
+                Comment.depth < depth,
+                or_(roots.c.rn <= offset + limit, Comment.id == roots.c.id),
+            )
+            .cte("tree")
+            .prefix_with("MATERIALIZED")
+        )
+        query = (
+            select(
+                *schema_columns(UserSummaryReadSchema, User),
+                *(getattr(tree.c, name) for name in COMMENT_FIELDS),
+            )
+            .join_from(tree, User, User.id == tree.c.user_id)
+            .order_by(
+                tree.c.depth,
+                *(getattr(tree.c, column.key).desc() for column in key),
+            )
+            .limit(limit + 1 + max_replies)
+        )
+        res = await self.session.execute(query)
+        return [self._to_dict(row) for row in res]
+
+    async def count_root_comments(self, post_id: int, limit: Optional[int]) -> int:
+        comments = select(Comment.id).where(
+            Comment.post_id == post_id, Comment.parent_id.is_(None)
+        )
+        if limit is not None:
+            comments = comments.limit(limit)
+        query = select(func.count()).select_from(comments.subquery())
+        return await self.session.scalar(query)
+
+    @staticmethod
+    def _sort_key(sort: CommentSort) -> tuple:
+        if sort == "top":
+            return Comment.score, Comment.id
+        return Comment.created_at, Comment.id
+
+    @staticmethod
+    def _to_dict(row) -> dict[str, Any]:
+        # Первые колонки строки - автор, остальные - комментарий
+        split = len(AUTHOR_FIELDS)
+        comment = dict(zip(COMMENT_FIELDS, row[split:]))
+        comment["author"] = dict(zip(AUTHOR_FIELDS, row[:split]))
+        return comment
+
+
+async def get_comments_repository(session: SessionDep) -> CommentsRepositoryProtocol:
+    return CommentsRepository(session)
+
+
+CommentsRepositoryDep = Annotated[
+    CommentsRepositoryProtocol, Depends(get_comments_repository)
+]
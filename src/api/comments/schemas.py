@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from api.auth.users.schemas import UserSummaryReadSchema
+
+# Порядок комментариев на каждом уровне дерева: от новых или по счету
+CommentSort = Literal["new", "top"]
+
+
+class CommentCreateSchema(BaseModel):
+    body: str = Field(min_length=1, max_length=10_000)
+    # Ответ на комментарий, None - комментарий к посту
+    parent_id: Optional[int] = None
+
+
+class CommentReadSchema(BaseModel):
+    id: int
+    parent_id: Optional[int]
+    author: UserSummaryReadSchema
+    body: str
+    depth: int
+    score: int
+    # Число прямых ответов, в том числе не попавших в дерево
+    replies_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CommentTreeSchema(CommentReadSchema):
+    replies: list["CommentTreeSchema"] = []
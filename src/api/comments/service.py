@@ -0,0 +1,203 @@
+import logging
+from datetime import datetime
+from typing import Protocol, Annotated, Optional, Any
+
+from fastapi import Depends
+
+from core import settings
+from api.posts.exceptions import PostNotFoundException
+from schemas import PaginationSchema, SearchResponseSchema
+from utils.cursor import encode_cursor, decode_cursor
+from utils.serialization import dump_search_response
+from .exceptions import CommentNotFoundException
+from .repository import CommentsRepositoryProtocol, CommentsRepositoryDep
+from .schemas import (
+    CommentCreateSchema,
+    CommentReadSchema,
+    CommentTreeSchema,
+    CommentSort,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class CommentsServiceProtocol(Protocol):
+
+    async def create_comment(
+        self,
+        user_id: int,
+        post_id: int,
+        comment_data: CommentCreateSchema,
+    ) -> CommentReadSchema:
+        pass
+
+    async def get_comment_tree(
+        self,
+        post_id: int,
+        pagination: PaginationSchema,
+        sort: CommentSort,
+        depth: int,
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[CommentTreeSchema]:
+        """
+        Получаем страницу комментариев верхнего уровня с ответами
+        не глубже depth уровней, курсор следующей страницы и число
+        комментариев верхнего уровня
+        """
+        pass
+
+    async def get_comment_tree_json(
+        self,
+        post_id: int,
+        pagination: PaginationSchema,
+        sort: CommentSort,
+        depth: int,
+        exact_count: bool = False,
+    ) -> bytes:
+        """То же, что get_comment_tree, но сразу JSON ответа из строк базы"""
+        pass
+
+
+class CommentsService:
+
+    def __init__(self, comments_repo: CommentsRepositoryProtocol):
+        self.comments_repo = comments_repo
+
+    async def create_comment(
+        self,
+        user_id: int,
+        post_id: int,
+        comment_data: CommentCreateSchema,
+    ) -> CommentReadSchema:
+        comment = await self.comments_repo.create_comment(
+            user_id, post_id, comment_data
+        )
+        if comment is None:
+            # Запрос не различает причины, проверяем пост отдельно
+            await self._check_post_exists(post_id)
+            logger.error(CommentNotFoundException.message)
+            raise CommentNotFoundException
+
+        logger.info(
+            "Пользователь #%d оставил комментарий #%d к посту #%d",
+            user_id,
+            comment["id"],
+            post_id,
+        )
+        return CommentReadSchema.model_validate(comment)
+
+    async def get_comment_tree(
+        self,
+        post_id: int,
+        pagination: PaginationSchema,
+        sort: CommentSort,
+        depth: int,
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[CommentTreeSchema]:
+        roots, next_cursor, total = await self._get_comment_tree(
+            post_id, pagination, sort, depth, exact_count
+        )
+        return SearchResponseSchema(
+            detail=[CommentTreeSchema.model_validate(root) for root in roots],
+            pagination=pagination,
+            total_found=total,
+            next_cursor=next_cursor,
+        )
+
+    async def get_comment_tree_json(
+        self,
+        post_id: int,
+        pagination: PaginationSchema,
+        sort: CommentSort,
+        depth: int,
+        exact_count: bool = False,
+    ) -> bytes:
+        # Узлы дерева уже в форме CommentTreeSchema: сразу пишем JSON
+        roots, next_cursor, total = await self._get_comment_tree(
+            post_id, pagination, sort, depth, exact_count
+        )
+        return dump_search_response(roots, pagination, total, next_cursor)
+
+    async def _get_comment_tree(
+        self,
+        post_id: int,
+        pagination: PaginationSchema,
+        sort: CommentSort,
+        depth: int,
+        exact_count: bool,
+    ) -> tuple[list[dict[str, Any]], Optional[str], int]:
+        """Корни дерева комментариев, курсор следующей страницы и их число"""
+        rows = await self.comments_repo.get_comment_tree_rows(
+            post_id,
+            sort=sort,
+            limit=pagination.limit,
+            offset=(pagination.page - 1) * pagination.limit,
+            before=self._decode_cursor(pagination, sort),
+            depth=depth,
+            max_replies=settings.comments.max_replies,
+        )
+        if not rows:
+            await self._check_post_exists(post_id)
+
+        roots = self._build_tree(rows)
+        # Лишний корень показывает, есть ли следующая страница
+        next_cursor = None
+        if len(roots) > pagination.limit:
+            roots = roots[: pagination.limit]
+            next_cursor = encode_cursor(*self._sort_key(roots[-1], sort))
+
+        limit = None if exact_count else settings.comments.count_limit
+        total = await self.comments_repo.count_root_comments(post_id, limit=limit)
+        logger.info(
+            "Выведено дерево комментариев поста #%d: %d строк", post_id, len(rows)
+        )
+        return roots, next_cursor, total
+
+    @staticmethod
+    def _build_tree(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """
+        Собирает дерево за один проход: строки упорядочены по глубине,
+        поэтому родитель каждого ответа уже встречен, а порядок ответов
+        одного родителя совпадает с порядком строк
+        """
+        nodes: dict[int, dict[str, Any]] = {}
+        roots = []
+        for row in rows:
+            row["replies"] = []
+            nodes[row["id"]] = row
+            if row["parent_id"] is None:
+                roots.append(row)
+            else:
+                nodes[row["parent_id"]]["replies"].append(row)
+        return roots
+
+    async def _check_post_exists(self, post_id: int) -> None:
+        if not await self.comments_repo.check_post_exists(post_id):
+            logger.error(PostNotFoundException.message)
+            raise PostNotFoundException
+
+    @staticmethod
+    def _sort_key(comment: dict[str, Any], sort: CommentSort) -> tuple:
+        if sort == "top":
+            return comment["score"], comment["id"]
+        return comment["created_at"], comment["id"]
+
+    @staticmethod
+    def _decode_cursor(
+        pagination: PaginationSchema,
+        sort: CommentSort,
+    ) -> Optional[tuple]:
+        if not pagination.cursor:
+            return None
+        if sort == "top":
+            return decode_cursor(pagination.cursor, int, int)
+        return decode_cursor(pagination.cursor, datetime, int)
+
+
+async def get_comments_service(
+    comments_repo: CommentsRepositoryDep,
+) -> CommentsServiceProtocol:
+    return CommentsService(comments_repo)
+
+
+CommentsServiceDep = Annotated[CommentsServiceProtocol, Depends(get_comments_service)]
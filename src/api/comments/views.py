@@ -0,0 +1,78 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response, status
+
+from api.auth import ActiveUserDep, http_bearer
+from core import settings
+from core.dependencies import PaginationDep
+from schemas import SearchResponseSchema
+from .schemas import (
+    CommentCreateSchema,
+    CommentReadSchema,
+    CommentTreeSchema,
+    CommentSort,
+)
+from .service import CommentsServiceDep
+
+router = APIRouter(
+    prefix="/posts",
+    tags=["Комментарии"],
+    dependencies=[Depends(http_bearer)],
+)
+
+
+@router.post(
+    "/{post_id}/comments",
+    status_code=status.HTTP_201_CREATED,
+    response_model=CommentReadSchema,
+)
+async def create_comment(
+    active_user: ActiveUserDep,
+    comments_service: CommentsServiceDep,
+    comment_data: CommentCreateSchema,
+    post_id: int,
+):
+    """Комментарий к посту или ответ на комментарий (parent_id)"""
+
+    return await comments_service.create_comment(
+        user_id=active_user.id, post_id=post_id, comment_data=comment_data
+    )
+
+
+@router.get(
+    "/{post_id}/comments",
+    response_model=SearchResponseSchema[CommentTreeSchema],
+)
+async def get_post_comments(
+    comments_service: CommentsServiceDep,
+    pagination: PaginationDep,
+    post_id: int,
+    sort: CommentSort = "new",
+    depth: Annotated[
+        int, Query(ge=1, le=settings.comments.max_depth)
+    ] = settings.comments.default_depth,
+    exact_count: bool = False,
+):
+    """
+    Дерево комментариев поста: страница комментариев верхнего уровня
+    с ответами не глубже depth уровней одним запросом к базе.
+    Пагинация по курсору идет по комментариям верхнего уровня
+    """
+
+    if settings.api.trusted_serialization:
+        content = await comments_service.get_comment_tree_json(
+            post_id=post_id,
+            pagination=pagination,
+            sort=sort,
+            depth=depth,
+            exact_count=exact_count,
+        )
+        return Response(content=content, media_type="application/json")
+
+    return await comments_service.get_comment_tree(
+        post_id=post_id,
+        pagination=pagination,
+        sort=sort,
+        depth=depth,
+        exact_count=exact_count,
+    )
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Sequence
+
+from .schemas import FanOutBatchReportSchema
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[
+    [Sequence[tuple[int, int]]], Awaitable[FanOutBatchReportSchema]
+]
+
+
+class FanOutBatcher:
+    """
+    Копит запросы рассылки (автор, пост) в памяти воркера и выполняет их пачкой
+    * пачка уходит, когда набралось max_size запросов или прошло window секунд
+      с первого запроса пачки
+    * каждый запрос ждет результата своей пачки, поэтому задача брокера
+      завершается только после записи ленты
+    """
+
+    def __init__(self, handler: BatchHandler, max_size: int, window: float):
+        self.handler = handler
+        self.max_size = max_size
+        self.window = window
+        self._pending: list[tuple[int, int]] = []
+        self._waiters: list[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Ссылки на выполняемые пачки, чтобы их не собрал сборщик мусора
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, author_id: int, post_id: int) -> FanOutBatchReportSchema:
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._pending.append((author_id, post_id))
+        self._waiters.append(waiter)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await waiter
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        requests, waiters = self._pending, self._waiters
+        self._pending, self._waiters = [], []
+        task = asyncio.create_task(self._run(requests, waiters))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(
+        self,
+        requests: list[tuple[int, int]],
+        waiters: list[asyncio.Future],
+    ) -> None:
+        try:
+            report = await self.handler(requests)
+        except Exception as exc:
+            logger.exception("Не удалось разослать пачку из %d постов", len(requests))
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(report)
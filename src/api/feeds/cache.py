@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import logging
+import time
+from array import array
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence
+
+from core import settings
+from .schemas import TimelineCacheStatsSchema
+
+logger = logging.getLogger(__name__)
+
+# Примерный расход памяти на объект ленты и его место в словаре кеша
+TIMELINE_OVERHEAD = 200
+
+
+class FeedVersion(NamedTuple):
+    """Версия ленты пользователя: по номеру изменения на каждый ее источник"""
+
+    # Записи в ленту пользователя
+    pushed: int
+    # Подписки пользователя
+    follows: int
+    # Подтягиваемые посты всех популярных авторов
+    pulled: int
+
+
+class Timeline:
+    """
+    id последних постов ленты от новых к старым
+    * разосланные (pushed) и подтягиваемые (pulled) посты хранятся отдельно,
+      каждая часть - не больше max_size id, и перечитываются из базы
+      независимо: разосланные - по версии pushed, подтягиваемые -
+      по версиям follows и pulled
+    * ids - обе части вперемешку, из них отдаются страницы
+    """
+
+    __slots__ = (
+        "pushed",
+        "pushed_total",
+        "pulled",
+        "pulled_total",
+        "ids",
+        "max_size",
+        "version",
+        "complete",
+        "filled_at",
+    )
+
+    def __init__(
+        self,
+        pushed: Sequence[int],
+        pushed_total: int,
+        pulled: Sequence[int],
+        pulled_total: int,
+        max_size: int,
+        version: FeedVersion,
+        filled_at: Optional[float] = None,
+    ):
+        self.pushed = array("q", pushed[:max_size])
+        self.pushed_total = pushed_total
+        self.pulled = array("q", pulled[:max_size])
+        self.pulled_total = pulled_total
+        self.max_size = max_size
+        self.version = version
+        self.filled_at = time.monotonic() if filled_at is None else filled_at
+
+        # Часть, заполненная до max_size, могла не поместиться в кеш целиком:
+        # посты старше ее последнего поста в кеше могут отсутствовать
+        parts = (self.pushed, self.pulled)
+        horizon = max(
+            (part[-1] for part in parts if len(part) >= max_size), default=None
+        )
+        merged = heapq.merge(*parts, reverse=True)
+        if horizon is not None:
+            merged = itertools.takewhile(lambda post_id: post_id >= horizon, merged)
+        self.ids = array("q", itertools.islice(merged, max_size))
+        # В кеше вся лента, дальше постов нет
+        self.complete = horizon is None and sum(map(len, parts)) <= max_size
+
+    @property
+    def size(self) -> int:
+        return len(self.ids)
+
+    @property
+    def total(self) -> int:
+        return self.pushed_total + self.pulled_total
+
+    @property
+    def nbytes(self) -> int:
+        items = len(self.pushed) + len(self.pulled) + len(self.ids)
+        return items * self.ids.itemsize + TIMELINE_OVERHEAD
+
+    def page(
+        self,
+        limit: int,
+        offset: int = 0,
+        before_post_id: Optional[int] = None,
+    ) -> Optional[list[int]]:
+        """
+        Возвращает страницу id постов
+        * None, если страница выходит за пределы кеша
+        """
+        start = offset
+        if before_post_id is not None:
+            # id в кеше убывают: ищем первый пост старше курсора
+            lo, hi = 0, self.size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.ids[mid] < before_post_id:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            start = lo
+
+        end = start + limit
+        if end > self.size and not self.complete:
+            return None
+        return self.ids[start:end].tolist()
+
+
+class TimelineCache:
+    """
+    Кеш лент пользователей в памяти процесса
+    * на пользователя хранится не больше max_size последних постов
+    * при превышении лимита памяти вытесняются давно читавшиеся ленты
+    * лента перечитывается из базы целиком не реже раза в ttl секунд
+    """
+
+    def __init__(self, max_size: int, max_memory: int, ttl: float):
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.ttl = ttl
+
+        self._timelines: OrderedDict[int, Timeline] = OrderedDict()
+        self.memory = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.window_misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: int) -> Optional[Timeline]:
+        """
+        Возвращает ленту, если она не старше ttl
+        * попадания и промахи считает вызывающий: ему виднее, совпала ли версия
+        """
+        timeline = self._timelines.get(user_id)
+        if timeline is not None and time.monotonic() - timeline.filled_at > self.ttl:
+            self.invalidate(user_id)
+            timeline = None
+
+        if timeline is not None:
+            self._timelines.move_to_end(user_id)
+        return timeline
+
+    def put(self, user_id: int, timeline: Timeline) -> None:
+        self.invalidate(user_id)
+        self._timelines[user_id] = timeline
+        self.memory += timeline.nbytes
+        self._evict()
+
+    def invalidate(self, user_id: int) -> None:
+        timeline = self._timelines.pop(user_id, None)
+        if timeline is not None:
+            self.memory -= timeline.nbytes
+
+    def stats(self) -> TimelineCacheStatsSchema:
+        lookups = self.hits + self.misses + self.refreshes
+        return TimelineCacheStatsSchema(
+            users=len(self._timelines),
+            memory_bytes=self.memory,
+            max_memory_bytes=self.max_memory,
+            timeline_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            refreshes=self.refreshes,
+            window_misses=self.window_misses,
+            evictions=self.evictions,
+            hit_ratio=self.hits / lookups if lookups else 0,
+        )
+
+    def _evict(self) -> None:
+        while self.memory > self.max_memory and self._timelines:
+            user_id, timeline = self._timelines.popitem(last=False)
+            self.memory -= timeline.nbytes
+            self.evictions += 1
+            logger.debug("Лента пользователя #%d вытеснена из кеша", user_id)
+
+
+timeline_cache = TimelineCache(
+    max_size=settings.feed_cache.timeline_size,
+    max_memory=settings.feed_cache.max_memory,
+    ttl=settings.feed_cache.ttl,
+)
@@ -0,0 +1,10 @@
+from fastapi import status
+
+from core import AppException
+
+
+class FanOutProgressNotFoundException(AppException):
+    message: str = "Рассылка по этой задаче не найдена"
+
+    def __init__(self, message: str = message):
+        super().__init__(message, status_code=status.HTTP_404_NOT_FOUND)
@@ -1,9 +1,24 @@
+from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy import (
+    ForeignKey,
+    UniqueConstraint,
+    Index,
+    BigInteger,
+    Integer,
+    Float,
+    String,
+    LargeBinary,
+    DateTime,
+    text,
+    event,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from models import Base
+from core import settings
+from models import Base, DateMixin
 
 if TYPE_CHECKING:
     from api.auth.users.models import User
@@ -18,13 +33,44 @@ class UserFeed(Base):
             "recipient_id",
             "post_id",
         ),
+        # Лента читается от новых постов к старым по курсору
+        Index(
+            "ix_users_feed_recipient_id_post_id",
+            "recipient_id",
+            text("post_id DESC"),
+        ),
+        # Очистка ленты и удаление постов идут по post_id
+        Index("ix_users_feed_post_id", "post_id"),
+        # Сортировки hot и top читают ленту по рейтингу без сортировки
+        Index(
+            "ix_users_feed_recipient_id_hot_score",
+            "recipient_id",
+            text("hot_score DESC"),
+            text("post_id DESC"),
+        ),
+        Index(
+            "ix_users_feed_recipient_id_score",
+            "recipient_id",
+            text("score DESC"),
+            text("post_id DESC"),
+        ),
+        # Таблица разбита на hash-секции по получателю: чтение ленты идет
+        # в одну секцию, а vacuum и индексы растут посекционно
+        {"postgresql_partition_by": "HASH (recipient_id)"},
     )
     repr_cols_num = 5
 
     # Колонки
+    id: Mapped[int] = mapped_column(primary_key=True, index=True, autoincrement=True)
     author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
-    recipient_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    # Ключ секционирования обязан входить в первичный ключ
+    recipient_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id"), primary_key=True
+    )
     post_id: Mapped[int] = mapped_column(ForeignKey("posts.id"))
+    # Копии рейтингов поста, чтобы читать ленту по индексу получателя
+    hot_score: Mapped[float] = mapped_column(Float, server_default="0")
+    score: Mapped[int] = mapped_column(server_default="0")
 
     # Отношения
     author: Mapped["User"] = relationship(
@@ -32,3 +78,89 @@ class UserFeed(Base):
         primaryjoin="UserFeed.author_id == User.id",
     )
     post: Mapped["Post"] = relationship(backref="feed")
+
+
+@event.listens_for(UserFeed.__table__, "after_create")
+def create_user_feed_partitions(target, connection, **kw) -> None:
+    """Создает секции users_feed, если таблица создается не миграцией"""
+    partitions = settings.feed.partitions
+    for remainder in range(partitions):
+        connection.execute(
+            text(
+                f"CREATE TABLE {target.name}_p{remainder} PARTITION OF {target.name} "
+                f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            )
+        )
+
+
+class UserFeedCounter(Base):
+    """Счетчики ленты пользователя"""
+
+    __tablename__ = "users_feed_counters"
+
+    # Колонки
+    recipient_id: Mapped[int] = mapped_column(ForeignKey("users.id"), unique=True)
+    # Количество разосланных новостей
+    events_count: Mapped[int] = mapped_column(
+        BigInteger, default=0, server_default=text("0")
+    )
+    # Номера изменений, по которым кеш лент узнает, что ленту пора перечитать.
+    # Ленты без счетчика - версии 0
+    # * version растет с каждой записью в ленту получателя
+    # * follows_version - с его подпиской или отпиской: они меняют
+    #   подтягиваемые в ленту посты
+    version: Mapped[int] = mapped_column(BigInteger, server_default=text("1"))
+    follows_version: Mapped[int] = mapped_column(
+        BigInteger, server_default=text("0")
+    )
+
+
+class PulledPostsVersion(Base):
+    """
+    Номер изменения подтягиваемых постов популярных авторов: одна строка
+    на всю базу, растет с каждым новым подтягиваемым постом
+    """
+
+    __tablename__ = "pulled_posts_version"
+
+    # Колонки
+    version: Mapped[int] = mapped_column(BigInteger, server_default=text("1"))
+
+
+# id единственной строки pulled_posts_version
+PULLED_POSTS_VERSION_ID = 1
+
+
+class FanOutProgress(Base, DateMixin):
+    """Прогресс рассылки поста по id задачи брокера"""
+
+    __tablename__ = "fanout_progress"
+
+    # Колонки
+    task_id: Mapped[str] = mapped_column(String(64), unique=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"))
+    chunks_total: Mapped[int]
+    # Номера выполненных диапазонов: повтор задачи не учитывается дважды
+    done_chunks: Mapped[list[int]] = mapped_column(
+        ARRAY(Integer), default=list, server_default=text("'{}'")
+    )
+    # Пост не рассылался и подтягивается при чтении ленты
+    pulled: Mapped[bool] = mapped_column(default=False, server_default=text("false"))
+
+
+class FeedItem(Base):
+    """Готовая к отдаче новость ленты о посте: автор и пост в JSON"""
+
+    __tablename__ = "feed_items"
+
+    # Колонки
+    post_id: Mapped[int] = mapped_column(
+        ForeignKey("posts.id", ondelete="CASCADE"), unique=True
+    )
+    # Новости автора обновляются при изменении его данных
+    author_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    # Версия данных, из которых собрана новость: позднейший updated_at поста
+    # и автора. Новость с другой версией устарела и собирается заново
+    source_updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
@@ -1,13 +1,50 @@
 import logging
-from typing import Protocol, Annotated, Sequence
+from datetime import datetime, timedelta
+from typing import Protocol, Annotated, Sequence, Optional, Any
 
 from fastapi import Depends
-from sqlalchemy import select, func
+from sqlalchemy import (
+    select,
+    func,
+    literal,
+    update,
+    delete,
+    union_all,
+    or_,
+    exists,
+    ColumnElement,
+    Integer,
+    values,
+    column,
+    true,
+    text,
+    and_,
+    tuple_,
+    Select,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, aliased
 
+from api.auth.users.models import User
+from api.auth.users.schemas import UserSummaryReadSchema
+from api.follows.models import Follow
+from api.posts.models import Post
+from api.posts.ranking import hot_score
+from api.posts.schemas import PostReadSchema
+from core import settings
 from core.dependencies import SessionDep
-from .models import UserFeed
+from utils.serialization import schema_columns
+from .cache import TimelineCache, Timeline, FeedVersion, timeline_cache
+from .models import (
+    UserFeed,
+    UserFeedCounter,
+    PulledPostsVersion,
+    PULLED_POSTS_VERSION_ID,
+    FanOutProgress,
+    FeedItem,
+)
+from .schemas import FeedSort
 
 logger = logging.getLogger(__name__)
 
@@ -15,31 +52,311 @@ logger = logging.getLogger(__name__)
 class FeedRepositoryProtocol(Protocol):
     """Репозиторий для новостей пользователей"""
 
-    async def create_event_for_users(
+    async def create_events_chunk(
         self,
         author_id: int,
-        recipients_ids: list[int],
         post_id: int,
-    ) -> None:
-        """Создает новость для пользователей (подписчиков)"""
+        after_follower_id: int,
+        limit: int,
+        upto_follower_id: Optional[int] = None,
+    ) -> tuple[Optional[int], int]:
+        """
+        Создает новость для следующей пачки подписчиков автора одним запросом
+        * подписчики берутся по возрастанию id, начиная после after_follower_id
+          и не дальше upto_follower_id
+        * возвращает id последнего подписчика пачки (None, если пачка пуста)
+          и количество действительно добавленных новостей
+        * счетчики новостей и версии лент получателей растут в том же запросе
+        """
         pass
 
-    async def get_count_events(self, user_id: int) -> int:
+    async def create_events_batch_chunk(
+        self,
+        cursors: dict[int, int],
+        posts: Sequence[tuple[int, int]],
+        limit: int,
+    ) -> tuple[dict[int, int], int]:
+        """
+        Создает новости сразу для нескольких авторов и их постов одним запросом
+        * cursors - id последнего обработанного подписчика каждого автора
+        * posts - пары (автор, пост), подписчики каждого автора берутся один раз
+          на все его посты, не больше limit за вызов
+        * возвращает курсоры авторов, у которых могли остаться подписчики,
+          и количество действительно добавленных новостей
+        * счетчики новостей и версии лент получателей растут в том же запросе
+        """
+        pass
+
+    async def mark_post_pulled(self, post_id: int) -> None:
+        """
+        Помечает пост как не разосланный
+        * такой пост подтягивается в ленту подписчиков при чтении
+        * версия подтягиваемых постов растет в той же транзакции
+        """
+        pass
+
+    async def get_count_events(self, user_id: int, exact: bool = False) -> int:
         """
         Получает количество всех новостей для пользователя
+        * разосланные новости и подтягиваемые посты популярных авторов
+        * разосланные берутся из счетчика, exact пересчитывает их по users_feed
         * Для полноценного вывода с пагинацией
         """
         pass
 
-    async def get_full_events_with_authors(
+    async def get_feed_version(self, user_id: int) -> FeedVersion:
+        """
+        Получает версию ленты пользователя без чтения самой ленты,
+        только чтениями по ключу
+        * номера изменений разосланных новостей и подписок пользователя
+          (0 без счетчика)
+        * номер изменения подтягиваемых постов, общий для всех лент
+        """
+        pass
+
+    async def get_pushed_feed(
+        self,
+        user_id: int,
+        limit: int,
+    ) -> tuple[Sequence[int], int]:
+        """
+        Получает id не больше limit последних разосланных пользователю постов
+        от новых к старым и общее число разосланных ему новостей
+        """
+        pass
+
+    async def get_pulled_feed(
+        self,
+        user_id: int,
+        limit: int,
+    ) -> tuple[Sequence[int], int]:
+        """
+        Получает id не больше limit последних подтягиваемых в ленту
+        пользователя постов от новых к старым и их общее число
+        """
+        pass
+
+    async def reconcile_counters(
+        self,
+        after_recipient_id: int,
+        limit: int,
+    ) -> tuple[Optional[int], int]:
+        """
+        Сверяет счетчики новостей следующей пачки пользователей с users_feed
+        * возвращает id последнего пользователя пачки (None, если пачка пуста)
+          и количество исправленных счетчиков
+        * исправленные счетчики сдвигают версию ленты
+        """
+        pass
+
+    async def save_fanout_progress(
+        self,
+        task_id: str,
+        author_id: int,
+        post_id: int,
+        chunks_total: int,
+        pulled: bool = False,
+    ) -> None:
+        """
+        Заводит прогресс рассылки поста по задаче
+        * повторная доставка задачи начинает прогресс заново
+        """
+        pass
+
+    async def complete_fanout_chunk(self, task_id: str, chunk_no: int) -> None:
+        """
+        Отмечает диапазон рассылки выполненным
+        * повторная отметка того же диапазона ничего не меняет
+        """
+        pass
+
+    async def get_fanout_progress(self, task_id: str) -> Optional[FanOutProgress]:
+        """Получает прогресс рассылки по задаче"""
+        pass
+
+    async def delete_fanout_progress(self, max_age: timedelta) -> int:
+        """Удаляет прогресс рассылок старше max_age, возвращает число удаленных"""
+        pass
+
+    async def get_retention_horizon(self, max_age: timedelta) -> Optional[int]:
+        """
+        Получает id самого нового поста старше max_age
+        * новости с таким и меньшим post_id выходят за срок хранения
+        """
+        pass
+
+    async def delete_events_up_to(self, post_id: int, limit: int) -> int:
+        """
+        Удаляет не больше limit новостей с post_id не больше указанного
+        * счетчики новостей получателей уменьшаются в том же запросе
+        * возвращает количество удаленных новостей
+        """
+        pass
+
+    async def get_overflowing_recipients(
+        self,
+        max_entries: int,
+        after_recipient_id: int,
+        limit: int,
+    ) -> Sequence[int]:
+        """
+        Получает id следующей пачки пользователей, у которых новостей больше max_entries
+        * по счетчикам новостей, по возрастанию id после after_recipient_id
+        """
+        pass
+
+    async def trim_recipient_events(
+        self,
+        recipient_id: int,
+        keep: int,
+        limit: int,
+    ) -> int:
+        """
+        Удаляет не больше limit новостей пользователя, кроме keep самых новых
+        * счетчик новостей пользователя уменьшается в том же запросе
+        * возвращает количество удаленных новостей
+        """
+        pass
+
+    async def delete_post_events(self, post_id: int, limit: int) -> int:
+        """
+        Удаляет не больше limit новостей о посте из лент получателей
+        * счетчики новостей получателей уменьшаются в том же запросе
+        * возвращает количество удаленных новостей
+        """
+        pass
+
+    async def backfill_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        """
+        Добавляет в ленту подписчика не больше limit последних постов автора
+        одним запросом
+        * только пока подписка существует, уже добавленные посты пропускаются
+        * счетчик новостей подписчика увеличивается в том же запросе
+        * возвращает количество добавленных новостей
+        """
+        pass
+
+    async def retract_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        """
+        Удаляет не больше limit новостей автора из ленты бывшего подписчика
+        * только если подписки больше нет
+        * возвращает количество удаленных новостей
+        """
+        pass
+
+    async def delete_hidden_post(self, post_id: int) -> bool:
+        """
+        Окончательно удаляет скрытый пост, когда его не осталось в лентах
+        * возвращает False, если скрытого поста нет
+        """
+        pass
+
+    async def get_feed_post_ids(
         self,
         user_id: int,
-        offset: int,
         limit: int,
-    ) -> Sequence[UserFeed]:
+        offset: int = 0,
+        before_post_id: Optional[int] = None,
+    ) -> Sequence[int]:
+        """
+        Получаем id постов ленты пользователя от новых к старым
+        * объединяет разосланные новости и подтягиваемые посты
+        * с пагинацией по странице (offset) или по курсору (before_post_id)
+        """
+        pass
+
+    async def get_ranked_feed_post_ids(
+        self,
+        user_id: int,
+        sort: FeedSort,
+        limit: int,
+        offset: int = 0,
+        before: Optional[tuple[float, int]] = None,
+    ) -> Sequence[tuple[int, float]]:
+        """
+        Получаем id постов ленты пользователя с их рейтингом по убыванию
+        рейтинга hot или счета (top)
+        * с пагинацией по странице (offset) или по курсору (before)
+        """
+        pass
+
+    async def refresh_hot_scores(self, limit: int) -> int:
+        """
+        Пересчитываем рейтинг hot до limit постов с изменившимся счетом
+        и копируем рейтинги в строки лент, возвращаем число постов
+        """
+        pass
+
+    async def get_posts_with_authors(self, post_ids: Sequence[int]) -> Sequence[Post]:
+        """
+        Получаем посты с их авторами
+        * в порядке переданных id, отсутствующие посты пропускаются
+        """
+        pass
+
+    async def get_posts_version(
+        self,
+        post_ids: Sequence[int],
+    ) -> tuple[Optional[datetime], int]:
         """
-        Получаем полную информацию о новости для пользователя с автором
-        * с пагинацией
+        Получаем время последнего изменения видимых постов и их авторов
+        и число видимых постов - версию новостей без их чтения
+        """
+        pass
+
+    async def get_feed_rows(self, post_ids: Sequence[int]) -> list[dict[str, Any]]:
+        """
+        Получаем новости о постах строками с полями FeedDetailSchema
+        * в порядке переданных id, отсутствующие посты пропускаются
+        """
+        pass
+
+    async def get_feed_item_rows(
+        self,
+        post_ids: Sequence[int],
+    ) -> list[tuple[datetime, dict[str, Any]]]:
+        """
+        То же, что get_feed_rows, но вместе с версией данных для готовой новости:
+        позднейшим updated_at поста и автора
+        """
+        pass
+
+    async def get_feed_items(self, post_ids: Sequence[int]) -> dict[int, bytes]:
+        """
+        Получаем готовые JSON новости о постах по их id
+        * новости, собранные до изменения поста или автора, и новости
+          о скрытых постах не возвращаются
+        """
+        pass
+
+    async def save_feed_items(
+        self,
+        items: Sequence[tuple[int, int, datetime, bytes]],
+    ) -> None:
+        """
+        Сохраняем готовые новости (пост, автор, версия данных, JSON)
+        * новость заменяется, только если она собрана из более новых данных
+        """
+        pass
+
+    async def delete_author_feed_items(self, author_id: int) -> int:
+        """Удаляем готовые новости о постах автора, возвращаем число удаленных"""
+        pass
+
+    async def get_feed_items_stats(self) -> tuple[int, int, int, int]:
+        """
+        Получаем число готовых новостей, размер их JSON, размер таблицы
+        feed_items и размер таблиц постов и пользователей в байтах
         """
         pass
 
@@ -49,62 +366,1206 @@ class FeedRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def create_event_for_users(
+    async def create_events_chunk(
         self,
         author_id: int,
-        recipients_ids: list[int],
         post_id: int,
-    ) -> None:
-        logger.debug(f"Создаем события для пользователей #({recipients_ids}) ...")
-        self.session.add_all(
-            [
-                UserFeed(
-                    author_id=author_id,
-                    recipient_id=recipient_id,
-                    post_id=post_id,
+        after_follower_id: int,
+        limit: int,
+        upto_follower_id: Optional[int] = None,
+    ) -> tuple[Optional[int], int]:
+        logger.debug(
+            "Создаем события поста #%d для подписчиков пользователя #%d после id=%d ...",
+            post_id,
+            author_id,
+            after_follower_id,
+        )
+        chunk = select(Follow.follower_id).where(
+            Follow.followee_id == author_id,
+            Follow.follower_id > after_follower_id,
+            # Удаленный автором пост больше не рассылаем
+            exists().where(Post.id == post_id, ~Post.is_hidden),
+        )
+        if upto_follower_id is not None:
+            chunk = chunk.where(Follow.follower_id <= upto_follower_id)
+        chunk = chunk.order_by(Follow.follower_id).limit(limit).cte("chunk")
+        # Строки ленты собираются и вставляются целиком на стороне базы
+        inserted = (
+            insert(UserFeed)
+            .from_select(
+                ["author_id", "recipient_id", "post_id", "hot_score", "score"],
+                select(
+                    literal(author_id),
+                    chunk.c.follower_id,
+                    Post.id,
+                    Post.hot_score,
+                    Post.score,
                 )
-                for recipient_id in recipients_ids
-            ]
+                .join_from(chunk, Post, Post.id == post_id)
+                # Пересчет рейтинга ждет конца рассылки и видит новые строки
+                .with_for_update(read=True, of=Post),
+            )
+            .on_conflict_do_nothing(
+                index_elements=["author_id", "recipient_id", "post_id"]
+            )
+            .returning(UserFeed.recipient_id)
+            .cte("inserted")
+        )
+        # Счетчики блокируются по возрастанию id, чтобы параллельные рассылки
+        # не взаимоблокировались
+        counted = insert(UserFeedCounter).from_select(
+            ["recipient_id", "events_count"],
+            select(inserted.c.recipient_id, literal(1)).order_by(
+                inserted.c.recipient_id
+            ),
         )
+        counted = counted.on_conflict_do_update(
+            index_elements=["recipient_id"],
+            set_={
+                "events_count": UserFeedCounter.events_count + 1,
+                "version": UserFeedCounter.version + 1,
+            },
+        ).cte("counted")
+        query = select(
+            select(func.max(chunk.c.follower_id)).scalar_subquery(),
+            select(func.count()).select_from(inserted).scalar_subquery(),
+        ).add_cte(counted)
+        res = await self.session.execute(query)
+        last_follower_id, inserted_count = res.one()
+
+        await self.session.commit()
+        return last_follower_id, inserted_count
+
+    async def create_events_batch_chunk(
+        self,
+        cursors: dict[int, int],
+        posts: Sequence[tuple[int, int]],
+        limit: int,
+    ) -> tuple[dict[int, int], int]:
+        logger.debug(
+            "Создаем события %d постов для подписчиков %d авторов ...",
+            len(posts),
+            len(cursors),
+        )
+        authors = values(
+            column("author_id", Integer),
+            column("after_follower_id", Integer),
+            name="authors",
+        ).data(list(cursors.items()))
+        new_posts = values(
+            column("author_id", Integer),
+            column("post_id", Integer),
+            name="new_posts",
+        ).data(list(posts))
+        # Следующая пачка подписчиков каждого автора
+        followers = (
+            select(Follow.follower_id)
+            .where(
+                Follow.followee_id == authors.c.author_id,
+                Follow.follower_id > authors.c.after_follower_id,
+            )
+            .order_by(Follow.follower_id)
+            .limit(limit)
+            .lateral("followers")
+        )
+        chunk = (
+            select(authors.c.author_id, followers.c.follower_id)
+            .select_from(authors.join(followers, true()))
+            .cte("chunk")
+        )
+        inserted = (
+            insert(UserFeed)
+            .from_select(
+                ["author_id", "recipient_id", "post_id", "hot_score", "score"],
+                select(
+                    chunk.c.author_id,
+                    chunk.c.follower_id,
+                    new_posts.c.post_id,
+                    Post.hot_score,
+                    Post.score,
+                )
+                .join_from(
+                    chunk, new_posts, new_posts.c.author_id == chunk.c.author_id
+                )
+                # Удаленные автором посты больше не рассылаем
+                .join(Post, and_(Post.id == new_posts.c.post_id, ~Post.is_hidden))
+                .with_for_update(read=True, of=Post),
+            )
+            .on_conflict_do_nothing(
+                index_elements=["author_id", "recipient_id", "post_id"]
+            )
+            .returning(UserFeed.recipient_id)
+            .cte("inserted")
+        )
+        # Получатель может получить несколько постов пачки сразу
+        counted = insert(UserFeedCounter).from_select(
+            ["recipient_id", "events_count"],
+            select(inserted.c.recipient_id, func.count())
+            .group_by(inserted.c.recipient_id)
+            .order_by(inserted.c.recipient_id),
+        )
+        counted = counted.on_conflict_do_update(
+            index_elements=["recipient_id"],
+            set_={
+                "events_count": UserFeedCounter.events_count
+                + counted.excluded.events_count,
+                "version": UserFeedCounter.version + 1,
+            },
+        ).cte("counted")
+        query = (
+            select(
+                chunk.c.author_id,
+                func.max(chunk.c.follower_id),
+                func.count(),
+                select(func.count()).select_from(inserted).scalar_subquery(),
+            )
+            .group_by(chunk.c.author_id)
+            .add_cte(counted)
+        )
+        res = await self.session.execute(query)
+        rows = res.all()
+
+        await self.session.commit()
+        # Неполная пачка значит, что подписчики автора закончились
+        next_cursors = {
+            author_id: last_follower_id
+            for author_id, last_follower_id, followers_count, _ in rows
+            if followers_count >= limit
+        }
+        inserted_count = rows[0][3] if rows else 0
+        return next_cursors, inserted_count
 
+    async def mark_post_pulled(self, post_id: int) -> None:
+        logger.debug("Помечаем пост #%d как подтягиваемый при чтении ...", post_id)
+        stmt = update(Post).filter_by(id=post_id).values(is_pulled=True)
+        await self.session.execute(stmt)
+        # Кеш лент узнает о новом подтягиваемом посте по общей версии
+        stmt = insert(PulledPostsVersion).values(id=PULLED_POSTS_VERSION_ID)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": PulledPostsVersion.version + 1},
+        )
+        await self.session.execute(stmt)
         await self.session.commit()
         return
 
-    async def get_count_events(self, user_id: int) -> int:
+    async def get_count_events(self, user_id: int, exact: bool = False) -> int:
         logger.debug(
             f"Получаем общее количество новостей для пользователя #%d ...",
             user_id,
         )
-        query = select(func.count(UserFeed.id).filter(UserFeed.recipient_id == user_id))
+        if exact:
+            pushed = select(func.count(UserFeed.id)).where(
+                UserFeed.recipient_id == user_id
+            )
+        else:
+            pushed = select(self._pushed_count(user_id))
+        pulled = self._pulled_posts(user_id, func.count(Post.id))
+        query = select(pushed.scalar_subquery() + pulled.scalar_subquery())
         res = await self.session.execute(query)
         return res.scalar_one()
 
-    async def get_full_events_with_authors(
+    async def get_feed_version(self, user_id: int) -> FeedVersion:
+        logger.debug("Получаем версию ленты пользователя #%d ...", user_id)
+        pushed = select(UserFeedCounter.version).filter_by(recipient_id=user_id)
+        follows = select(UserFeedCounter.follows_version).filter_by(
+            recipient_id=user_id
+        )
+        pulled = select(PulledPostsVersion.version).filter_by(
+            id=PULLED_POSTS_VERSION_ID
+        )
+        query = select(
+            *(
+                func.coalesce(version.scalar_subquery(), 0)
+                for version in (pushed, follows, pulled)
+            )
+        )
+        res = await self.session.execute(query)
+        return FeedVersion(*res.one())
+
+    async def get_pushed_feed(
         self,
         user_id: int,
-        offset: int,
         limit: int,
-    ) -> Sequence[UserFeed]:
+    ) -> tuple[Sequence[int], int]:
+        logger.debug("Получаем разосланные пользователю #%d посты ...", user_id)
+        query = (
+            self._pushed_posts(user_id, UserFeed.post_id)
+            .order_by(UserFeed.post_id.desc())
+            .limit(limit)
+        )
+        res = await self.session.scalars(query)
+        post_ids = res.all()
+
+        total = len(post_ids)
+        if total >= limit:
+            total = await self.session.scalar(select(self._pushed_count(user_id)))
+        return post_ids, total
+
+    async def get_pulled_feed(
+        self,
+        user_id: int,
+        limit: int,
+    ) -> tuple[Sequence[int], int]:
+        logger.debug("Получаем подтягиваемые в ленту #%d посты ...", user_id)
+        query = (
+            self._pulled_posts(user_id, Post.id)
+            .order_by(Post.id.desc())
+            .limit(limit)
+        )
+        res = await self.session.scalars(query)
+        post_ids = res.all()
+
+        # Подтягиваемых постов обычно меньше limit, и считать их отдельно не нужно
+        total = len(post_ids)
+        if total >= limit:
+            query = self._pulled_posts(user_id, func.count(Post.id))
+            total = await self.session.scalar(query)
+        return post_ids, total
+
+    async def reconcile_counters(
+        self,
+        after_recipient_id: int,
+        limit: int,
+    ) -> tuple[Optional[int], int]:
         logger.debug(
-            f"Получаем подробные новости пользователя #%d с их авторами  ...",
-            user_id,
+            "Сверяем счетчики новостей пользователей после id=%d ...",
+            after_recipient_id,
+        )
+        res = await self.session.scalars(
+            select(User.id)
+            .where(User.id > after_recipient_id)
+            .order_by(User.id)
+            .limit(limit)
+        )
+        recipient_ids = res.all()
+        if not recipient_ids:
+            return None, 0
+
+        # Счетчики пачки блокируются до подсчета: рассылки, записавшие их раньше,
+        # попадут в подсчет, а остальные увеличат счетчик уже после сверки.
+        # Порядок блокировок тот же, что у рассылок
+        res = await self.session.scalars(
+            select(UserFeedCounter.recipient_id)
+            .where(UserFeedCounter.recipient_id.in_(recipient_ids))
+            .order_by(UserFeedCounter.recipient_id)
+            .with_for_update()
         )
+        locked_ids = res.all()
+
+        batch = select(User.id).where(User.id.in_(recipient_ids)).cte("batch")
+        feed = aliased(UserFeed)
+        actual = select(
+            batch.c.id.label("recipient_id"),
+            select(func.count(feed.id))
+            .where(feed.recipient_id == batch.c.id)
+            .scalar_subquery()
+            .label("events_count"),
+        ).subquery("actual")
+        # Пользователям без ленты и без счетчика нулевой счетчик не заводим.
+        # Счетчик, заведенный рассылкой уже после блокировки, сверится
+        # в следующий раз
+        fixed = insert(UserFeedCounter).from_select(
+            ["recipient_id", "events_count"],
+            select(actual.c.recipient_id, actual.c.events_count).where(
+                or_(
+                    actual.c.events_count > 0,
+                    exists().where(
+                        UserFeedCounter.recipient_id == actual.c.recipient_id
+                    ),
+                )
+            ),
+        )
+        fixed = (
+            fixed.on_conflict_do_update(
+                index_elements=["recipient_id"],
+                set_={
+                    "events_count": fixed.excluded.events_count,
+                    "version": UserFeedCounter.version + 1,
+                },
+                where=and_(
+                    UserFeedCounter.recipient_id.in_(locked_ids),
+                    UserFeedCounter.events_count != fixed.excluded.events_count,
+                ),
+            )
+            .returning(UserFeedCounter.recipient_id)
+            .cte("fixed")
+        )
+        query = select(func.count()).select_from(fixed)
+        fixed_count = await self.session.scalar(query)
+
+        await self.session.commit()
+        return recipient_ids[-1], fixed_count
+
+    async def save_fanout_progress(
+        self,
+        task_id: str,
+        author_id: int,
+        post_id: int,
+        chunks_total: int,
+        pulled: bool = False,
+    ) -> None:
+        logger.debug(
+            "Заводим прогресс рассылки поста #%d по задаче %s из %d диапазонов ...",
+            post_id,
+            task_id,
+            chunks_total,
+        )
+        stmt = insert(FanOutProgress).values(
+            task_id=task_id,
+            author_id=author_id,
+            post_id=post_id,
+            chunks_total=chunks_total,
+            pulled=pulled,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["task_id"],
+            set_={
+                "chunks_total": stmt.excluded.chunks_total,
+                "pulled": stmt.excluded.pulled,
+                "done_chunks": text("'{}'"),
+                "updated_at": func.now(),
+            },
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+        return
+
+    async def complete_fanout_chunk(self, task_id: str, chunk_no: int) -> None:
+        logger.debug("Диапазон #%d рассылки %s выполнен", chunk_no, task_id)
+        stmt = (
+            update(FanOutProgress)
+            .where(
+                FanOutProgress.task_id == task_id,
+                ~FanOutProgress.done_chunks.contains([chunk_no]),
+            )
+            .values(
+                done_chunks=func.array_append(FanOutProgress.done_chunks, chunk_no),
+                updated_at=func.now(),
+            )
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+        return
+
+    async def get_fanout_progress(self, task_id: str) -> Optional[FanOutProgress]:
+        logger.debug("Получаем прогресс рассылки по задаче %s ...", task_id)
+        query = select(FanOutProgress).filter_by(task_id=task_id)
+        return await self.session.scalar(query)
+
+    async def delete_fanout_progress(self, max_age: timedelta) -> int:
+        logger.debug("Удаляем прогресс рассылок старше %s ...", max_age)
+        stmt = delete(FanOutProgress).where(
+            FanOutProgress.created_at < func.now() - max_age
+        )
+        res = await self.session.execute(stmt)
+        await self.session.commit()
+        return res.rowcount
+
+    async def get_retention_horizon(self, max_age: timedelta) -> Optional[int]:
+        logger.debug("Ищем границу хранения ленты старше %s ...", max_age)
         query = (
-            select(UserFeed)
-            .options(
-                joinedload(UserFeed.author),
-                joinedload(UserFeed.post),
+            select(Post.id)
+            .where(Post.created_at < func.now() - max_age)
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(1)
+        )
+        res = await self.session.execute(query)
+        return res.scalar_one_or_none()
+
+    async def delete_events_up_to(self, post_id: int, limit: int) -> int:
+        logger.debug("Удаляем новости с постами до #%d включительно ...", post_id)
+        return await self._delete_events(UserFeed.post_id <= post_id, limit)
+
+    async def get_overflowing_recipients(
+        self,
+        max_entries: int,
+        after_recipient_id: int,
+        limit: int,
+    ) -> Sequence[int]:
+        logger.debug(
+            "Ищем пользователей с лентой больше %d новостей после id=%d ...",
+            max_entries,
+            after_recipient_id,
+        )
+        query = (
+            select(UserFeedCounter.recipient_id)
+            .where(
+                UserFeedCounter.recipient_id > after_recipient_id,
+                UserFeedCounter.events_count > max_entries,
             )
-            .filter_by(recipient_id=user_id)
+            .order_by(UserFeedCounter.recipient_id)
+            .limit(limit)
+        )
+        res = await self.session.scalars(query)
+        return res.all()
+
+    async def trim_recipient_events(
+        self,
+        recipient_id: int,
+        keep: int,
+        limit: int,
+    ) -> int:
+        logger.debug(
+            "Обрезаем ленту пользователя #%d до %d новостей ...", recipient_id, keep
+        )
+        condition = UserFeed.recipient_id == recipient_id
+        # Лимит 0 очищает ленту целиком
+        if keep > 0:
+            # Самая старая из оставляемых новостей - по индексу ленты получателя
+            oldest_kept = (
+                select(UserFeed.post_id)
+                .where(UserFeed.recipient_id == recipient_id)
+                .order_by(UserFeed.post_id.desc())
+                .offset(keep - 1)
+                .limit(1)
+                .scalar_subquery()
+            )
+            condition &= UserFeed.post_id < oldest_kept
+        return await self._delete_events(condition, limit)
+
+    async def delete_post_events(self, post_id: int, limit: int) -> int:
+        logger.debug("Удаляем пост #%d из лент получателей ...", post_id)
+        return await self._delete_events(UserFeed.post_id == post_id, limit)
+
+    async def backfill_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        logger.debug(
+            "Добавляем последние посты пользователя #%d в ленту подписчика #%d ...",
+            author_id,
+            follower_id,
+        )
+        # Подтягиваемые посты и так попадают в ленту при чтении
+        posts = (
+            select(
+                literal(author_id),
+                literal(follower_id),
+                Post.id,
+                Post.hot_score,
+                Post.score,
+            )
+            .where(
+                Post.user_id == author_id,
+                ~Post.is_pulled,
+                ~Post.is_hidden,
+                exists().where(
+                    Follow.follower_id == follower_id,
+                    Follow.followee_id == author_id,
+                ),
+            )
+            .order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit)
+            .with_for_update(read=True)
+        )
+        if settings.feed.retention_max_age is not None:
+            posts = posts.where(
+                Post.created_at >= func.now() - settings.feed.retention_max_age
+            )
+        inserted = (
+            insert(UserFeed)
+            .from_select(
+                ["author_id", "recipient_id", "post_id", "hot_score", "score"], posts
+            )
+            .on_conflict_do_nothing(
+                index_elements=["author_id", "recipient_id", "post_id"]
+            )
+            .returning(UserFeed.recipient_id)
+            .cte("inserted")
+        )
+        counted = insert(UserFeedCounter).from_select(
+            ["recipient_id", "events_count"],
+            select(inserted.c.recipient_id, func.count()).group_by(
+                inserted.c.recipient_id
+            ),
+        )
+        counted = counted.on_conflict_do_update(
+            index_elements=["recipient_id"],
+            set_={
+                "events_count": UserFeedCounter.events_count
+                + counted.excluded.events_count,
+                "version": UserFeedCounter.version + 1,
+            },
+        ).cte("counted")
+        query = select(func.count()).select_from(inserted).add_cte(counted)
+        res = await self.session.execute(query)
+        inserted_count = res.scalar_one()
+
+        await self.session.commit()
+        return inserted_count
+
+    async def retract_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        logger.debug(
+            "Удаляем посты пользователя #%d из ленты бывшего подписчика #%d ...",
+            author_id,
+            follower_id,
+        )
+        # Пользователь мог подписаться снова, пока задача ждала очереди
+        return await self._delete_events(
+            and_(
+                UserFeed.recipient_id == follower_id,
+                UserFeed.author_id == author_id,
+                ~exists().where(
+                    Follow.follower_id == follower_id,
+                    Follow.followee_id == author_id,
+                ),
+            ),
+            limit,
+        )
+
+    async def delete_hidden_post(self, post_id: int) -> bool:
+        logger.debug("Окончательно удаляем скрытый пост #%d ...", post_id)
+        stmt = delete(Post).where(Post.id == post_id, Post.is_hidden)
+        res = await self.session.execute(stmt)
+        await self.session.commit()
+        return res.rowcount > 0
+
+    async def _delete_events(self, condition: ColumnElement[bool], limit: int) -> int:
+        """
+        Удаляет пачку новостей по условию, уменьшает счетчики получателей
+        и сдвигает версии их лент
+        """
+        victims = select(UserFeed.id).where(condition).limit(limit)
+        deleted = (
+            delete(UserFeed)
+            .where(UserFeed.id.in_(victims))
+            .returning(UserFeed.recipient_id)
+            .cte("deleted")
+        )
+        per_recipient = (
+            select(deleted.c.recipient_id, func.count().label("events_count"))
+            .group_by(deleted.c.recipient_id)
+            .cte("per_recipient")
+        )
+        # Счетчики блокируются по возрастанию id, как и при рассылке,
+        # чтобы очистка не взаимоблокировалась с ней
+        locked = (
+            select(UserFeedCounter.recipient_id)
+            .where(
+                UserFeedCounter.recipient_id.in_(select(per_recipient.c.recipient_id))
+            )
+            .order_by(UserFeedCounter.recipient_id)
+            .with_for_update()
+            .cte("locked")
+        )
+        decremented = (
+            update(UserFeedCounter)
+            .where(
+                UserFeedCounter.recipient_id == per_recipient.c.recipient_id,
+                UserFeedCounter.recipient_id.in_(select(locked.c.recipient_id)),
+            )
+            .values(
+                events_count=func.greatest(
+                    UserFeedCounter.events_count - per_recipient.c.events_count, 0
+                ),
+                version=UserFeedCounter.version + 1,
+            )
+            .cte("decremented")
+        )
+        query = select(
+            func.coalesce(func.sum(per_recipient.c.events_count), 0)
+        ).add_cte(decremented)
+        res = await self.session.execute(query)
+        deleted_count = int(res.scalar_one())
+
+        await self.session.commit()
+        return deleted_count
+
+    async def get_feed_post_ids(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int = 0,
+        before_post_id: Optional[int] = None,
+    ) -> Sequence[int]:
+        logger.debug(f"Получаем id постов ленты пользователя #%d ...", user_id)
+        pushed = self._pushed_posts(user_id, UserFeed.post_id.label("post_id"))
+        pulled = self._pulled_posts(user_id, Post.id.label("post_id"))
+        # Курсор позволяет идти по индексам, не пропуская offset строк
+        if before_post_id is not None:
+            pushed = pushed.where(UserFeed.post_id < before_post_id)
+            pulled = pulled.where(Post.id < before_post_id)
+            offset = 0
+
+        # Пост либо разослан, либо подтягивается, поэтому ветки не пересекаются.
+        # Каждая ветка сортируется и обрезается сама: разосланные новости
+        # читаются диапазоном индекса получателя, а не сортируются целиком
+        pushed = pushed.order_by(UserFeed.post_id.desc()).limit(offset + limit)
+        pulled = pulled.order_by(Post.id.desc()).limit(offset + limit)
+        feed = union_all(pushed, pulled).subquery("feed")
+        query = (
+            select(feed.c.post_id)
+            .order_by(feed.c.post_id.desc())
             .offset(offset)
             .limit(limit)
         )
+        res = await self.session.scalars(query)
+        return res.all()
+
+    async def get_ranked_feed_post_ids(
+        self,
+        user_id: int,
+        sort: FeedSort,
+        limit: int,
+        offset: int = 0,
+        before: Optional[tuple[float, int]] = None,
+    ) -> Sequence[tuple[int, float]]:
+        logger.debug(
+            f"Получаем id постов ленты пользователя #%d по рейтингу %s ...",
+            user_id,
+            sort,
+        )
+        if sort == "hot":
+            pushed_rank, pulled_rank = UserFeed.hot_score, Post.hot_score
+        else:
+            pushed_rank, pulled_rank = UserFeed.score, Post.score
+
+        pushed = self._pushed_posts(
+            user_id, UserFeed.post_id.label("post_id"), pushed_rank.label("rank")
+        )
+        pulled = self._pulled_posts(
+            user_id, Post.id.label("post_id"), pulled_rank.label("rank")
+        )
+        # Курсор - рейтинг и id последнего поста страницы
+        if before is not None:
+            pushed = pushed.where(tuple_(pushed_rank, UserFeed.post_id) < before)
+            pulled = pulled.where(tuple_(pulled_rank, Post.id) < before)
+            offset = 0
+
+        # Как и в get_feed_post_ids, ветки сортируются и обрезаются по отдельности
+        pushed = pushed.order_by(pushed_rank.desc(), UserFeed.post_id.desc()).limit(
+            offset + limit
+        )
+        pulled = pulled.order_by(pulled_rank.desc(), Post.id.desc()).limit(
+            offset + limit
+        )
+        feed = union_all(pushed, pulled).subquery("feed")
+        query = (
+            select(feed.c.post_id, feed.c.rank)
+            .order_by(feed.c.rank.desc(), feed.c.post_id.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        res = await self.session.execute(query)
+        return [(post_id, rank) for post_id, rank in res.all()]
+
+    @staticmethod
+    def _pushed_count(user_id: int) -> ColumnElement[int]:
+        """Число разосланных пользователю новостей из счетчика"""
+        return func.coalesce(
+            select(UserFeedCounter.events_count)
+            .filter_by(recipient_id=user_id)
+            .scalar_subquery(),
+            0,
+        )
+
+    @staticmethod
+    def _pushed_posts(user_id: int, *columns) -> Select:
+        """
+        Запрос разосланных пользователю постов
+        * скрытый пост остается в лентах, пока их не очистит фоновая задача,
+          но в ленту уже не попадает
+        """
+        return (
+            select(*columns)
+            .select_from(UserFeed)
+            .join(Post, Post.id == UserFeed.post_id)
+            .where(UserFeed.recipient_id == user_id, ~Post.is_hidden)
+        )
+
+    @staticmethod
+    def _pulled_posts(user_id: int, *columns) -> Select:
+        """Запрос подтягиваемых в ленту постов популярных авторов"""
+        pulled = (
+            select(*columns)
+            .join(Follow, Follow.followee_id == Post.user_id)
+            .where(Follow.follower_id == user_id, Post.is_pulled, ~Post.is_hidden)
+        )
+        # Подтягиваемые посты старше срока хранения в ленту не попадают,
+        # как и удаленные очисткой разосланные
+        if settings.feed.retention_max_age is not None:
+            pulled = pulled.where(
+                Post.created_at >= func.now() - settings.feed.retention_max_age
+            )
+        return pulled
+
+    async def refresh_hot_scores(self, limit: int) -> int:
+        logger.debug("Пересчитываем рейтинг до %d постов ...", limit)
+        # Пост, который сейчас рассылается, пропускаем до следующего запуска
+        dirty = (
+            select(Post.id)
+            .where(Post.rank_dirty)
+            .order_by(Post.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(Post)
+            .where(Post.id.in_(dirty.scalar_subquery()))
+            .values(
+                hot_score=hot_score(Post.score, Post.created_at),
+                rank_dirty=False,
+                # Пересчет рейтинга не меняет время редактирования поста
+                updated_at=Post.updated_at,
+            )
+            .returning(Post.id)
+            .execution_options(synchronize_session=False)
+        )
+        res = await self.session.scalars(stmt)
+        post_ids = res.all()
+
+        # Отдельный запрос со свежим снимком видит строки рассылок,
+        # закоммиченных до блокировки постов
+        if post_ids:
+            stmt = (
+                update(UserFeed)
+                .where(
+                    UserFeed.post_id == Post.id,
+                    Post.id.in_(post_ids),
+                    tuple_(UserFeed.hot_score, UserFeed.score).is_distinct_from(
+                        tuple_(Post.hot_score, Post.score)
+                    ),
+                )
+                .values(hot_score=Post.hot_score, score=Post.score)
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.execute(stmt)
+
+        await self.session.commit()
+        return len(post_ids)
+
+    async def get_posts_with_authors(self, post_ids: Sequence[int]) -> Sequence[Post]:
+        logger.debug(f"Получаем посты #{list(post_ids)} с их авторами ...")
+        if not post_ids:
+            return []
+
+        query = (
+            select(Post)
+            .options(joinedload(Post.user))
+            # Удаленные посты остаются в лентах, пока их не уберет фоновая задача
+            .where(Post.id.in_(post_ids), ~Post.is_hidden)
+        )
+        res = await self.session.scalars(query)
+        posts = {post.id: post for post in res.all()}
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    async def get_posts_version(
+        self,
+        post_ids: Sequence[int],
+    ) -> tuple[Optional[datetime], int]:
+        logger.debug("Получаем версию новостей о %d постах ...", len(post_ids))
+        if not post_ids:
+            return None, 0
+
+        # Посты и авторы читаются по первичным ключам, без сборки новостей
+        query = (
+            select(
+                func.max(func.greatest(Post.updated_at, User.updated_at)),
+                func.count(),
+            )
+            .join(User, User.id == Post.user_id)
+            .where(Post.id.in_(post_ids), ~Post.is_hidden)
+        )
         res = await self.session.execute(query)
-        return res.scalars().all()
+        updated_at, visible = res.one()
+        return updated_at, visible
+
+    async def get_feed_rows(self, post_ids: Sequence[int]) -> list[dict[str, Any]]:
+        logger.debug(f"Получаем новости о постах #{list(post_ids)} строками ...")
+        rows = await self._select_feed_rows(post_ids)
+        return [row for row, _ in rows]
+
+    async def get_feed_item_rows(
+        self,
+        post_ids: Sequence[int],
+    ) -> list[tuple[datetime, dict[str, Any]]]:
+        logger.debug("Получаем данные для %d готовых новостей ...", len(post_ids))
+        version = func.greatest(Post.updated_at, User.updated_at)
+        rows = await self._select_feed_rows(post_ids, version)
+        return [(source_updated_at, row) for row, (source_updated_at,) in rows]
+
+    async def _select_feed_rows(
+        self,
+        post_ids: Sequence[int],
+        *extra_columns,
+    ) -> list[tuple[dict[str, Any], Sequence[Any]]]:
+        """Строки новостей и значения дополнительных колонок к каждой из них"""
+        if not post_ids:
+            return []
+
+        author_columns = schema_columns(UserSummaryReadSchema, User)
+        post_columns = schema_columns(PostReadSchema, Post)
+        query = (
+            select(*author_columns, *post_columns, *extra_columns)
+            .join(User, User.id == Post.user_id)
+            .where(Post.id.in_(post_ids), ~Post.is_hidden)
+        )
+        res = await self.session.execute(query)
+
+        # Первые колонки строки - автор, за ними пост и дополнительные колонки
+        split = len(author_columns)
+        end = split + len(post_columns)
+        author_fields = list(UserSummaryReadSchema.model_fields)
+        post_fields = list(PostReadSchema.model_fields)
+        rows = {}
+        for row in res:
+            post = dict(zip(post_fields, row[split:end]))
+            item = {"author": dict(zip(author_fields, row[:split])), "post": post}
+            rows[post["id"]] = (item, row[end:])
+        return [rows[post_id] for post_id in post_ids if post_id in rows]
+
+    async def get_feed_items(self, post_ids: Sequence[int]) -> dict[int, bytes]:
+        logger.debug("Получаем готовые новости о %d постах ...", len(post_ids))
+        if not post_ids:
+            return {}
+
+        # Версия новости сверяется с постом и автором по первичным ключам
+        query = (
+            select(FeedItem.post_id, FeedItem.payload)
+            .join(Post, Post.id == FeedItem.post_id)
+            .join(User, User.id == Post.user_id)
+            .where(
+                FeedItem.post_id.in_(post_ids),
+                FeedItem.source_updated_at
+                == func.greatest(Post.updated_at, User.updated_at),
+                ~Post.is_hidden,
+            )
+        )
+        res = await self.session.execute(query)
+        return {post_id: payload for post_id, payload in res.all()}
+
+    async def save_feed_items(
+        self,
+        items: Sequence[tuple[int, int, datetime, bytes]],
+    ) -> None:
+        logger.debug("Сохраняем %d готовых новостей ...", len(items))
+        if not items:
+            return
+
+        stmt = insert(FeedItem).values(
+            [
+                {
+                    "post_id": post_id,
+                    "author_id": author_id,
+                    "source_updated_at": source_updated_at,
+                    "payload": payload,
+                }
+                for post_id, author_id, source_updated_at, payload in items
+            ]
+        )
+        # Чтение и фоновое обновление могут собрать новость одновременно:
+        # собранная из старых данных не перезаписывает более свежую
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["post_id"],
+            set_={
+                "author_id": stmt.excluded.author_id,
+                "source_updated_at": stmt.excluded.source_updated_at,
+                "payload": stmt.excluded.payload,
+            },
+            where=FeedItem.source_updated_at < stmt.excluded.source_updated_at,
+        )
+        await self.session.execute(stmt)
+        await self.session.commit()
+        return
+
+    async def delete_author_feed_items(self, author_id: int) -> int:
+        logger.debug("Удаляем готовые новости о постах автора #%d ...", author_id)
+        stmt = delete(FeedItem).filter_by(author_id=author_id)
+        res = await self.session.execute(stmt)
+        await self.session.commit()
+        return res.rowcount
+
+    async def get_feed_items_stats(self) -> tuple[int, int, int, int]:
+        logger.debug("Считаем место под готовые новости ...")
+        query = select(
+            select(func.count(FeedItem.id)).scalar_subquery(),
+            select(
+                func.coalesce(func.sum(func.octet_length(FeedItem.payload)), 0)
+            ).scalar_subquery(),
+            func.pg_total_relation_size(FeedItem.__tablename__),
+            func.pg_total_relation_size(Post.__tablename__)
+            + func.pg_total_relation_size(User.__tablename__),
+        )
+        res = await self.session.execute(query)
+        items, payload_bytes, table_bytes, join_tables_bytes = res.one()
+        return items, int(payload_bytes), table_bytes, join_tables_bytes
+
+
+class CachedFeedRepository:
+    """
+    Репозиторий ленты с кешем последних постов читателей в памяти процесса
+    * промах кеша читает ленту из базы и заполняет кеш
+    * при попадании база только отдает версию ленты чтениями по ключу.
+      В ленты пишут воркеры, а не этот процесс, поэтому записи попадают
+      в кеш не сами: они сдвигают версию, и кеш перечитывает изменившуюся
+      часть ленты
+    """
+
+    def __init__(self, repo: FeedRepositoryProtocol, cache: TimelineCache):
+        self.repo = repo
+        self.cache = cache
+        # Ленты, уже сверенные с базой в рамках этого запроса
+        self._synced: dict[int, Timeline] = {}
+
+    async def create_events_chunk(
+        self,
+        author_id: int,
+        post_id: int,
+        after_follower_id: int,
+        limit: int,
+        upto_follower_id: Optional[int] = None,
+    ) -> tuple[Optional[int], int]:
+        return await self.repo.create_events_chunk(
+            author_id, post_id, after_follower_id, limit, upto_follower_id
+        )
+
+    async def create_events_batch_chunk(
+        self,
+        cursors: dict[int, int],
+        posts: Sequence[tuple[int, int]],
+        limit: int,
+    ) -> tuple[dict[int, int], int]:
+        return await self.repo.create_events_batch_chunk(cursors, posts, limit)
+
+    async def mark_post_pulled(self, post_id: int) -> None:
+        return await self.repo.mark_post_pulled(post_id)
+
+    async def get_count_events(self, user_id: int, exact: bool = False) -> int:
+        if exact:
+            return await self.repo.get_count_events(user_id, exact=True)
+        timeline = await self._get_timeline(user_id)
+        return timeline.total
+
+    async def get_feed_version(self, user_id: int) -> FeedVersion:
+        return await self.repo.get_feed_version(user_id)
+
+    async def get_pushed_feed(
+        self,
+        user_id: int,
+        limit: int,
+    ) -> tuple[Sequence[int], int]:
+        return await self.repo.get_pushed_feed(user_id, limit)
+
+    async def get_pulled_feed(
+        self,
+        user_id: int,
+        limit: int,
+    ) -> tuple[Sequence[int], int]:
+        return await self.repo.get_pulled_feed(user_id, limit)
+
+    async def reconcile_counters(
+        self,
+        after_recipient_id: int,
+        limit: int,
+    ) -> tuple[Optional[int], int]:
+        return await self.repo.reconcile_counters(after_recipient_id, limit)
+
+    async def save_fanout_progress(
+        self,
+        task_id: str,
+        author_id: int,
+        post_id: int,
+        chunks_total: int,
+        pulled: bool = False,
+    ) -> None:
+        return await self.repo.save_fanout_progress(
+            task_id, author_id, post_id, chunks_total, pulled
+        )
+
+    async def complete_fanout_chunk(self, task_id: str, chunk_no: int) -> None:
+        return await self.repo.complete_fanout_chunk(task_id, chunk_no)
+
+    async def get_fanout_progress(self, task_id: str) -> Optional[FanOutProgress]:
+        return await self.repo.get_fanout_progress(task_id)
+
+    async def delete_fanout_progress(self, max_age: timedelta) -> int:
+        return await self.repo.delete_fanout_progress(max_age)
+
+    async def get_retention_horizon(self, max_age: timedelta) -> Optional[int]:
+        return await self.repo.get_retention_horizon(max_age)
+
+    async def delete_events_up_to(self, post_id: int, limit: int) -> int:
+        return await self.repo.delete_events_up_to(post_id, limit)
+
+    async def get_overflowing_recipients(
+        self,
+        max_entries: int,
+        after_recipient_id: int,
+        limit: int,
+    ) -> Sequence[int]:
+        return await self.repo.get_overflowing_recipients(
+            max_entries, after_recipient_id, limit
+        )
+
+    async def trim_recipient_events(
+        self,
+        recipient_id: int,
+        keep: int,
+        limit: int,
+    ) -> int:
+        return await self.repo.trim_recipient_events(recipient_id, keep, limit)
+
+    async def delete_post_events(self, post_id: int, limit: int) -> int:
+        return await self.repo.delete_post_events(post_id, limit)
+
+    async def backfill_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        return await self.repo.backfill_follower(follower_id, author_id, limit)
+
+    async def retract_follower(
+        self,
+        follower_id: int,
+        author_id: int,
+        limit: int,
+    ) -> int:
+        return await self.repo.retract_follower(follower_id, author_id, limit)
+
+    async def delete_hidden_post(self, post_id: int) -> bool:
+        return await self.repo.delete_hidden_post(post_id)
+
+    async def get_feed_post_ids(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int = 0,
+        before_post_id: Optional[int] = None,
+    ) -> Sequence[int]:
+        timeline = await self._get_timeline(user_id)
+        post_ids = timeline.page(limit, offset, before_post_id)
+        if post_ids is not None:
+            return post_ids
+        self.cache.window_misses += 1
+
+        return await self.repo.get_feed_post_ids(
+            user_id, limit, offset, before_post_id
+        )
+
+    async def get_ranked_feed_post_ids(
+        self,
+        user_id: int,
+        sort: FeedSort,
+        limit: int,
+        offset: int = 0,
+        before: Optional[tuple[float, int]] = None,
+    ) -> Sequence[tuple[int, float]]:
+        # В кеше лента хранится только от новых постов к старым
+        return await self.repo.get_ranked_feed_post_ids(
+            user_id, sort, limit, offset, before
+        )
+
+    async def refresh_hot_scores(self, limit: int) -> int:
+        return await self.repo.refresh_hot_scores(limit)
+
+    async def get_posts_with_authors(self, post_ids: Sequence[int]) -> Sequence[Post]:
+        return await self.repo.get_posts_with_authors(post_ids)
+
+    async def get_posts_version(
+        self,
+        post_ids: Sequence[int],
+    ) -> tuple[Optional[datetime], int]:
+        return await self.repo.get_posts_version(post_ids)
+
+    async def get_feed_rows(self, post_ids: Sequence[int]) -> list[dict[str, Any]]:
+        return await self.repo.get_feed_rows(post_ids)
+
+    async def get_feed_item_rows(
+        self,
+        post_ids: Sequence[int],
+    ) -> list[tuple[datetime, dict[str, Any]]]:
+        return await self.repo.get_feed_item_rows(post_ids)
+
+    async def get_feed_items(self, post_ids: Sequence[int]) -> dict[int, bytes]:
+        return await self.repo.get_feed_items(post_ids)
+
+    async def save_feed_items(
+        self,
+        items: Sequence[tuple[int, int, datetime, bytes]],
+    ) -> None:
+        return await self.repo.save_feed_items(items)
+
+    async def delete_author_feed_items(self, author_id: int) -> int:
+        return await self.repo.delete_author_feed_items(author_id)
+
+    async def get_feed_items_stats(self) -> tuple[int, int, int, int]:
+        return await self.repo.get_feed_items_stats()
+
+    async def _get_timeline(self, user_id: int) -> Timeline:
+        timeline = self._synced.get(user_id)
+        if timeline is not None:
+            return timeline
+
+        # Версия читается до ленты: запись, попавшая между запросами,
+        # оставит в кеше старую версию, и следующее чтение перечитает ленту
+        version = await self.repo.get_feed_version(user_id)
+        timeline = self.cache.get(user_id)
+        if timeline is not None and timeline.version == version:
+            self.cache.hits += 1
+        else:
+            timeline = await self._fill_timeline(user_id, timeline, version)
+
+        self._synced[user_id] = timeline
+        return timeline
+
+    async def _fill_timeline(
+        self,
+        user_id: int,
+        cached: Optional[Timeline],
+        version: FeedVersion,
+    ) -> Timeline:
+        """Читает из базы части ленты, версия которых изменилась"""
+        if cached is None:
+            logger.debug("Заполняем кеш ленты пользователя #%d ...", user_id)
+            self.cache.misses += 1
+            cached_version = None
+        else:
+            logger.debug("Обновляем кеш ленты пользователя #%d ...", user_id)
+            self.cache.refreshes += 1
+            cached_version = cached.version
+
+        max_size = self.cache.max_size
+        reused = False
+        if cached_version is None or cached_version.pushed != version.pushed:
+            pushed, pushed_total = await self.repo.get_pushed_feed(user_id, max_size)
+        else:
+            pushed, pushed_total = cached.pushed, cached.pushed_total
+            reused = True
+        if cached_version is None or cached_version[1:] != version[1:]:
+            pulled, pulled_total = await self.repo.get_pulled_feed(user_id, max_size)
+        else:
+            pulled, pulled_total = cached.pulled, cached.pulled_total
+            reused = True
+
+        timeline = Timeline(
+            pushed,
+            pushed_total,
+            pulled,
+            pulled_total,
+            max_size=max_size,
+            version=version,
+            # Срок жизни ленты отсчитывается от ее самой старой части
+            filled_at=cached.filled_at if reused else None,
+        )
+        self.cache.put(user_id, timeline)
+        return timeline
 
 
 async def get_feed_repository(session: SessionDep) -> FeedRepositoryProtocol:
-    return FeedRepository(session)
+    repo = FeedRepository(session)
+    if settings.feed_cache.enabled:
+        return CachedFeedRepository(repo, timeline_cache)
+    return repo
 
 
 FeedRepositoryDep = Annotated[FeedRepositoryProtocol, Depends(get_feed_repository)]
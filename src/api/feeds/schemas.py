@@ -1,9 +1,16 @@
+from datetime import datetime
+from typing import Literal, Optional
+
 from pydantic import BaseModel, ConfigDict
 
 from api.auth.users.schemas import UserSummaryReadSchema
 from api.posts.schemas import PostReadSchema
 
 
+# Порядок ленты: от новых постов, по рейтингу hot или по счету голосов
+FeedSort = Literal["new", "hot", "top"]
+
+
 class FeedBaseSchema(BaseModel):
     author_id: int
     post_id: int
@@ -22,3 +29,97 @@ class FeedDetailSchema(BaseModel):
     post: PostReadSchema
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class FeedPageSchema(BaseModel):
+    """Страница ленты до сборки новостей"""
+
+    post_ids: list[int]
+    next_cursor: Optional[str] = None
+    total_found: int
+    # Версия страницы для условного GET, None - не считалась
+    etag: Optional[str] = None
+
+
+class FanOutChunkSchema(BaseModel):
+    """Отчет по одной пачке рассылки: подписчики с id в (after_id, last_id]"""
+
+    after_follower_id: int
+    last_follower_id: int
+    inserted: int
+    elapsed_ms: float
+
+
+class FanOutReportSchema(BaseModel):
+    author_id: int
+    post_id: int
+    # Пост не рассылался и будет подтягиваться при чтении ленты
+    pulled: bool = False
+    inserted: int = 0
+    elapsed_ms: float = 0
+    chunks: list[FanOutChunkSchema] = []
+
+
+class FeedTrimReportSchema(BaseModel):
+    # Удалено новостей старше срока хранения
+    deleted_by_age: int = 0
+    # Удалено новостей сверх лимита ленты пользователя
+    deleted_by_size: int = 0
+    trimmed_recipients: int = 0
+    # Удалено записей прогресса старых рассылок
+    deleted_progress: int = 0
+    batches: int = 0
+    elapsed_ms: float = 0
+
+
+class FanOutBatchReportSchema(BaseModel):
+    """Отчет по пачке задач рассылки, собранной воркером"""
+
+    posts: int
+    authors: int = 0
+    # Постов популярных авторов, помеченных как подтягиваемые
+    pulled: int = 0
+    inserted: int = 0
+    chunks: int = 0
+    elapsed_ms: float = 0
+    # Добавлено новостей в секунду
+    throughput: float = 0
+
+
+class FanOutProgressSchema(BaseModel):
+    task_id: str
+    author_id: int
+    post_id: int
+    pulled: bool
+    chunks_total: int
+    chunks_done: int
+    done: bool
+    created_at: datetime
+    updated_at: datetime
+
+
+class FeedItemsStatsSchema(BaseModel):
+    """Сколько места занимают готовые новости по сравнению с чтением через join"""
+
+    items: int
+    payload_bytes: int
+    # Таблица feed_items вместе с индексами и TOAST
+    table_bytes: int
+    # Таблицы posts и users, которые читает лента без готовых новостей
+    join_tables_bytes: int
+    overhead_ratio: float
+
+
+class TimelineCacheStatsSchema(BaseModel):
+    users: int
+    memory_bytes: int
+    max_memory_bytes: int
+    timeline_size: int
+    hits: int
+    misses: int
+    # Лента была в кеше, но одна из ее частей перечитана после записи в базу
+    refreshes: int
+    # Страница лежала за пределами закешированных постов
+    window_misses: int
+    evictions: int
+    hit_ratio: float
@@ -1,12 +1,31 @@
 import logging
-from typing import Protocol, Annotated
+import time
+from datetime import datetime
+from typing import Protocol, Annotated, Sequence, Optional, Any
 
+import orjson
 from fastapi import Depends
 
 from api.follows.repository import FollowsRepositoryProtocol, FollowsRepositoryDep
+from api.posts.models import Post
+from core import settings
 from schemas import SearchResponseSchema, PaginationSchema
+from utils.cursor import encode_cursor, decode_cursor
+from utils.etag import make_etag
+from utils.serialization import dump_json, dump_search_response
 from .repository import FeedRepositoryProtocol, FeedRepositoryDep
-from .schemas import FeedDetailSchema
+from .schemas import (
+    FeedSort,
+    FeedDetailSchema,
+    FeedPageSchema,
+    FanOutReportSchema,
+    FanOutChunkSchema,
+    FeedTrimReportSchema,
+    FanOutBatchReportSchema,
+    FanOutProgressSchema,
+    FeedItemsStatsSchema,
+)
+from .exceptions import FanOutProgressNotFoundException
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +36,146 @@ class FeedServiceProtocol(Protocol):
         self,
         author_id: int,
         post_id: int,
-    ) -> None:
-        """Создаем событие для пользователей (подписчиков)"""
+    ) -> FanOutReportSchema:
+        """Создаем событие для пользователей (подписчиков) пачками"""
+        pass
+
+    async def create_events_for_posts(
+        self,
+        requests: Sequence[tuple[int, int]],
+    ) -> FanOutBatchReportSchema:
+        """Создаем события для пачки пар (автор, пост), сгруппированных по авторам"""
+        pass
+
+    async def create_events_for_author_posts(
+        self,
+        author_id: int,
+        post_ids: Sequence[int],
+    ) -> FanOutBatchReportSchema:
+        """Рассылаем пачку новых постов автора общими запросами"""
+        pass
+
+    async def plan_fan_out(
+        self,
+        task_id: str,
+        author_id: int,
+        post_id: int,
+    ) -> list[tuple[int, Optional[int]]]:
+        """
+        Делим рассылку поста на диапазоны подписчиков (after_id, upto_id]
+        и заводим ее прогресс по задаче
+        * один диапазон (0, None) - рассылка целиком в текущей задаче
+        * пустой список - пост популярного автора, рассылать нечего
+        """
+        pass
+
+    async def create_events_for_range(
+        self,
+        author_id: int,
+        post_id: int,
+        after_follower_id: int,
+        upto_follower_id: Optional[int],
+    ) -> int:
+        """Создаем событие для диапазона подписчиков, возвращаем число добавленных"""
+        pass
+
+    async def complete_fan_out_chunk(self, task_id: str, chunk_no: int) -> None:
+        """Отмечаем диапазон рассылки выполненным"""
+        pass
+
+    async def get_fan_out_progress(
+        self,
+        task_id: str,
+        user_id: int,
+    ) -> FanOutProgressSchema:
+        """Получаем прогресс рассылки поста пользователя по задаче"""
+        pass
+
+    async def get_feed_page(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+    ) -> FeedPageSchema:
+        """
+        Получаем id постов страницы, курсор, число новостей и ETag страницы.
+        Новости не собираются: для условного GET это дешевле самого ответа
+        """
         pass
 
     async def get_user_events(
         self,
         user_id: int,
         pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
     ) -> SearchResponseSchema[FeedDetailSchema]:
-        """Получаем автора поста, сам пост, тип поста, пагинацию и общее количество"""
+        """
+        Получаем автора поста, сам пост, тип поста, пагинацию и общее количество
+        * page - уже полученная страница из get_feed_page
+        """
+        pass
+
+    async def get_user_events_json(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
+    ) -> bytes:
+        pass
+
+    async def get_user_events_compact(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
+    ) -> bytes:
+        """То же, что get_user_events, но сразу JSON ответа из готовых новостей"""
+        pass
+
+    async def refresh_feed_items(
+        self,
+        post_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+    ) -> None:
+        """Обновляем готовые новости после изменения поста или его автора"""
+        pass
+
+    async def get_feed_items_stats(self) -> FeedItemsStatsSchema:
+        """Считаем место под готовые новости"""
+        pass
+
+    async def reconcile_counters(self) -> int:
+        """
+        Сверяем счетчики новостей всех пользователей с их лентами
+        * возвращаем число исправленных счетчиков
+        """
+        pass
+
+    async def refresh_rankings(self) -> int:
+        """Пересчитываем рейтинг постов с изменившимся счетом, возвращаем их число"""
+        pass
+
+    async def trim_feeds(self) -> FeedTrimReportSchema:
+        """Удаляем из лент новости старше срока хранения и сверх лимита ленты"""
+        pass
+
+    async def retract_post(self, post_id: int) -> int:
+        """Удаляем скрытый пост из лент пачками, затем сам пост"""
+        pass
+
+    async def backfill_follower(self, follower_id: int, author_id: int) -> int:
+        """Добавляем последние посты автора в ленту нового подписчика"""
+        pass
+
+    async def retract_follower(self, follower_id: int, author_id: int) -> int:
+        """Удаляем посты автора из ленты бывшего подписчика пачками"""
         pass
 
 
@@ -44,49 +193,555 @@ class FeedService:
         self,
         author_id: int,
         post_id: int,
-    ) -> None:
-        # Получаем всех подписчиков пользователя
-        followers_ids = await self.follows_repo.get_subs_ids(user_id=author_id)
+    ) -> FanOutReportSchema:
+        report = FanOutReportSchema(author_id=author_id, post_id=post_id)
+        started = time.perf_counter()
 
-        if not followers_ids:
+        if await self._pull_celebrity_posts(author_id, [post_id]):
+            report.pulled = True
+            report.elapsed_ms = (time.perf_counter() - started) * 1000
+            return report
+
+        # Рассылаем событие пачками подписчиков, каждая пачка - отдельная транзакция
+        after_follower_id = 0
+        while True:
+            chunk_started = time.perf_counter()
+            last_follower_id, inserted = await self.feed_repo.create_events_chunk(
+                author_id=author_id,
+                post_id=post_id,
+                after_follower_id=after_follower_id,
+                limit=settings.feed.fanout_chunk_size,
+            )
+            if last_follower_id is None:
+                break
+
+            chunk = FanOutChunkSchema(
+                after_follower_id=after_follower_id,
+                last_follower_id=last_follower_id,
+                inserted=inserted,
+                elapsed_ms=(time.perf_counter() - chunk_started) * 1000,
+            )
+            logger.debug(
+                "Пачка подписчиков (%d, %d]: добавлено %d событий за %.1f мс",
+                chunk.after_follower_id,
+                chunk.last_follower_id,
+                chunk.inserted,
+                chunk.elapsed_ms,
+            )
+            report.chunks.append(chunk)
+            report.inserted += inserted
+            after_follower_id = last_follower_id
+
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+
+        if not report.chunks:
             logger.warning(
-                "У пользователя #%d нет подписчиков. Событие не будет рассылаться никому",
+                "У пользователя #%d нет подписчиков или пост #%d удален. "
+                "Событие не будет рассылаться никому",
                 author_id,
+                post_id,
+            )
+        return report
+
+    async def _pull_celebrity_posts(
+        self,
+        author_id: int,
+        post_ids: Sequence[int],
+    ) -> bool:
+        """
+        Посты популярных авторов не рассылаем, читатели подтянут их сами
+        * возвращает True, если посты отмечены подтягиваемыми
+        """
+        threshold = settings.feed.celebrity_threshold
+        if threshold is None:
+            return False
+        followers_count = await self.follows_repo.count_subs(
+            user_id=author_id, limit=threshold
+        )
+        if followers_count < threshold:
+            return False
+
+        for post_id in post_ids:
+            await self.feed_repo.mark_post_pulled(post_id)
+        logger.info(
+            "У пользователя #%d не меньше %d подписчиков. "
+            "Посты %s будут подтягиваться в ленту при чтении",
+            author_id,
+            threshold,
+            list(post_ids),
+        )
+        return True
+
+    async def create_events_for_posts(
+        self,
+        requests: Sequence[tuple[int, int]],
+    ) -> FanOutBatchReportSchema:
+        report = FanOutBatchReportSchema(posts=len(requests))
+        started = time.perf_counter()
+
+        # Повторно доставленные сообщения схлопываются
+        posts_by_author: dict[int, list[int]] = {}
+        for author_id, post_id in dict.fromkeys(requests):
+            posts_by_author.setdefault(author_id, []).append(post_id)
+        report.authors = len(posts_by_author)
+
+        for author_id in list(posts_by_author):
+            if await self._pull_celebrity_posts(author_id, posts_by_author[author_id]):
+                report.pulled += len(posts_by_author.pop(author_id))
+
+        # Все посты пачки рассылаются общими запросами, пока у авторов
+        # не закончатся подписчики
+        cursors = {author_id: 0 for author_id in posts_by_author}
+        posts = [
+            (author_id, post_id)
+            for author_id, post_ids in posts_by_author.items()
+            for post_id in post_ids
+        ]
+        while cursors:
+            cursors, inserted = await self.feed_repo.create_events_batch_chunk(
+                cursors=cursors,
+                posts=posts,
+                limit=settings.feed.fanout_chunk_size,
             )
-            return
+            posts = [
+                (author_id, post_id)
+                for author_id, post_id in posts
+                if author_id in cursors
+            ]
+            report.chunks += 1
+            report.inserted += inserted
+
+        elapsed = time.perf_counter() - started
+        report.elapsed_ms = elapsed * 1000
+        report.throughput = report.inserted / elapsed if elapsed > 0 else 0
+        return report
+
+    async def create_events_for_author_posts(
+        self,
+        author_id: int,
+        post_ids: Sequence[int],
+    ) -> FanOutBatchReportSchema:
+        # Готовые новости появляются до того, как посты попадут в ленты
+        if settings.feed.compact_payloads:
+            rows = await self.feed_repo.get_feed_rows(post_ids)
+            await self.feed_repo.save_feed_items(self._serialize_feed_items(rows))
 
-        # Добавляем пачку событий в базу данных
-        await self.feed_repo.create_event_for_users(
+        return await self.create_events_for_posts(
+            [(author_id, post_id) for post_id in post_ids]
+        )
+
+    async def plan_fan_out(
+        self,
+        task_id: str,
+        author_id: int,
+        post_id: int,
+    ) -> list[tuple[int, Optional[int]]]:
+        ranges: list[tuple[int, Optional[int]]] = [(0, None)]
+        pulled = False
+
+        # Готовая новость появляется до того, как пост попадет в ленты
+        if settings.feed.compact_payloads:
+            await self.refresh_feed_items(post_id=post_id)
+
+        threshold = settings.feed.fanout_parallel_threshold
+        if threshold is not None:
+            followers_count = await self.follows_repo.count_subs(
+                user_id=author_id, limit=threshold
+            )
+            if followers_count >= threshold:
+                ranges, pulled = await self._split_fan_out(author_id, post_id)
+
+        await self.feed_repo.save_fanout_progress(
+            task_id=task_id,
             author_id=author_id,
-            recipients_ids=list(followers_ids),
             post_id=post_id,
+            chunks_total=len(ranges),
+            pulled=pulled,
         )
+        return ranges
 
-        return
+    async def _split_fan_out(
+        self,
+        author_id: int,
+        post_id: int,
+    ) -> tuple[list[tuple[int, Optional[int]]], bool]:
+        if await self._pull_celebrity_posts(author_id, [post_id]):
+            return [], True
+
+        # Последний диапазон открыт справа и захватит новых подписчиков
+        boundaries = await self.follows_repo.get_subs_boundaries(
+            user_id=author_id, size=settings.feed.fanout_subtask_size
+        )
+        ranges = list(zip([0, *boundaries], [*boundaries, None]))
+        return ranges, False
+
+    async def create_events_for_range(
+        self,
+        author_id: int,
+        post_id: int,
+        after_follower_id: int,
+        upto_follower_id: Optional[int],
+    ) -> int:
+        inserted = 0
+        while True:
+            last_follower_id, chunk_inserted = await self.feed_repo.create_events_chunk(
+                author_id=author_id,
+                post_id=post_id,
+                after_follower_id=after_follower_id,
+                limit=settings.feed.fanout_chunk_size,
+                upto_follower_id=upto_follower_id,
+            )
+            if last_follower_id is None:
+                break
+            inserted += chunk_inserted
+            after_follower_id = last_follower_id
+
+        return inserted
+
+    async def complete_fan_out_chunk(self, task_id: str, chunk_no: int) -> None:
+        await self.feed_repo.complete_fanout_chunk(task_id, chunk_no)
+
+    async def get_fan_out_progress(
+        self,
+        task_id: str,
+        user_id: int,
+    ) -> FanOutProgressSchema:
+        progress = await self.feed_repo.get_fanout_progress(task_id)
+        # Чужие рассылки не показываем
+        if progress is None or progress.author_id != user_id:
+            raise FanOutProgressNotFoundException()
+
+        chunks_done = len(progress.done_chunks)
+        return FanOutProgressSchema(
+            task_id=progress.task_id,
+            author_id=progress.author_id,
+            post_id=progress.post_id,
+            pulled=progress.pulled,
+            chunks_total=progress.chunks_total,
+            chunks_done=chunks_done,
+            done=chunks_done >= progress.chunks_total,
+            created_at=progress.created_at,
+            updated_at=progress.updated_at,
+        )
+
+    async def get_feed_page(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+    ) -> FeedPageSchema:
+        page = await self._get_page(user_id, pagination, exact_count, sort)
+
+        # Новость меняется вместе с постом или его автором, скрытый пост
+        # пропадает из ответа, новые посты меняют id и число новостей
+        updated_at, visible = await self.feed_repo.get_posts_version(page.post_ids)
+        page.etag = make_etag(
+            "feed",
+            user_id,
+            sort,
+            exact_count,
+            pagination.model_dump(mode="json"),
+            page.total_found,
+            page.next_cursor,
+            page.post_ids,
+            updated_at,
+            visible,
+        )
+        return page
 
     async def get_user_events(
         self,
         user_id: int,
         pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
     ) -> SearchResponseSchema[FeedDetailSchema]:
-        # Собираем количество всех новостей
-        total_events = await self.feed_repo.get_count_events(user_id)
+        if page is None:
+            page = await self._get_page(user_id, pagination, exact_count, sort)
 
         # Подтягиваем автора новости и саму новость
-        events_with_authors = await self.feed_repo.get_full_events_with_authors(
+        posts = await self.feed_repo.get_posts_with_authors(page.post_ids)
+
+        return SearchResponseSchema(
+            detail=[self._build_feed_item(post) for post in posts],
+            total_found=page.total_found,
+            pagination=pagination,
+            next_cursor=page.next_cursor,
+        )
+
+    async def get_user_events_json(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
+    ) -> bytes:
+        if page is None:
+            page = await self._get_page(user_id, pagination, exact_count, sort)
+
+        # Строки уже в форме FeedDetailSchema: сразу пишем JSON без валидации
+        rows = await self.feed_repo.get_feed_rows(page.post_ids)
+        return dump_search_response(
+            rows, pagination, page.total_found, page.next_cursor
+        )
+
+    async def get_user_events_compact(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+        sort: FeedSort = "new",
+        page: Optional[FeedPageSchema] = None,
+    ) -> bytes:
+        if page is None:
+            page = await self._get_page(user_id, pagination, exact_count, sort)
+        post_ids = page.post_ids
+
+        # Готовые новости копируются в ответ как есть. Недостающие и устаревшие
+        # собираются по постам и сохраняются для следующих чтений
+        payloads = await self.feed_repo.get_feed_items(post_ids)
+        missing_ids = [post_id for post_id in post_ids if post_id not in payloads]
+        if missing_ids:
+            rows = await self.feed_repo.get_feed_item_rows(missing_ids)
+            items = self._serialize_feed_items(rows)
+            await self.feed_repo.save_feed_items(items)
+            payloads.update((post_id, payload) for post_id, _, _, payload in items)
+
+        detail = b",".join(
+            payloads[post_id] for post_id in post_ids if post_id in payloads
+        )
+        return dump_search_response(
+            orjson.Fragment(b"[" + detail + b"]"),
+            pagination,
+            page.total_found,
+            page.next_cursor,
+        )
+
+    async def refresh_feed_items(
+        self,
+        post_id: Optional[int] = None,
+        author_id: Optional[int] = None,
+    ) -> None:
+        if post_id is not None:
+            rows = await self.feed_repo.get_feed_item_rows([post_id])
+            await self.feed_repo.save_feed_items(self._serialize_feed_items(rows))
+
+        # Постов автора может быть много: новости пересоберутся при чтении
+        if author_id is not None:
+            await self.feed_repo.delete_author_feed_items(author_id)
+
+    async def get_feed_items_stats(self) -> FeedItemsStatsSchema:
+        (
+            items,
+            payload_bytes,
+            table_bytes,
+            join_tables_bytes,
+        ) = await self.feed_repo.get_feed_items_stats()
+        return FeedItemsStatsSchema(
+            items=items,
+            payload_bytes=payload_bytes,
+            table_bytes=table_bytes,
+            join_tables_bytes=join_tables_bytes,
+            overhead_ratio=table_bytes / join_tables_bytes if join_tables_bytes else 0,
+        )
+
+    async def _get_page(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool,
+        sort: FeedSort,
+    ) -> FeedPageSchema:
+        # Собираем количество всех новостей
+        total_events = await self.feed_repo.get_count_events(
+            user_id, exact=exact_count
+        )
+        post_ids, next_cursor = await self._get_page_post_ids(
+            user_id, pagination, sort
+        )
+        return FeedPageSchema(
+            post_ids=post_ids, next_cursor=next_cursor, total_found=total_events
+        )
+
+    async def _get_page_post_ids(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        sort: FeedSort = "new",
+    ) -> tuple[Sequence[int], Optional[str]]:
+        if sort != "new":
+            return await self._get_ranked_page_post_ids(user_id, pagination, sort)
+
+        before_post_id = None
+        if pagination.cursor:
+            (before_post_id,) = decode_cursor(pagination.cursor, int)
+
+        # Собираем страницу ленты: разосланные новости вперемешку с постами
+        # популярных авторов. Берем на одну запись больше, чтобы понять,
+        # есть ли следующая страница
+        post_ids = await self.feed_repo.get_feed_post_ids(
             user_id=user_id,
-            limit=pagination.limit,
+            limit=pagination.limit + 1,
             offset=(pagination.page - 1) * pagination.limit,
+            before_post_id=before_post_id,
         )
 
-        return SearchResponseSchema(
-            detail=[
-                FeedDetailSchema.model_validate(event) for event in events_with_authors
-            ],
-            total_found=total_events,
-            pagination=pagination,
+        next_cursor = None
+        if len(post_ids) > pagination.limit:
+            post_ids = post_ids[: pagination.limit]
+            next_cursor = encode_cursor(post_ids[-1])
+        return post_ids, next_cursor
+
+    async def _get_ranked_page_post_ids(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        sort: FeedSort,
+    ) -> tuple[Sequence[int], Optional[str]]:
+        before = None
+        if pagination.cursor:
+            before = decode_cursor(
+                pagination.cursor, float if sort == "hot" else int, int
+            )
+
+        rows = await self.feed_repo.get_ranked_feed_post_ids(
+            user_id=user_id,
+            sort=sort,
+            limit=pagination.limit + 1,
+            offset=(pagination.page - 1) * pagination.limit,
+            before=before,
+        )
+
+        next_cursor = None
+        if len(rows) > pagination.limit:
+            rows = rows[: pagination.limit]
+            post_id, rank = rows[-1]
+            next_cursor = encode_cursor(rank, post_id)
+        return [post_id for post_id, _ in rows], next_cursor
+
+    @staticmethod
+    def _build_feed_item(post: Post) -> FeedDetailSchema:
+        return FeedDetailSchema.model_validate({"author": post.user, "post": post})
+
+    @staticmethod
+    def _serialize_feed_items(
+        rows: Sequence[tuple[datetime, dict[str, Any]]],
+    ) -> list[tuple[int, int, datetime, bytes]]:
+        return [
+            (row["post"]["id"], row["author"]["id"], source_updated_at, dump_json(row))
+            for source_updated_at, row in rows
+        ]
+
+    async def refresh_rankings(self) -> int:
+        refreshed = 0
+        batch = settings.feed.ranking_batch
+        while True:
+            count = await self.feed_repo.refresh_hot_scores(limit=batch)
+            refreshed += count
+            if count < batch:
+                break
+        return refreshed
+
+    async def reconcile_counters(self) -> int:
+        fixed = 0
+        after_recipient_id = 0
+        while True:
+            last_recipient_id, fixed_count = await self.feed_repo.reconcile_counters(
+                after_recipient_id=after_recipient_id,
+                limit=settings.feed.counters_reconcile_batch,
+            )
+            if last_recipient_id is None:
+                break
+            fixed += fixed_count
+            after_recipient_id = last_recipient_id
+
+        return fixed
+
+    async def trim_feeds(self) -> FeedTrimReportSchema:
+        report = FeedTrimReportSchema()
+        started = time.perf_counter()
+        batch_size = settings.feed.retention_batch
+
+        # Новости старше срока хранения удаляем по всем лентам сразу
+        max_age = settings.feed.retention_max_age
+        if max_age is not None:
+            horizon = await self.feed_repo.get_retention_horizon(max_age)
+            while horizon is not None:
+                deleted = await self.feed_repo.delete_events_up_to(horizon, batch_size)
+                report.deleted_by_age += deleted
+                report.batches += 1
+                if deleted < batch_size:
+                    break
+
+        # Длинные ленты обрезаем по одной, находя их по счетчикам
+        max_entries = settings.feed.retention_max_entries
+        if max_entries is not None:
+            after_recipient_id = 0
+            while True:
+                recipient_ids = await self.feed_repo.get_overflowing_recipients(
+                    max_entries=max_entries,
+                    after_recipient_id=after_recipient_id,
+                    limit=settings.feed.counters_reconcile_batch,
+                )
+                if not recipient_ids:
+                    break
+                for recipient_id in recipient_ids:
+                    while True:
+                        deleted = await self.feed_repo.trim_recipient_events(
+                            recipient_id, keep=max_entries, limit=batch_size
+                        )
+                        report.deleted_by_size += deleted
+                        report.batches += 1
+                        if deleted < batch_size:
+                            break
+                    report.trimmed_recipients += 1
+                after_recipient_id = recipient_ids[-1]
+
+        report.deleted_progress = await self.feed_repo.delete_fanout_progress(
+            settings.feed.fanout_progress_ttl
         )
 
+        report.elapsed_ms = (time.perf_counter() - started) * 1000
+        return report
+
+    async def retract_post(self, post_id: int) -> int:
+        deleted = 0
+        batch_size = settings.feed.retraction_batch
+        while True:
+            batch_deleted = await self.feed_repo.delete_post_events(post_id, batch_size)
+            deleted += batch_deleted
+            if batch_deleted < batch_size:
+                break
+
+        # Если рассылка успела добавить новости после очистки, пост не удалится
+        # по внешнему ключу и задача повторится
+        if not await self.feed_repo.delete_hidden_post(post_id):
+            logger.warning("Скрытый пост #%d не найден, удалять нечего", post_id)
+        return deleted
+
+    async def backfill_follower(self, follower_id: int, author_id: int) -> int:
+        return await self.feed_repo.backfill_follower(
+            follower_id=follower_id,
+            author_id=author_id,
+            limit=settings.feed.backfill_posts,
+        )
+
+    async def retract_follower(self, follower_id: int, author_id: int) -> int:
+        deleted = 0
+        batch_size = settings.feed.retraction_batch
+        while True:
+            batch_deleted = await self.feed_repo.retract_follower(
+                follower_id, author_id, batch_size
+            )
+            deleted += batch_deleted
+            if batch_deleted < batch_size:
+                break
+
+        return deleted
+
 
 async def get_feed_service(
     feed_repo: FeedRepositoryDep,
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Header, Response, status
 
 from api.auth import ActiveUserDep
 from api.auth.views import http_bearer
+from core import settings
 from core.dependencies import PaginationDep
 from schemas import SearchResponseSchema
-from .schemas import FeedDetailSchema
+from utils.etag import etag_matches, etag_headers
+from .schemas import FeedDetailSchema, FanOutProgressSchema, FeedSort
 from .service import FeedServiceDep
 
 router = APIRouter(prefix="/feed", tags=["Лента"], dependencies=[Depends(http_bearer)])
@@ -15,6 +19,69 @@ async def get_user_events(
     active_user: ActiveUserDep,
     feed_service: FeedServiceDep,
     pagination: PaginationDep,
+    response: Response,
+    exact_count: bool = False,
+    sort: FeedSort = "new",
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    events = await feed_service.get_user_events(user_id=active_user.id, pagination=pagination)
+    """
+    Лента пользователя с ETag страницы. Если страница не изменилась
+    с If-None-Match, возвращается 304 без сборки новостей
+    """
+
+    page = await feed_service.get_feed_page(
+        user_id=active_user.id,
+        pagination=pagination,
+        exact_count=exact_count,
+        sort=sort,
+    )
+    headers = etag_headers(page.etag)
+    if etag_matches(if_none_match, page.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if settings.feed.compact_payloads:
+        content = await feed_service.get_user_events_compact(
+            user_id=active_user.id,
+            pagination=pagination,
+            exact_count=exact_count,
+            sort=sort,
+            page=page,
+        )
+        return Response(
+            content=content, media_type="application/json", headers=headers
+        )
+
+    if settings.api.trusted_serialization:
+        content = await feed_service.get_user_events_json(
+            user_id=active_user.id,
+            pagination=pagination,
+            exact_count=exact_count,
+            sort=sort,
+            page=page,
+        )
+        return Response(
+            content=content, media_type="application/json", headers=headers
+        )
+
+    events = await feed_service.get_user_events(
+        user_id=active_user.id,
+        pagination=pagination,
+        exact_count=exact_count,
+        sort=sort,
+        page=page,
+    )
+    response.headers.update(headers)
     return events
+
+
+@router.get("/tasks/{task_id}", response_model=FanOutProgressSchema)
+async def get_fan_out_progress(
+    active_user: ActiveUserDep,
+    feed_service: FeedServiceDep,
+    task_id: str,
+):
+    """Прогресс рассылки поста по task_id, который вернуло создание поста"""
+    progress = await feed_service.get_fan_out_progress(
+        task_id=task_id, user_id=active_user.id
+    )
+    return progress
@@ -1,4 +1,4 @@
-from sqlalchemy import UniqueConstraint, ForeignKey
+from sqlalchemy import UniqueConstraint, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from models import Base, DateMixin
@@ -12,6 +12,8 @@ class Follow(Base, DateMixin):
             "followee_id",
             name="unique_follows",
         ),
+        # Подписчики автора читаются пачками по возрастанию follower_id
+        Index("ix_follows_followee_id_follower_id", "followee_id", "follower_id"),
     )
 
     follower_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
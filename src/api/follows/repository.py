@@ -2,10 +2,12 @@ import logging
 from typing import Protocol, Annotated, Optional, Sequence
 
 from fastapi import Depends
-from sqlalchemy import delete, select
+from sqlalchemy import delete, select, func
+from sqlalchemy.dialects.postgresql import Insert, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.dependencies import SessionDep
+from api.feeds.models import UserFeedCounter
 from .models import Follow
 
 logger = logging.getLogger(__name__)
@@ -27,6 +29,17 @@ class FollowsRepositoryProtocol(Protocol):
     async def get_subs_ids(self, user_id: int) -> Sequence[int]:
         pass
 
+    async def count_subs(self, user_id: int, limit: Optional[int] = None) -> int:
+        """Считает подписчиков пользователя, но не больше limit"""
+        pass
+
+    async def get_subs_boundaries(self, user_id: int, size: int) -> Sequence[int]:
+        """
+        Делит подписчиков пользователя по возрастанию id на диапазоны по size
+        * возвращает id последнего подписчика каждого полного диапазона
+        """
+        pass
+
 
 class FollowsRepository:
 
@@ -39,6 +52,7 @@ class FollowsRepository:
         )
         follow = Follow(follower_id=follower_id, followee_id=followee_id)
         self.session.add(follow)
+        await self.session.execute(self._touch_feed(follower_id))
         await self.session.commit()
         return follow.id
 
@@ -51,6 +65,7 @@ class FollowsRepository:
             followee_id=follow.followee_id,
         )
         await self.session.execute(stmt)
+        await self.session.execute(self._touch_feed(follow.follower_id))
         await self.session.commit()
         return
 
@@ -72,6 +87,46 @@ class FollowsRepository:
         follows = await self.session.scalars(query)
         return follows.all()
 
+    async def count_subs(self, user_id: int, limit: Optional[int] = None) -> int:
+        logger.debug(f"Считаем подписчиков пользователя {user_id = } до {limit = } ...")
+        subs = select(Follow.follower_id).filter_by(followee_id=user_id)
+        if limit is not None:
+            subs = subs.limit(limit)
+        query = select(func.count()).select_from(subs.subquery())
+        return await self.session.scalar(query)
+
+    async def get_subs_boundaries(self, user_id: int, size: int) -> Sequence[int]:
+        logger.debug(f"Делим подписчиков пользователя {user_id = } по {size} ...")
+        numbered = (
+            select(
+                Follow.follower_id,
+                func.row_number().over(order_by=Follow.follower_id).label("num"),
+            )
+            .where(Follow.followee_id == user_id)
+            .subquery()
+        )
+        query = (
+            select(numbered.c.follower_id)
+            .where(numbered.c.num % size == 0)
+            .order_by(numbered.c.follower_id)
+        )
+        res = await self.session.scalars(query)
+        return res.all()
+
+    @staticmethod
+    def _touch_feed(follower_id: int) -> Insert:
+        """
+        Сдвигает версию ленты подписчика: подписка меняет подтягиваемые
+        в ленту посты, и кеш лент должен их перечитать
+        """
+        stmt = insert(UserFeedCounter).values(
+            recipient_id=follower_id, follows_version=1
+        )
+        return stmt.on_conflict_do_update(
+            index_elements=["recipient_id"],
+            set_={"follows_version": UserFeedCounter.follows_version + 1},
+        )
+
 
 async def get_follows_repository(session: SessionDep) -> FollowsRepositoryProtocol:
     return FollowsRepository(session)
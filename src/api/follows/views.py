@@ -1,6 +1,7 @@
 from fastapi import APIRouter, status, Depends
 
 from api.auth import ActiveUserDep, http_bearer
+from api.tasks.feed_tasks import backfill_follower_feed, retract_follower_feed
 from schemas import BaseResponseSchema
 from .service import FollowsServiceDep
 
@@ -24,6 +25,9 @@ async def subscribe_user(
         cur_user_id=active_user.id, target_id=target_id
     )
 
+    # Последние посты пользователя попадут в ленту фоновой задачей
+    await backfill_follower_feed.kiq(follower_id=active_user.id, author_id=target_id)
+
     return BaseResponseSchema(
         detail=f"Пользователь успешно подписался на {target_id = }"
     )
@@ -40,4 +44,7 @@ async def unsubscribe_user(
         cur_user_id=active_user.id, target_id=target_id
     )
 
+    # Посты пользователя удалятся из ленты фоновой задачей
+    await retract_follower_feed.kiq(follower_id=active_user.id, author_id=target_id)
+
     return
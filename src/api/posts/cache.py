@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Protocol
+
+from core import settings
+from .schemas import PostCacheStatsSchema
+
+logger = logging.getLogger(__name__)
+
+
+class PostCacheBackend(Protocol):
+    """
+    Хранилище кеша постов: JSON поста по ключу.
+    Внешнее хранилище (redis, memcached) реализует те же методы
+    """
+
+    # Вытеснено записей, 0 - если хранилище об этом не сообщает
+    evictions: int
+
+    async def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    async def set(self, key: str, value: bytes) -> None:
+        pass
+
+    async def delete(self, key: str) -> None:
+        pass
+
+    def size(self) -> Optional[int]:
+        """Число записей в кеше или None, если оно неизвестно"""
+        pass
+
+
+class LRUCacheBackend:
+    """
+    Кеш в памяти процесса
+    * при превышении max_entries вытесняются давно читавшиеся записи
+    * запись старше ttl секунд считается отсутствующей
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class PostCache:
+    """
+    Сквозной кеш постов поверх хранилища
+    * промах читает пост из базы и кладет его в хранилище
+    * одновременные промахи по одному посту ждут одного чтения из базы
+    * прочитанное до изменения поста не попадает в кеш после него
+    """
+
+    def __init__(self, backend: PostCacheBackend):
+        self.backend = backend
+        self._loading: dict[str, asyncio.Future[Optional[bytes]]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(user_id: int, post_id: int) -> str:
+        return f"post:{user_id}:{post_id}"
+
+    async def get_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Optional[bytes]]],
+    ) -> Optional[bytes]:
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            self.coalesced += 1
+            return await asyncio.shield(loading)
+
+        self.misses += 1
+        # Чтение идет отдельной задачей: отмена первого запроса
+        # не прерывает его для остальных ожидающих
+        loading = asyncio.ensure_future(load())
+        self._loading[key] = loading
+        try:
+            value = await asyncio.shield(loading)
+        finally:
+            # Ключ уже сброшен изменением поста, если там другое чтение
+            current = self._loading.get(key) is loading
+            if current:
+                del self._loading[key]
+
+        # Отсутствующие посты не кешируются
+        if current and value is not None:
+            await self.backend.set(key, value)
+        return value
+
+    async def invalidate(self, key: str) -> None:
+        self._loading.pop(key, None)
+        await self.backend.delete(key)
+        self.invalidations += 1
+        logger.debug("Пост %s удален из кеша", key)
+
+    def stats(self) -> PostCacheStatsSchema:
+        lookups = self.hits + self.misses + self.coalesced
+        return PostCacheStatsSchema(
+            entries=self.backend.size(),
+            hits=self.hits,
+            misses=self.misses,
+            coalesced=self.coalesced,
+            evictions=self.backend.evictions,
+            invalidations=self.invalidations,
+            hit_ratio=self.hits / lookups if lookups else 0,
+        )
+
+
+post_cache = PostCache(
+    LRUCacheBackend(
+        max_entries=settings.post_cache.max_entries,
+        ttl=settings.post_cache.ttl,
+    )
+)
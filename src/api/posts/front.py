@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+
+from core import settings, db_helper
+from utils.serialization import dump_json
+from .repository import PostRepository
+
+logger = logging.getLogger(__name__)
+
+
+class FrontPage:
+    """Последние посты всех пользователей от новых к старым"""
+
+    __slots__ = ("rows", "items", "keys", "total", "complete", "loaded_at")
+
+    def __init__(self, rows: list[dict[str, Any]], total: int, size: int):
+        self.rows = rows
+        # Новости заранее сериализованы и вставляются в ответ как есть
+        self.items = [orjson.Fragment(dump_json(row)) for row in rows]
+        self.keys = [(row["post"]["created_at"], row["post"]["id"]) for row in rows]
+        self.total = total
+        # В снимке все посты, дальше читать нечего
+        self.complete = len(rows) < size
+        self.loaded_at = time.monotonic()
+
+    def page(
+        self,
+        limit: int,
+        offset: int = 0,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> Optional[tuple[int, int]]:
+        """
+        Возвращает границы страницы в снимке [start, end)
+        * None, если страница выходит за пределы снимка
+        """
+        start = offset
+        if before is not None:
+            # Ключи в снимке убывают: ищем первый пост старше курсора
+            lo, hi = 0, len(self.keys)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.keys[mid] < before:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            start = lo
+
+        # Лишний пост показывает, есть ли следующая страница
+        end = start + limit + 1
+        if end > len(self.rows) and not self.complete:
+            return None
+        return start, min(end, len(self.rows))
+
+
+class FrontPageSnapshot:
+    """
+    Снимок первых страниц общей ленты в памяти процесса
+    * запросы читают снимок и не ходят в базу
+    * устаревший снимок обновляется в фоне, запросы тем временем
+      получают прежний; ждет базу только запрос к пустому снимку
+    """
+
+    def __init__(
+        self,
+        load: Callable[[int], Awaitable[tuple[list[dict[str, Any]], int]]],
+        size: int,
+        refresh: float,
+    ):
+        self.load = load
+        self.size = size
+        self.refresh = refresh
+        self._front: Optional[FrontPage] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        # Растет при сбросе: обновление, начатое до сброса, не сохраняется
+        self._generation = 0
+
+    async def get(self) -> FrontPage:
+        front = self._front
+        if front is None:
+            return await asyncio.shield(self._start_refresh())
+
+        if time.monotonic() - front.loaded_at > self.refresh:
+            self._start_refresh()
+        return front
+
+    def invalidate(self) -> None:
+        """Сбрасывает снимок, следующий запрос дождется нового"""
+        self._front = None
+        self._refreshing = None
+        self._generation += 1
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+            self._refreshing.add_done_callback(self._log_failure)
+        return self._refreshing
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        # Запросы продолжат получать прежний снимок до следующей попытки
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                "Не удалось обновить снимок общей ленты: %r", task.exception()
+            )
+
+    async def _refresh(self) -> FrontPage:
+        started = time.perf_counter()
+        generation = self._generation
+        rows, total = await self.load(self.size)
+        front = FrontPage(rows, total=total, size=self.size)
+        if generation == self._generation:
+            self._front = front
+        logger.debug(
+            "Снимок общей ленты обновлен: %d постов за %.1f мс",
+            len(rows),
+            (time.perf_counter() - started) * 1000,
+        )
+        return front
+
+
+async def load_front_page(size: int) -> tuple[list[dict[str, Any]], int]:
+    # Снимок переживает запрос, который начал его обновление,
+    # поэтому у него своя сессия
+    async with db_helper.session() as session:
+        repo = PostRepository(session)
+        rows = await repo.get_front_rows(limit=size, offset=0)
+        total = await repo.count_posts(limit=settings.posts.count_limit)
+    return rows, total
+
+
+front_page_snapshot = FrontPageSnapshot(
+    load_front_page,
+    size=settings.posts.front_snapshot_size,
+    refresh=settings.posts.front_refresh,
+)
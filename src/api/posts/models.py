@@ -1,23 +1,67 @@
 from typing import Optional, TYPE_CHECKING
 
+from sqlalchemy import Computed, false, text, Float
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy.sql.schema import UniqueConstraint, ForeignKey
+from sqlalchemy.sql.schema import ForeignKey, Index
 from sqlalchemy.types import String
 
 from api.feeds.models import UserFeed
 from models import Base, DateMixin
+from .ranking import HOT_SCORE_DEFAULT
 
 if TYPE_CHECKING:
     from api.auth.users.models import User
 
+# Конфигурация полнотекстового поиска: русские слова и английские
+# (asciiword) приводятся к основам, остальное - как есть
+SEARCH_CONFIG = "russian"
+
 
 class Post(Base, DateMixin):
     __tablename__ = "posts"
     __table_args__ = (
-        UniqueConstraint(
+        # Название удаленного поста можно занять сразу, не дожидаясь,
+        # пока пост уберется из лент
+        Index(
+            "unique_title_with_user",
             "title",
             "user_id",
-            name="unique_title_with_user",
+            unique=True,
+            postgresql_where=text("NOT is_hidden"),
+        ),
+        # Посты популярных авторов, которые подтягиваются в ленту при чтении
+        Index(
+            "ix_posts_user_id_id_pulled",
+            "user_id",
+            text("id DESC"),
+            postgresql_where=text("is_pulled"),
+        ),
+        # Граница хранения ленты ищется по дате поста
+        Index("ix_posts_created_at", "created_at"),
+        # Посты автора от новых к старым: список постов по курсору
+        # и последние посты для ленты нового подписчика
+        Index(
+            "ix_posts_user_id_created_at_id",
+            "user_id",
+            text("created_at DESC"),
+            text("id DESC"),
+        ),
+        # Посты с изменившимся счетом, которым нужно пересчитать рейтинг
+        Index("ix_posts_rank_dirty", "id", postgresql_where=text("rank_dirty")),
+        # Общая лента: посты всех пользователей от новых к старым
+        Index(
+            "ix_posts_created_at_id_visible",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_where=text("NOT is_hidden"),
+        ),
+        # Полнотекстовый поиск по видимым постам (api.search)
+        Index(
+            "ix_posts_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+            postgresql_where=text("NOT is_hidden"),
         ),
     )
 
@@ -25,6 +69,34 @@ class Post(Base, DateMixin):
     user_id: Mapped[str] = mapped_column(ForeignKey("users.id"))
     title: Mapped[str] = mapped_column(String(128))
     description: Mapped[Optional[str]] = mapped_column(String(2048))
+    # Пост не рассылался подписчикам из-за их большого числа
+    is_pulled: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # Пост удален автором и ждет удаления из лент подписчиков
+    is_hidden: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # Счет голосов и рейтинг hot для сортировок ленты. Рейтинг копируется
+    # в строки users_feed и пересчитывается фоновой задачей, пока поднят
+    # rank_dirty
+    score: Mapped[int] = mapped_column(default=0, server_default="0")
+    # Число голосов за и против. Счетчики и счет пишутся пачками
+    # из буфера голосов процесса API (api.votes.buffer)
+    upvotes: Mapped[int] = mapped_column(default=0, server_default="0")
+    downvotes: Mapped[int] = mapped_column(default=0, server_default="0")
+    hot_score: Mapped[float] = mapped_column(
+        Float, server_default=text(HOT_SCORE_DEFAULT)
+    )
+    rank_dirty: Mapped[bool] = mapped_column(default=False, server_default=false())
+    # Слова названия (вес A) и описания (вес B) для поиска. Колонку считает
+    # база, а при чтении постов она не загружается
+    search_vector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+            "coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+        deferred=True,
+    )
 
     # Отношения
     user: Mapped["User"] = relationship(back_populates="posts")
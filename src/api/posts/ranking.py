@@ -0,0 +1,19 @@
+from sqlalchemy import ColumnElement, Float, cast, func
+
+# Ранжирование hot как у reddit: время публикации дает HOT_DECAY секунд
+# на единицу рейтинга, а голоса - десятичный логарифм счета. Пост
+# с 10 голосами стоит наравне с постом без голосов, опубликованным
+# на 12.5 часов позже. Рейтинг не зависит от текущего времени, поэтому
+# пересчитывается только при изменении счета
+HOT_EPOCH = 1134028003
+HOT_DECAY = 45000
+
+# Рейтинг нового поста без голосов, значение по умолчанию колонки hot_score
+HOT_SCORE_DEFAULT = f"(extract(epoch FROM now()) - {HOT_EPOCH}) / {HOT_DECAY}"
+
+
+def hot_score(score, created_at) -> ColumnElement[float]:
+    """SQL выражение рейтинга hot по счету и времени публикации поста"""
+    order = func.log(cast(func.greatest(func.abs(score), 1), Float))
+    seconds = cast(func.extract("epoch", created_at), Float) - HOT_EPOCH
+    return cast(func.sign(score), Float) * order + seconds / HOT_DECAY
@@ -1,14 +1,36 @@
 import logging
+from datetime import datetime
 from typing import Protocol, Annotated, Optional, Sequence, Any
 
 from fastapi import Depends
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, func, tuple_, Select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from core import settings
+from core.database import is_unique_violation
 from core.dependencies import SessionDep
 from core.exceptions import BadValidationException
+from api.auth.users.models import User
+from api.auth.users.schemas import UserSummaryReadSchema
+from api.feeds.models import (
+    FeedItem,
+    UserFeed,
+    UserFeedCounter,
+    PulledPostsVersion,
+    PULLED_POSTS_VERSION_ID,
+)
+from utils.serialization import schema_columns, dump_json
+from .cache import PostCache, post_cache
+from .exceptions import PostAlreadyExist
 from .models import Post
-from .schemas import PostUpdateSchema, PostUpdatePartialSchema, PostCreateSchema
+from .schemas import (
+    PostUpdateSchema,
+    PostUpdatePartialSchema,
+    PostCreateSchema,
+    PostReadSchema,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,34 +41,94 @@ class PostRepositoryProtocol(Protocol):
         self,
         user_id: int,
         post_data: PostCreateSchema,
-    ) -> int:
+    ) -> Optional[int]:
+        """
+        Создаем пост одним запросом
+        * возвращает None, если у пользователя уже есть пост с таким названием
+        """
+        pass
+
+    async def create_user_posts(
+        self,
+        user_id: int,
+        posts_data: Sequence[PostCreateSchema],
+    ) -> dict[str, int]:
+        """
+        Создаем пачку постов одним запросом
+        * возвращает id созданных постов по названию, посты с занятым
+          названием (в том числе повтор внутри пачки) пропускаются
+        """
         pass
 
     async def get_user_post(self, user_id: int, *args, **kwargs) -> Optional[Post]:
         pass
 
+    async def get_user_post_json(self, user_id: int, post_id: int) -> Optional[bytes]:
+        """JSON поста в форме PostReadSchema или None, если поста нет"""
+        pass
+
     async def get_user_posts(
         self,
         user_id: int,
         limit: int,
         offset: int,
+        before: Optional[tuple[datetime, int]] = None,
         *args,
         **kwargs,
     ) -> Sequence[Post]:
+        """
+        Получаем посты пользователя от новых к старым
+        * с пагинацией по странице (offset) или по курсору (before) -
+          времени создания и id последнего поста предыдущей страницы
+        """
+        pass
+
+    async def get_user_posts_rows(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
+        """То же, что get_user_posts, но строками с полями PostReadSchema"""
+        pass
+
+    async def count_user_posts(self, user_id: int, limit: Optional[int] = None) -> int:
+        """Считает посты пользователя, но не больше limit"""
         pass
 
-    async def check_post_exists(self, user_id: int, title: str) -> bool:
+    async def get_front_rows(
+        self,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Получаем посты всех пользователей от новых к старым строками
+        с полями FeedDetailSchema (автор и пост)
+        """
+        pass
+
+    async def count_posts(self, limit: Optional[int] = None) -> int:
+        """Считает посты всех пользователей, но не больше limit"""
         pass
 
     async def update_post(
         self,
-        post: Post,
+        user_id: int,
+        post_id: int,
         update_data: PostUpdateSchema | PostUpdatePartialSchema,
         partial: bool,
     ) -> Optional[Post]:
+        """
+        Обновляем пост пользователя одним запросом UPDATE ... RETURNING
+        * возвращает None, если поста нет
+        * PostAlreadyExist, если у пользователя уже есть пост с таким названием
+        """
         pass
 
-    async def delete_post(self, post: Post) -> None:
+    async def hide_post(self, post: Post) -> None:
+        """Скрывает пост, удаленный автором, до его удаления из лент"""
         pass
 
 
@@ -62,24 +144,66 @@ class PostRepository:
         self,
         user_id: int,
         post_data: PostCreateSchema,
-    ) -> int:
+    ) -> Optional[int]:
         logger.debug('Создаем пост "%s" ...', post_data.title)
-        post = Post(user_id=user_id, **post_data.model_dump())
-        self.session.add(post)
+        # Уникальность названия проверяет индекс unique_title_with_user,
+        # без отдельного запроса и гонки с параллельным созданием
+        stmt = (
+            insert(Post)
+            .values(user_id=user_id, **post_data.model_dump())
+            .on_conflict_do_nothing(
+                index_elements=["title", "user_id"],
+                index_where=~Post.is_hidden,
+            )
+            .returning(Post.id)
+        )
+        post_id = await self.session.scalar(stmt)
         await self.session.commit()
-        return post.id
+        return post_id
+
+    async def create_user_posts(
+        self,
+        user_id: int,
+        posts_data: Sequence[PostCreateSchema],
+    ) -> dict[str, int]:
+        logger.debug("Создаем пачку из %d постов ...", len(posts_data))
+        # Порядок RETURNING не гарантирован, поэтому сопоставляем по названию:
+        # среди созданных постов пользователя оно уникально
+        stmt = (
+            insert(Post)
+            .values([{"user_id": user_id, **post.model_dump()} for post in posts_data])
+            .on_conflict_do_nothing(
+                index_elements=["title", "user_id"],
+                index_where=~Post.is_hidden,
+            )
+            .returning(Post.title, Post.id)
+        )
+        res = await self.session.execute(stmt)
+        created = {title: post_id for title, post_id in res.all()}
+        await self.session.commit()
+        return created
 
     async def get_user_post(self, user_id: int, *args, **kwargs) -> Optional[Post]:
         logger.debug(f"Ищем пост пользователя #{user_id} с {kwargs} ...")
-        query = select(Post).filter_by(user_id=user_id, **kwargs)
+        query = select(Post).filter_by(user_id=user_id, is_hidden=False, **kwargs)
         res = await self.session.execute(query)
         return res.scalar_one_or_none()
 
+    async def get_user_post_json(self, user_id: int, post_id: int) -> Optional[bytes]:
+        logger.debug("Ищем пост #%d пользователя #%d строкой ...", post_id, user_id)
+        query = select(*schema_columns(PostReadSchema, Post)).filter_by(
+            id=post_id, user_id=user_id, is_hidden=False
+        )
+        res = await self.session.execute(query)
+        row = res.one_or_none()
+        return None if row is None else dump_json(row._asdict())
+
     async def get_user_posts(
         self,
         user_id: int,
         limit: int,
         offset: int,
+        before: Optional[tuple[datetime, int]] = None,
         *args,
         **kwargs,
     ) -> Sequence[Post]:
@@ -89,54 +213,277 @@ class PostRepository:
             user_id,
             offset,
         )
-        query = select(Post).filter_by(user_id=user_id, **kwargs)
-        query = query.limit(limit).offset(offset)
+        query = self._user_posts_query(select(Post), user_id, limit, offset, before)
+        query = query.filter_by(**kwargs)
         res = await self.session.execute(query)
         return res.scalars().all()
 
-    async def check_post_exists(self, user_id: int, title: str) -> bool:
+    async def get_user_posts_rows(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
         logger.debug(
-            f"Проверяем существует ли пост пользователя #%d с названием %s ...",
+            f"Ищем %d постов пользователя #%d строками, начиная с %d ...",
+            limit,
+            user_id,
+            offset,
+        )
+        query = self._user_posts_query(
+            select(*schema_columns(PostReadSchema, Post)),
             user_id,
-            title,
+            limit,
+            offset,
+            before,
+        )
+        res = await self.session.execute(query)
+        return [row._asdict() for row in res]
+
+    async def count_user_posts(self, user_id: int, limit: Optional[int] = None) -> int:
+        logger.debug(f"Считаем посты пользователя #%d до {limit = } ...", user_id)
+        posts = select(Post.id).filter_by(user_id=user_id, is_hidden=False)
+        if limit is not None:
+            posts = posts.limit(limit)
+        query = select(func.count()).select_from(posts.subquery())
+        return await self.session.scalar(query)
+
+    async def get_front_rows(
+        self,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
+        logger.debug("Ищем %d последних постов, начиная с %d ...", limit, offset)
+        author_columns = schema_columns(UserSummaryReadSchema, User)
+        post_columns = schema_columns(PostReadSchema, Post)
+        # Порядок совпадает с индексом ix_posts_created_at_id_visible
+        query = (
+            select(*author_columns, *post_columns)
+            .join(User, User.id == Post.user_id)
+            .where(~Post.is_hidden)
+        )
+        if before is not None:
+            query = query.where(tuple_(Post.created_at, Post.id) < before)
+            offset = 0
+        query = (
+            query.order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit)
+            .offset(offset)
+        )
+        res = await self.session.execute(query)
+
+        # Первые колонки строки - автор, остальные - пост
+        split = len(author_columns)
+        author_fields = list(UserSummaryReadSchema.model_fields)
+        post_fields = list(PostReadSchema.model_fields)
+        return [
+            {
+                "author": dict(zip(author_fields, row[:split])),
+                "post": dict(zip(post_fields, row[split:])),
+            }
+            for row in res
+        ]
+
+    async def count_posts(self, limit: Optional[int] = None) -> int:
+        logger.debug(f"Считаем посты всех пользователей до {limit = } ...")
+        posts = select(Post.id).where(~Post.is_hidden)
+        if limit is not None:
+            posts = posts.limit(limit)
+        query = select(func.count()).select_from(posts.subquery())
+        return await self.session.scalar(query)
+
+    @staticmethod
+    def _user_posts_query(
+        query: Select,
+        user_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]],
+    ) -> Select:
+        # Порядок совпадает с индексом ix_posts_user_id_created_at_id,
+        # курсор продолжает чтение диапазона индекса без offset
+        query = query.filter_by(user_id=user_id, is_hidden=False)
+        if before is not None:
+            query = query.where(tuple_(Post.created_at, Post.id) < before)
+            offset = 0
+        return (
+            query.order_by(Post.created_at.desc(), Post.id.desc())
+            .limit(limit)
+            .offset(offset)
         )
-        query = select(Post).filter_by(user_id=user_id, title=title)
-        res = await self.session.scalar(query)
-        return True if res else False
 
     async def update_post(
         self,
-        post: Post,
+        user_id: int,
+        post_id: int,
         update_data: PostUpdateSchema | PostUpdatePartialSchema,
         partial: bool,
     ) -> Optional[Post]:
-        logger.debug("Обновляем пост #%d ...", post.id)
-
-        for key, value in update_data.model_dump(
-            exclude_none=partial,
-            exclude_unset=partial,
-        ).items():
-            if not hasattr(post, key):
+        logger.debug("Обновляем пост #%d ...", post_id)
+        values = update_data.model_dump(exclude_none=partial, exclude_unset=partial)
+        for key in values:
+            if key not in Post.__table__.columns:
                 logger.error("Некорректное поле для обновления: %s", key)
                 raise BadValidationException(
                     "Некорректное поле для обновления: %s", key
                 )
-            setattr(post, key, value)
+        if not values:
+            return await self.get_user_post(user_id, id=post_id)
 
-        await self.session.commit()
-        await self.session.refresh(post)
+        # Изменения применяются без чтения поста, занятое название
+        # находит индекс unique_title_with_user
+        stmt = (
+            update(Post)
+            .filter_by(id=post_id, user_id=user_id, is_hidden=False)
+            .values(**values)
+            .returning(Post)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            post = await self.session.scalar(stmt)
+            await self.session.commit()
+        except IntegrityError as e:
+            if not is_unique_violation(e):
+                raise
+            await self.session.rollback()
+            logger.error(PostAlreadyExist.message)
+            raise PostAlreadyExist
         return post
 
-    async def delete_post(self, post: Post) -> None:
-        logger.debug("Удаляем пост #%d ...", post.id)
-        stmt = delete(Post).filter_by(id=post.id, user_id=post.user_id)
+    async def hide_post(self, post: Post) -> None:
+        logger.debug("Скрываем пост #%d ...", post.id)
+        stmt = update(Post).filter_by(id=post.id, user_id=post.user_id).values(
+            is_hidden=True
+        )
         await self.session.execute(stmt)
+        # Готовая новость о скрытом посте больше не понадобится
+        await self.session.execute(delete(FeedItem).filter_by(post_id=post.id))
+        # Кеш лент перечитает ленты с постом по их новой версии. Счетчики
+        # блокируются по возрастанию id, как при рассылке
+        locked = (
+            select(UserFeedCounter.id)
+            .where(
+                UserFeedCounter.recipient_id.in_(
+                    select(UserFeed.recipient_id).filter_by(post_id=post.id)
+                )
+            )
+            .order_by(UserFeedCounter.recipient_id)
+            .with_for_update()
+            .cte("locked")
+        )
+        await self.session.execute(
+            update(UserFeedCounter)
+            .where(UserFeedCounter.id.in_(select(locked.c.id)))
+            .values(version=UserFeedCounter.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        if post.is_pulled:
+            # Подтягиваемый пост не разослан: меняется общая версия таких постов
+            stmt = insert(PulledPostsVersion).values(id=PULLED_POSTS_VERSION_ID)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={"version": PulledPostsVersion.version + 1},
+            )
+            await self.session.execute(stmt)
         await self.session.commit()
         return
 
 
+class CachedPostRepository:
+    """
+    Репозиторий постов с кешем JSON постов перед чтением по id
+    * изменение и удаление поста сбрасывают его из кеша
+    * остальные запросы идут в базу
+    """
+
+    def __init__(self, repo: PostRepositoryProtocol, cache: PostCache):
+        self.repo = repo
+        self.cache = cache
+
+    async def create_user_post(
+        self,
+        user_id: int,
+        post_data: PostCreateSchema,
+    ) -> Optional[int]:
+        return await self.repo.create_user_post(user_id, post_data)
+
+    async def create_user_posts(
+        self,
+        user_id: int,
+        posts_data: Sequence[PostCreateSchema],
+    ) -> dict[str, int]:
+        return await self.repo.create_user_posts(user_id, posts_data)
+
+    async def get_user_post(self, user_id: int, *args, **kwargs) -> Optional[Post]:
+        return await self.repo.get_user_post(user_id, *args, **kwargs)
+
+    async def get_user_post_json(self, user_id: int, post_id: int) -> Optional[bytes]:
+        return await self.cache.get_or_load(
+            PostCache.key(user_id, post_id),
+            lambda: self.repo.get_user_post_json(user_id, post_id),
+        )
+
+    async def get_user_posts(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+        *args,
+        **kwargs,
+    ) -> Sequence[Post]:
+        return await self.repo.get_user_posts(
+            user_id, limit, offset, before, *args, **kwargs
+        )
+
+    async def get_user_posts_rows(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
+        return await self.repo.get_user_posts_rows(user_id, limit, offset, before)
+
+    async def count_user_posts(self, user_id: int, limit: Optional[int] = None) -> int:
+        return await self.repo.count_user_posts(user_id, limit)
+
+    async def get_front_rows(
+        self,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[datetime, int]] = None,
+    ) -> list[dict[str, Any]]:
+        return await self.repo.get_front_rows(limit, offset, before)
+
+    async def count_posts(self, limit: Optional[int] = None) -> int:
+        return await self.repo.count_posts(limit)
+
+    async def update_post(
+        self,
+        user_id: int,
+        post_id: int,
+        update_data: PostUpdateSchema | PostUpdatePartialSchema,
+        partial: bool,
+    ) -> Optional[Post]:
+        try:
+            return await self.repo.update_post(user_id, post_id, update_data, partial)
+        finally:
+            await self.cache.invalidate(PostCache.key(user_id, post_id))
+
+    async def hide_post(self, post: Post) -> None:
+        key = PostCache.key(post.user_id, post.id)
+        await self.repo.hide_post(post)
+        await self.cache.invalidate(key)
+
+
 async def get_posts_repository(session: SessionDep) -> PostRepositoryProtocol:
-    return PostRepository(session)
+    repo = PostRepository(session)
+    if settings.post_cache.enabled:
+        return CachedPostRepository(repo, post_cache)
+    return repo
 
 
 PostRepositoryDep = Annotated[PostRepositoryProtocol, Depends(get_posts_repository)]
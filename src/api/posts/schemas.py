@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Literal
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class PostBaseSchema(BaseModel):
@@ -28,3 +28,34 @@ class PostUpdateSchema(PostBaseSchema):
 class PostUpdatePartialSchema(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
+
+
+class PostBatchCreateSchema(BaseModel):
+    posts: list[PostCreateSchema] = Field(min_length=1, max_length=500)
+
+
+class PostBatchItemSchema(BaseModel):
+    """Итог создания одного поста пачки, в порядке запроса"""
+
+    title: str
+    status: Literal["created", "conflict"]
+    post_id: Optional[int] = None
+
+
+class PostBatchCreatedSchema(BaseModel):
+    items: list[PostBatchItemSchema]
+    created: int
+    conflicts: int
+
+
+class PostCacheStatsSchema(BaseModel):
+    # Число постов в кеше, если хранилище его сообщает
+    entries: Optional[int]
+    hits: int
+    misses: int
+    # Запросы, дождавшиеся чтения того же поста другим запросом
+    coalesced: int
+    evictions: int
+    # Посты, удаленные из кеша после изменения
+    invalidations: int
+    hit_ratio: float
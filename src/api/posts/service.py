@@ -1,18 +1,27 @@
 import logging
-from typing import Protocol, Annotated
+from datetime import datetime
+from typing import Protocol, Annotated, Optional, Sequence, Callable
 
+import orjson
 from fastapi import Depends
 from sqlalchemy.ext.asyncio.session import AsyncSession
 
+from core import settings
+from api.feeds.schemas import FeedDetailSchema
 from core.dependencies import SessionDep
-from schemas import PaginationSchema
+from schemas import PaginationSchema, SearchResponseSchema
+from utils.cursor import encode_cursor, decode_cursor
+from utils.etag import make_etag
+from utils.serialization import dump_search_response
 from .exceptions import PostNotFoundException, PostAlreadyExist
+from .front import front_page_snapshot
 from .repository import PostRepositoryProtocol, PostRepositoryDep
 from .schemas import (
     PostCreateSchema,
     PostReadSchema,
     PostUpdateSchema,
     PostUpdatePartialSchema,
+    PostBatchItemSchema,
 )
 
 logger = logging.getLogger(__name__)
@@ -23,12 +32,58 @@ class PostServiceProtocol(Protocol):
     async def create_post(self, user_id: int, post_data: PostCreateSchema) -> int:
         pass
 
+    async def create_posts(
+        self,
+        user_id: int,
+        posts_data: Sequence[PostCreateSchema],
+    ) -> list[PostBatchItemSchema]:
+        """Создаем пачку постов, итог по каждому посту в порядке запроса"""
+        pass
+
     async def get_post_by_post_id(self, user_id: int, post_id: int) -> PostReadSchema:
         pass
 
+    async def get_post_json(self, user_id: int, post_id: int) -> bytes:
+        """То же, что get_post_by_post_id, но сразу JSON поста"""
+        pass
+
+    def get_post_etag(self, post: PostReadSchema | bytes) -> str:
+        """ETag поста (схемы или JSON) по времени его изменения"""
+        pass
+
     async def get_posts(
-        self, user_id: int, pagination: PaginationSchema
-    ) -> list[PostReadSchema]:
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[PostReadSchema]:
+        """
+        Получаем посты пользователя от новых к старым, курсор следующей
+        страницы и число постов (без exact_count не больше posts.count_limit)
+        """
+        pass
+
+    async def get_posts_json(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> bytes:
+        """То же, что get_posts, но сразу JSON ответа из строк базы"""
+        pass
+
+    async def get_front_page(
+        self,
+        pagination: PaginationSchema,
+    ) -> SearchResponseSchema[FeedDetailSchema]:
+        """
+        Получаем посты всех пользователей от новых к старым.
+        Первые страницы берутся из снимка в памяти, более глубокие - из базы
+        """
+        pass
+
+    async def get_front_page_json(self, pagination: PaginationSchema) -> bytes:
+        """То же, что get_front_page, но сразу JSON ответа"""
         pass
 
     async def update_post(
@@ -56,40 +111,185 @@ class PostService:
         self.post_repo = post_repo
 
     async def create_post(self, user_id: int, post_data: PostCreateSchema) -> int:
-        exists_post = await self.post_repo.check_post_exists(
-            user_id, title=post_data.title
-        )
-        if exists_post:
-            logger.error(f"Пользователь #%d уже имеет пост с таким названием", user_id)
-            raise PostAlreadyExist
-
         post_id = await self.post_repo.create_user_post(
             user_id=user_id,
             post_data=post_data,
         )
+        if post_id is None:
+            logger.error(f"Пользователь #%d уже имеет пост с таким названием", user_id)
+            raise PostAlreadyExist
+
         logger.info(f"Пост #%d пользователя #%d успешно создан!", post_id, user_id)
         return post_id
 
+    async def create_posts(
+        self,
+        user_id: int,
+        posts_data: Sequence[PostCreateSchema],
+    ) -> list[PostBatchItemSchema]:
+        created = await self.post_repo.create_user_posts(
+            user_id=user_id,
+            posts_data=posts_data,
+        )
+
+        # Id достается первому посту с названием, повторы - конфликты
+        items = []
+        for post_data in posts_data:
+            post_id = created.pop(post_data.title, None)
+            items.append(
+                PostBatchItemSchema(
+                    title=post_data.title,
+                    status="conflict" if post_id is None else "created",
+                    post_id=post_id,
+                )
+            )
+
+        logger.info(
+            f"Пользователь #%d создал %d постов из %d",
+            user_id,
+            sum(item.post_id is not None for item in items),
+            len(items),
+        )
+        return items
+
     async def get_post_by_post_id(self, user_id: int, post_id: int) -> PostReadSchema:
-        post = await self.post_repo.get_user_post(user_id=user_id, id=post_id)
-        if not post:
+        content = await self.get_post_json(user_id, post_id)
+        return PostReadSchema.model_validate_json(content)
+
+    async def get_post_json(self, user_id: int, post_id: int) -> bytes:
+        # Пост читается через кеш, если он включен
+        content = await self.post_repo.get_user_post_json(user_id, post_id)
+        if content is None:
             logger.error(PostNotFoundException.message)
             raise PostNotFoundException
         logger.info(f"Пользователь #%d открыл пост #%d", user_id, post_id)
-        return PostReadSchema.model_validate(post)
+        return content
+
+    def get_post_etag(self, post: PostReadSchema | bytes) -> str:
+        # Пост меняется только обновлением, которое сдвигает updated_at
+        if isinstance(post, bytes):
+            fields = orjson.loads(post)
+            return make_etag("post", fields["id"], fields["updated_at"])
+        return make_etag("post", post.id, post.updated_at)
 
     async def get_posts(
         self,
         user_id: int,
         pagination: PaginationSchema,
-    ) -> list[PostReadSchema]:
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[PostReadSchema]:
         posts = await self.post_repo.get_user_posts(
             user_id,
-            limit=pagination.limit,
+            limit=pagination.limit + 1,
+            offset=(pagination.page - 1) * pagination.limit,
+            before=self._decode_cursor(pagination),
+        )
+        posts, next_cursor = self._cut_page(
+            posts, pagination, key=lambda post: (post.created_at, post.id)
+        )
+        total = await self._count_posts(user_id, exact_count)
+        logger.info(f"Пользователь #%d успешно вывел свои посты", user_id)
+        return SearchResponseSchema(
+            detail=[PostReadSchema.model_validate(post) for post in posts],
+            pagination=pagination,
+            total_found=total,
+            next_cursor=next_cursor,
+        )
+
+    async def get_posts_json(
+        self,
+        user_id: int,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> bytes:
+        # Строки уже в форме PostReadSchema: сразу пишем JSON без валидации
+        rows = await self.post_repo.get_user_posts_rows(
+            user_id,
+            limit=pagination.limit + 1,
             offset=(pagination.page - 1) * pagination.limit,
+            before=self._decode_cursor(pagination),
         )
+        rows, next_cursor = self._cut_page(
+            rows, pagination, key=lambda row: (row["created_at"], row["id"])
+        )
+        total = await self._count_posts(user_id, exact_count)
         logger.info(f"Пользователь #%d успешно вывел свои посты", user_id)
-        return [PostReadSchema.model_validate(post) for post in posts]
+        return dump_search_response(rows, pagination, total, next_cursor)
+
+    async def get_front_page(
+        self,
+        pagination: PaginationSchema,
+    ) -> SearchResponseSchema[FeedDetailSchema]:
+        rows, _, next_cursor, total = await self._get_front_page(pagination)
+        return SearchResponseSchema(
+            detail=[FeedDetailSchema.model_validate(row) for row in rows],
+            pagination=pagination,
+            total_found=total,
+            next_cursor=next_cursor,
+        )
+
+    async def get_front_page_json(self, pagination: PaginationSchema) -> bytes:
+        rows, items, next_cursor, total = await self._get_front_page(pagination)
+        detail = rows if items is None else items
+        return dump_search_response(detail, pagination, total, next_cursor)
+
+    async def _get_front_page(
+        self,
+        pagination: PaginationSchema,
+    ) -> tuple[Sequence[dict], Optional[Sequence], Optional[str], int]:
+        """
+        Строки страницы общей ленты, их готовый JSON (только из снимка),
+        курсор следующей страницы и число постов
+        """
+        front = await front_page_snapshot.get()
+        offset = (pagination.page - 1) * pagination.limit
+        before = self._decode_cursor(pagination)
+
+        items = None
+        bounds = front.page(pagination.limit, offset, before)
+        if bounds is not None:
+            start, end = bounds
+            rows, items = front.rows[start:end], front.items[start:end]
+        else:
+            # Страница глубже снимка читается из базы
+            rows = await self.post_repo.get_front_rows(
+                limit=pagination.limit + 1, offset=offset, before=before
+            )
+
+        rows, next_cursor = self._cut_page(
+            rows,
+            pagination,
+            key=lambda row: (row["post"]["created_at"], row["post"]["id"]),
+        )
+        if items is not None:
+            items = items[: len(rows)]
+        logger.info("Выведена общая лента, %d постов", len(rows))
+        return rows, items, next_cursor, front.total
+
+    async def _count_posts(self, user_id: int, exact_count: bool) -> int:
+        limit = None if exact_count else settings.posts.count_limit
+        return await self.post_repo.count_user_posts(user_id, limit=limit)
+
+    @staticmethod
+    def _decode_cursor(pagination: PaginationSchema) -> Optional[tuple[datetime, int]]:
+        if not pagination.cursor:
+            return None
+        return decode_cursor(pagination.cursor, datetime, int)
+
+    @staticmethod
+    def _cut_page[T](
+        posts: Sequence[T],
+        pagination: PaginationSchema,
+        key: Callable[[T], tuple[datetime, int]],
+    ) -> tuple[Sequence[T], Optional[str]]:
+        """
+        Отрезает лишний пост, запрошенный, чтобы понять, есть ли следующая
+        страница, и возвращает курсор на нее
+        """
+        if len(posts) <= pagination.limit:
+            return posts, None
+        posts = posts[: pagination.limit]
+        return posts, encode_cursor(*key(posts[-1]))
 
     async def update_post(
         self,
@@ -98,23 +298,15 @@ class PostService:
         post_data: PostUpdateSchema | PostUpdatePartialSchema,
         partial: bool,
     ) -> PostReadSchema:
-        post = await self.post_repo.get_user_post(user_id, id=post_id)
-
-        if not post:
+        updated_post = await self.post_repo.update_post(
+            user_id, post_id, update_data=post_data, partial=partial
+        )
+        if updated_post is None:
             logger.error(PostNotFoundException.message)
             raise PostNotFoundException
 
-        if post_data.title:
-            exists_post = await self.post_repo.check_post_exists(
-                user_id, title=post_data.title
-            )
-            if exists_post:
-                logger.error(PostAlreadyExist.message)
-                raise PostAlreadyExist
-
-        updated_post = await self.post_repo.update_post(
-            post, update_data=post_data, partial=partial
-        )
+        # Общая лента не должна показывать старую версию поста до обновления снимка
+        front_page_snapshot.invalidate()
         logger.info("Пост #%d успешно обновлен!", post_id)
         return PostReadSchema.model_validate(updated_post)
 
@@ -124,7 +316,11 @@ class PostService:
             logger.error(PostNotFoundException.message)
             raise PostNotFoundException
 
-        await self.post_repo.delete_post(post)
+        # Из лент подписчиков пост удаляется фоновой задачей,
+        # до тех пор он только скрыт
+        await self.post_repo.hide_post(post)
+        # Удаленный пост не должен оставаться в общей ленте до обновления снимка
+        front_page_snapshot.invalidate()
         logger.info(f"Пост #%d успешно удален!", post.id)
         return
 
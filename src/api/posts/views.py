@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, status
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Header, Response, status
 from taskiq import AsyncTaskiqTask
 
 from api.auth import ActiveUserDep, http_bearer
-from api.tasks.feed_tasks import create_event_for_users
+from api.tasks.feed_tasks import (
+    create_event_for_users,
+    create_events_for_posts,
+    retract_post_events,
+    enqueue_feed_items_refresh,
+)
+from api.tasks.search_tasks import enqueue_search_index_update
+from api.feeds.schemas import FeedDetailSchema
+from core import settings
 from core.dependencies import PaginationDep
+from schemas import SearchResponseSchema
+from utils.etag import etag_matches, etag_headers
 from .schemas import (
     PostCreateSchema,
     PostReadSchema,
     PostUpdateSchema,
     PostUpdatePartialSchema,
+    PostBatchCreateSchema,
+    PostBatchCreatedSchema,
 )
 from .service import PostServiceDep
 
@@ -36,31 +50,118 @@ async def create_post(
         author_id=active_user.id,
         post_id=post_id,
     )
+    await enqueue_search_index_update(post_ids=[post_id])
     return {"post_id": post_id, "task_id": task.task_id}
 
 
+@router.post(
+    "/batch",
+    status_code=status.HTTP_201_CREATED,
+    response_model=PostBatchCreatedSchema,
+)
+async def create_posts_batch(
+    active_user: ActiveUserDep,
+    post_service: PostServiceDep,
+    batch: PostBatchCreateSchema,
+):
+    """
+    Создание пачки постов авторизованного пользователя одним запросом.
+    Посты с занятым названием пропускаются и отмечаются конфликтом
+    """
+
+    items = await post_service.create_posts(
+        user_id=active_user.id, posts_data=batch.posts
+    )
+    post_ids = [item.post_id for item in items if item.post_id is not None]
+
+    # Одна задача рассылки на все созданные посты. Ход рассылки пачки
+    # не отслеживается: прогресс ведется только для рассылки одного поста
+    if post_ids:
+        await create_events_for_posts.kiq(
+            author_id=active_user.id,
+            post_ids=post_ids,
+        )
+    await enqueue_search_index_update(post_ids=post_ids)
+    return PostBatchCreatedSchema(
+        items=items,
+        created=len(post_ids),
+        conflicts=len(items) - len(post_ids),
+    )
+
+
+@router.get("/front", response_model=SearchResponseSchema[FeedDetailSchema])
+async def get_front_page(
+    post_service: PostServiceDep,
+    pagination: PaginationDep,
+):
+    """
+    Общая лента: посты всех пользователей от новых к старым с пагинацией
+    по курсору. Первые страницы отдаются из снимка без запросов к базе
+    """
+
+    if settings.api.trusted_serialization:
+        content = await post_service.get_front_page_json(pagination=pagination)
+        return Response(content=content, media_type="application/json")
+
+    return await post_service.get_front_page(pagination=pagination)
+
+
 @router.get("/{post_id}", response_model=PostReadSchema)
 async def get_post_by_post_id(
     active_user: ActiveUserDep,
     post_service: PostServiceDep,
     post_id: int,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None,
 ):
-    """Получение поста авторизованного пользователя по уникальному id"""
+    """
+    Получение поста авторизованного пользователя по уникальному id.
+    Если пост не менялся с If-None-Match, возвращается 304 без тела
+    """
+
+    if settings.api.trusted_serialization:
+        content = await post_service.get_post_json(
+            user_id=active_user.id, post_id=post_id
+        )
+        headers = etag_headers(post_service.get_post_etag(content))
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(
+            content=content, media_type="application/json", headers=headers
+        )
+
     post = await post_service.get_post_by_post_id(
         user_id=active_user.id, post_id=post_id
     )
+    headers = etag_headers(post_service.get_post_etag(post))
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return post
 
 
-@router.get("", response_model=list[PostReadSchema])
+@router.get("", response_model=SearchResponseSchema[PostReadSchema])
 async def get_user_posts(
     active_user: ActiveUserDep,
     post_service: PostServiceDep,
     pagination: PaginationDep,
+    exact_count: bool = False,
 ):
-    """Получение постов пользователя с пагинацией"""
+    """Получение постов пользователя от новых к старым с пагинацией по курсору"""
+
+    if settings.api.trusted_serialization:
+        content = await post_service.get_posts_json(
+            user_id=active_user.id,
+            pagination=pagination,
+            exact_count=exact_count,
+        )
+        return Response(content=content, media_type="application/json")
 
-    posts = await post_service.get_posts(user_id=active_user.id, pagination=pagination)
+    posts = await post_service.get_posts(
+        user_id=active_user.id,
+        pagination=pagination,
+        exact_count=exact_count,
+    )
     return posts
 
 
@@ -79,6 +180,8 @@ async def update_user_post(
         post_data=post_data,
         partial=False,
     )
+    await enqueue_feed_items_refresh(post_id=post_id)
+    await enqueue_search_index_update(post_ids=[post_id])
     return post
 
 
@@ -97,6 +200,8 @@ async def update_user_post_partially(
         post_data=post_data,
         partial=True,
     )
+    await enqueue_feed_items_refresh(post_id=post_id)
+    await enqueue_search_index_update(post_ids=[post_id])
     return post
 
 
@@ -109,4 +214,8 @@ async def delete_user_post(
     """Удаление поста авторизованного пользователя"""
 
     await post_service.delete_post(user_id=active_user.id, post_id=post_id)
+
+    # Отправляем задачу на удаление поста из лент в брокер
+    await retract_post_events.kiq(post_id=post_id)
+    await enqueue_search_index_update(post_ids=[post_id])
     return
@@ -0,0 +1,581 @@
+"""
+Встроенный поисковый индекс постов: обратный индекс с ранжированием BM25
+в памяти процесса API, без поисковых запросов к Postgres.
+
+Индекс - каталог неизменяемых сегментов и манифест со списком сегментов
+от старых к новым. Каждое изменение постов - новый небольшой сегмент:
+документы в нем заменяют свои версии в более старых сегментах, а id из
+его списка удалений скрывают их. Сегменты периодически сливаются в один.
+Файлы сегментов отображаются в память (mmap), поэтому процесс открывает
+индекс без чтения и разбора всего файла.
+
+Формат сегмента (числа в порядке байт платформы):
+* заголовок HEADER;
+* uint32: id документов, длины документов, удаленные id, границы списков
+  документов слов, границы слов в словаре;
+* uint32 номера документов сегмента и uint16 частоты слов - списки
+  документов слов подряд;
+* словарь - слова в UTF-8, отсортированные по байтам.
+"""
+
+import fcntl
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import time
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+from core import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MRSEG001"
+# magic, документов, слов, вхождений, удалений, байт словаря, сумма длин
+HEADER = struct.Struct("=8sIIIIIQ")
+MANIFEST = "manifest.json"
+SEGMENT_SUFFIX = ".seg"
+MAX_TF = 2**16 - 1
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Документ сегмента: id поста, название и описание
+IndexDoc = tuple[int, str, Optional[str]]
+
+
+def tokenize(text: Optional[str]) -> list[str]:
+    """Слова текста в нижнем регистре, ё приравнивается к е"""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+class SearchQuery(NamedTuple):
+    # Пост должен содержать хотя бы одно слово каждой группы
+    clauses: tuple[tuple[str, ...], ...]
+    excluded: tuple[str, ...]
+
+
+def parse_query(query: str) -> SearchQuery:
+    """
+    Разбирает запрос в синтаксисе websearch_to_tsquery: слова через пробел
+    должны быть в посте все, or объединяет соседние слова, -слово исключает.
+    Фраза в кавычках ищется как набор слов: позиции слов индекс не хранит
+    """
+    clauses: list[tuple[str, ...]] = []
+    excluded: list[str] = []
+    either = False
+    for chunk in query.replace('"', " ").split():
+        if chunk.lower() == "or":
+            either = bool(clauses)
+            continue
+        words = tokenize(chunk)
+        if chunk.startswith("-"):
+            excluded += words
+        elif words and either:
+            clauses[-1] += (words[0],)
+            clauses += [(word,) for word in words[1:]]
+        else:
+            clauses += [(word,) for word in words]
+        either = False
+    return SearchQuery(tuple(clauses), tuple(excluded))
+
+
+class Segment:
+    """Неизменяемый сегмент индекса, отображенный в память"""
+
+    def __init__(self, path: Path):
+        self.name = path.name
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, docs, terms, postings, deletes, term_bytes, total_length = (
+            HEADER.unpack_from(self._mmap)
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} не сегмент поискового индекса")
+        self.terms = terms
+        self.total_length = total_length
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(count: int, typecode: str) -> memoryview:
+            nonlocal offset
+            size = count * array(typecode).itemsize
+            part = view[offset : offset + size].cast(typecode)
+            offset += size
+            return part
+
+        self.doc_ids = take(docs, "I")
+        self.lengths = take(docs, "I")
+        self.deletes = take(deletes, "I")
+        self._term_offsets = take(terms + 1, "I")
+        self._term_positions = take(terms + 1, "I")
+        self._posting_docs = take(postings, "I")
+        self._posting_tfs = take(postings, "H")
+        self._terms_start = offset
+
+    def term(self, number: int) -> bytes:
+        start = self._terms_start
+        return self._mmap[
+            start + self._term_positions[number] : start
+            + self._term_positions[number + 1]
+        ]
+
+    def find(self, term: bytes) -> int:
+        """Номер слова в словаре или -1, если его нет"""
+        lo, hi = 0, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.terms and self.term(lo) == term:
+            return lo
+        return -1
+
+    def postings(self, number: int) -> tuple[memoryview, memoryview]:
+        """Номера документов сегмента со словом и частоты слова в них"""
+        start, end = self._term_offsets[number], self._term_offsets[number + 1]
+        return self._posting_docs[start:end], self._posting_tfs[start:end]
+
+
+class SegmentBuilder:
+    """Новый сегмент в памяти: документы добавляются по одному"""
+
+    def __init__(self, title_weight: int):
+        self.title_weight = title_weight
+        self.doc_ids = array("I")
+        self.lengths = array("I")
+        self.deletes: set[int] = set()
+        self.postings: dict[bytes, tuple[array, array]] = {}
+
+    def add(self, doc_id: int, title: str, description: Optional[str]) -> None:
+        # Слово названия весит как title_weight слов описания (упрощенный BM25F)
+        terms = Counter()
+        for word in tokenize(title):
+            terms[word] += self.title_weight
+        for word in tokenize(description):
+            terms[word] += 1
+
+        local = self.add_doc(doc_id, sum(terms.values()))
+        for word, tf in terms.items():
+            self.add_posting(word.encode(), local, tf)
+
+    def add_doc(self, doc_id: int, length: int) -> int:
+        self.doc_ids.append(doc_id)
+        self.lengths.append(length)
+        return len(self.doc_ids) - 1
+
+    def add_posting(self, term: bytes, local: int, tf: int) -> None:
+        entry = self.postings.get(term)
+        if entry is None:
+            entry = self.postings[term] = (array("I"), array("H"))
+        entry[0].append(local)
+        entry[1].append(min(tf, MAX_TF))
+
+    def write(self, path: Path) -> None:
+        terms = sorted(self.postings)
+        term_offsets, term_positions = array("I", [0]), array("I", [0])
+        posting_docs, posting_tfs = array("I"), array("H")
+        vocabulary = bytearray()
+        for term in terms:
+            docs, tfs = self.postings[term]
+            posting_docs.extend(docs)
+            posting_tfs.extend(tfs)
+            term_offsets.append(len(posting_docs))
+            vocabulary += term
+            term_positions.append(len(vocabulary))
+        deletes = array("I", sorted(self.deletes))
+
+        # Сегмент появляется под своим именем только целиком
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as file:
+            file.write(
+                HEADER.pack(
+                    MAGIC,
+                    len(self.doc_ids),
+                    len(terms),
+                    len(posting_docs),
+                    len(deletes),
+                    len(vocabulary),
+                    sum(self.lengths),
+                )
+            )
+            for part in (
+                self.doc_ids,
+                self.lengths,
+                deletes,
+                term_offsets,
+                term_positions,
+                posting_docs,
+                posting_tfs,
+            ):
+                part.tofile(file)
+            file.write(vocabulary)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+
+
+def dead_docs(segments: list[Segment]) -> list[set[int]]:
+    """
+    Для каждого сегмента - id его документов, замененных или удаленных
+    более новыми сегментами
+    """
+    dead: set[int] = set()
+    result = []
+    for number in range(len(segments) - 1, -1, -1):
+        result.append(dead)
+        # Документы самого старого сегмента ничего не заменяют
+        if number:
+            segment = segments[number]
+            dead = dead | set(segment.doc_ids) | set(segment.deletes)
+    return result[::-1]
+
+
+def merge_segments(
+    segments: list[Segment],
+    title_weight: int,
+    keep_deletes: bool,
+) -> SegmentBuilder:
+    """
+    Сливает сегменты в один без замененных и удаленных документов.
+    Удаления нужны, если перед сегментами в индексе остаются более старые
+    """
+    merged = SegmentBuilder(title_weight)
+    for segment, dead in zip(segments, dead_docs(segments)):
+        # Номер документа в слитом сегменте или -1 для мертвого
+        remap = array("i")
+        for doc_id, length in zip(segment.doc_ids, segment.lengths):
+            remap.append(-1 if doc_id in dead else merged.add_doc(doc_id, length))
+        for number in range(segment.terms):
+            term = segment.term(number)
+            for local, tf in zip(*segment.postings(number)):
+                if remap[local] >= 0:
+                    merged.add_posting(term, remap[local], tf)
+        if keep_deletes:
+            merged.deletes.update(segment.deletes)
+    return merged
+
+
+class IndexSnapshot:
+    """Сегменты индекса на момент чтения манифеста"""
+
+    def __init__(self, segments: list[Segment], k1: float, b: float):
+        self.segments = segments
+        self.dead = dead_docs(segments)
+        self.k1 = k1
+        self.b = b
+        # Статистика BM25 по всем документам сегментов, включая замененные
+        self.docs = sum(len(segment.doc_ids) for segment in segments)
+        total_length = sum(segment.total_length for segment in segments)
+        self.avg_length = total_length / self.docs if self.docs else 1.0
+
+    def search(self, query: SearchQuery) -> dict[int, float]:
+        """Найденные документы и их релевантность BM25"""
+        # Порядок слов постоянный, чтобы суммы релевантности не расходились
+        # между процессами: курсор одного процесса читает другой
+        words = sorted({word for clause in query.clauses for word in clause})
+        if not words:
+            return {}
+        # Бит группы запроса на каждое слово: пост найден, если собраны все
+        bits = dict.fromkeys(words, 0)
+        for number, clause in enumerate(query.clauses):
+            for word in clause:
+                bits[word] |= 1 << number
+        everything = (1 << len(query.clauses)) - 1
+
+        postings = {word: self._postings(word.encode()) for word in words}
+        dfs = {
+            word: sum(len(docs) for _, _, docs, _ in postings[word]) for word in words
+        }
+        # Найденный пост есть в самой редкой группе: слова остальных групп
+        # считаются только для ее постов
+        rarest = min(query.clauses, key=lambda clause: sum(dfs[w] for w in clause))
+        words.sort(key=lambda word: word not in rarest)
+        candidates: Optional[set[int]] = None
+
+        scores: dict[int, float] = {}
+        matched: dict[int, int] = {}
+        # BM25: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg))
+        norm_base = self.k1 * (1 - self.b)
+        norm_length = self.k1 * self.b / self.avg_length
+        for word in words:
+            if candidates is None and word not in rarest:
+                candidates = set(scores)
+            df = dfs[word]
+            idf = math.log(1 + (self.docs - df + 0.5) / (df + 0.5))
+            weight = idf * (self.k1 + 1)
+            bit = bits[word]
+            for segment, dead, docs, tfs in postings[word]:
+                doc_ids, lengths = segment.doc_ids, segment.lengths
+                for local, tf in zip(docs, tfs):
+                    doc_id = doc_ids[local]
+                    if dead and doc_id in dead:
+                        continue
+                    if candidates is not None and doc_id not in candidates:
+                        continue
+                    norm = norm_base + norm_length * lengths[local]
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * tf / (tf + norm)
+                    if everything > 1:
+                        matched[doc_id] = matched.get(doc_id, 0) | bit
+
+        if everything > 1:
+            scores = {
+                doc_id: score
+                for doc_id, score in scores.items()
+                if matched[doc_id] == everything
+            }
+        for word in query.excluded:
+            for segment, dead, docs, _ in self._postings(word.encode()):
+                for local in docs:
+                    doc_id = segment.doc_ids[local]
+                    if not (dead and doc_id in dead):
+                        scores.pop(doc_id, None)
+        return scores
+
+    def _postings(
+        self, term: bytes
+    ) -> list[tuple[Segment, set[int], memoryview, memoryview]]:
+        found = []
+        for segment, dead in zip(self.segments, self.dead):
+            number = segment.find(term)
+            if number >= 0:
+                found.append((segment, dead, *segment.postings(number)))
+        return found
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "segments": [segment.name for segment in self.segments],
+            "docs": self.docs,
+            "live_docs": sum(
+                len(segment.doc_ids) - len(dead.intersection(segment.doc_ids))
+                for segment, dead in zip(self.segments, self.dead)
+            ),
+            "avg_length": self.avg_length,
+        }
+
+
+def top_hits(
+    scores: dict[int, float],
+    limit: int,
+    offset: int = 0,
+    before: Optional[tuple[float, int]] = None,
+) -> list[tuple[float, int]]:
+    """
+    Страница найденных документов (релевантность, id) от релевантных
+    к менее релевантным, как ORDER BY rank DESC, id DESC
+    """
+    hits: Iterable[tuple[float, int]] = (
+        (score, doc_id) for doc_id, score in scores.items()
+    )
+    if before is not None:
+        hits = (hit for hit in hits if hit < before)
+        offset = 0
+    return heapq.nlargest(offset + limit, hits)[offset:]
+
+
+def read_manifest(directory: Path) -> dict[str, Any]:
+    try:
+        return json.loads((directory / MANIFEST).read_bytes())
+    except FileNotFoundError:
+        return {"generation": 0, "segments": []}
+
+
+class SearchIndex:
+    """
+    Индекс в процессе API: сегменты из каталога индекса отображаются
+    в память, манифест перечитывается не чаще раза в refresh секунд.
+    Уже открытые сегменты переиспользуются, новый процесс открывает
+    индекс без загрузки данных
+    """
+
+    def __init__(self, directory: Path, refresh: float, k1: float, b: float):
+        self.directory = directory
+        self.refresh = refresh
+        self.k1 = k1
+        self.b = b
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._segments: dict[str, Segment] = {}
+        self._version: Optional[tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def snapshot(self) -> IndexSnapshot:
+        now = time.monotonic()
+        if self._snapshot is None or now - self._checked_at >= self.refresh:
+            self._checked_at = now
+            self._reload()
+        return self._snapshot
+
+    def _reload(self) -> None:
+        try:
+            stat = os.stat(self.directory / MANIFEST)
+        except FileNotFoundError:
+            if self._snapshot is None:
+                logger.warning(
+                    "Поисковый индекс в %s не построен, поиск ничего не найдет",
+                    self.directory,
+                )
+                self._snapshot = IndexSnapshot([], self.k1, self.b)
+            return
+
+        # Манифест заменяется целиком, поэтому меняется его inode
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self._version:
+            return
+        names = read_manifest(self.directory)["segments"]
+        try:
+            segments = [
+                self._segments.get(name) or Segment(self.directory / name)
+                for name in names
+            ]
+        except FileNotFoundError:
+            # Слияние удалило сегмент после чтения манифеста: прочитаем новый
+            logger.warning("Сегменты поискового индекса изменились при чтении")
+            return
+
+        self._segments = {segment.name: segment for segment in segments}
+        self._snapshot = IndexSnapshot(segments, self.k1, self.b)
+        self._version = version
+        logger.debug("Поисковый индекс перечитан: %d сегментов", len(segments))
+
+
+class SearchIndexWriter:
+    """
+    Запись индекса фоновыми задачами: сегменты изменений, слияние
+    и пересборка. Воркеры пишут по очереди под блокировкой файла
+    """
+
+    def __init__(self, directory: Path, title_weight: int, max_segments: int):
+        self.directory = directory
+        self.title_weight = title_weight
+        self.max_segments = max_segments
+
+    def builder(self) -> SegmentBuilder:
+        return SegmentBuilder(self.title_weight)
+
+    def generation(self) -> int:
+        with self._locked():
+            return read_manifest(self.directory)["generation"]
+
+    def add(self, docs: Iterable[IndexDoc], deleted: Iterable[int] = ()) -> None:
+        """
+        Записывает сегмент изменений: docs заменяют прежние версии постов,
+        посты из deleted без новой версии пропадают из выдачи
+        """
+        builder = self.builder()
+        for doc in docs:
+            builder.add(*doc)
+        builder.deletes.update(deleted)
+
+        with self._locked():
+            manifest = read_manifest(self.directory)
+            segments = manifest["segments"]
+            generation = manifest["generation"] + 1
+            name = self._segment_name(generation)
+            builder.write(self.directory / name)
+            self._write_manifest(generation, [*segments, name])
+
+            # Первый сегмент - самый большой, сегменты изменений сливаются
+            # между собой, чтобы поиск не обходил их все
+            if len(segments) + 1 > self.max_segments:
+                self._merge(generation, [*segments, name], start=1)
+
+    def merge(self) -> int:
+        """Сливает все сегменты в один, возвращает число слитых сегментов"""
+        with self._locked():
+            manifest = read_manifest(self.directory)
+            segments = manifest["segments"]
+            if len(segments) < 2:
+                return 0
+            self._merge(manifest["generation"], segments, start=0)
+            return len(segments)
+
+    def replace(self, builder: SegmentBuilder, since: int) -> None:
+        """
+        Заменяет индекс сегментом пересборки, начатой на поколении since.
+        Сегменты изменений, записанные во время пересборки, остаются
+        поверх нового сегмента
+        """
+        with self._locked():
+            manifest = read_manifest(self.directory)
+            later = [
+                name
+                for name in manifest["segments"]
+                if self._segment_generation(name) > since
+            ]
+            generation = manifest["generation"] + 1
+            name = self._segment_name(generation)
+            builder.write(self.directory / name)
+            self._write_manifest(generation, [name, *later])
+            self._remove(set(manifest["segments"]) - set(later))
+
+    def _merge(self, generation: int, names: list[str], start: int) -> None:
+        merged = merge_segments(
+            [Segment(self.directory / name) for name in names[start:]],
+            self.title_weight,
+            keep_deletes=start > 0,
+        )
+        generation += 1
+        name = self._segment_name(generation)
+        merged.write(self.directory / name)
+        self._write_manifest(generation, [*names[:start], name])
+        # Процессы API дочитают удаленные файлы через уже открытый mmap
+        self._remove(names[start:])
+        logger.info(
+            "Слито %d сегментов поискового индекса в %s: %d документов",
+            len(names) - start,
+            name,
+            len(merged.doc_ids),
+        )
+
+    def _write_manifest(self, generation: int, segments: list[str]) -> None:
+        tmp = self.directory / f"{MANIFEST}.tmp"
+        tmp.write_text(json.dumps({"generation": generation, "segments": segments}))
+        os.replace(tmp, self.directory / MANIFEST)
+
+    def _remove(self, names: Iterable[str]) -> None:
+        for name in names:
+            (self.directory / name).unlink(missing_ok=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / "lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _segment_name(generation: int) -> str:
+        return f"{generation:010d}{SEGMENT_SUFFIX}"
+
+    @staticmethod
+    def _segment_generation(name: str) -> int:
+        return int(name.removesuffix(SEGMENT_SUFFIX))
+
+
+search_index = SearchIndex(
+    settings.files.search_index_dir,
+    refresh=settings.search.index_refresh,
+    k1=settings.search.bm25_k1,
+    b=settings.search.bm25_b,
+)
+search_index_writer = SearchIndexWriter(
+    settings.files.search_index_dir,
+    title_weight=settings.search.title_weight,
+    max_segments=settings.search.max_segments,
+)
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from typing import Protocol, Annotated, Optional, Any, Sequence
+
+from fastapi import Depends
+from sqlalchemy import Float, Row, cast, func, select, tuple_
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from api.auth.users.models import User
+from api.auth.users.schemas import UserSummaryReadSchema
+from api.posts.models import Post, SEARCH_CONFIG
+from api.posts.schemas import PostReadSchema
+from core import settings
+from core.dependencies import SessionDep
+from utils.serialization import schema_columns
+from .index import IndexDoc, SearchIndex, parse_query, search_index, top_hits
+
+logger = logging.getLogger(__name__)
+
+# Колонки строки выдачи: сначала автор, затем пост
+AUTHOR_COLUMNS = schema_columns(UserSummaryReadSchema, User)
+POST_COLUMNS = schema_columns(PostReadSchema, Post)
+AUTHOR_FIELDS = list(UserSummaryReadSchema.model_fields)
+POST_FIELDS = list(PostReadSchema.model_fields)
+
+
+class SearchRepositoryProtocol(Protocol):
+
+    async def search_posts_rows(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[float, int]] = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Ищем видимые посты по запросу в синтаксисе websearch_to_tsquery
+        * строки с полями PostSearchHitSchema (автор, пост и релевантность)
+          от релевантных к менее релевантным
+        * с пагинацией по странице (offset) или по курсору (before) -
+          релевантности и id последнего поста предыдущей страницы
+        """
+        pass
+
+    async def count_posts(self, query: str, limit: Optional[int] = None) -> int:
+        """Считает найденные посты, но не больше limit"""
+        pass
+
+    async def get_index_docs(self, post_ids: Sequence[int]) -> list[IndexDoc]:
+        """Id, название и описание видимых постов из post_ids"""
+        pass
+
+    async def get_index_docs_batch(self, after_id: int, limit: int) -> list[IndexDoc]:
+        """То же для пачки видимых постов с id больше after_id по возрастанию id"""
+        pass
+
+
+class SearchRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def search_posts_rows(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[float, int]] = None,
+    ) -> list[dict[str, Any]]:
+        logger.debug(
+            "Ищем %d постов по запросу %r, начиная с %d ...", limit, query, offset
+        )
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = cast(func.ts_rank(Post.search_vector, tsquery), Float)
+
+        # Сначала только id и релевантность совпадений по GIN индексу,
+        # авторы и поля постов читаются для одной страницы
+        hits = select(Post.id, rank.label("rank")).where(
+            ~Post.is_hidden, Post.search_vector.bool_op("@@")(tsquery)
+        )
+        if before is not None:
+            hits = hits.where(tuple_(rank, Post.id) < before)
+            offset = 0
+        hits = (
+            hits.order_by(rank.desc(), Post.id.desc())
+            .limit(limit)
+            .offset(offset)
+            .cte("hits")
+        )
+
+        stmt = (
+            select(*AUTHOR_COLUMNS, *POST_COLUMNS, hits.c.rank)
+            .join_from(hits, Post, Post.id == hits.c.id)
+            .join(User, User.id == Post.user_id)
+            .order_by(hits.c.rank.desc(), hits.c.id.desc())
+        )
+        res = await self.session.execute(stmt)
+        return [self._hit_row(row, row[-1]) for row in res]
+
+    async def count_posts(self, query: str, limit: Optional[int] = None) -> int:
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        posts = select(Post.id).where(
+            ~Post.is_hidden, Post.search_vector.bool_op("@@")(tsquery)
+        )
+        if limit is not None:
+            posts = posts.limit(limit)
+        stmt = select(func.count()).select_from(posts.subquery())
+        return await self.session.scalar(stmt)
+
+    async def get_index_docs(self, post_ids: Sequence[int]) -> list[IndexDoc]:
+        stmt = (
+            select(Post.id, Post.title, Post.description)
+            .where(Post.id.in_(post_ids), ~Post.is_hidden)
+            .order_by(Post.id)
+        )
+        res = await self.session.execute(stmt)
+        return [tuple(row) for row in res]
+
+    async def get_index_docs_batch(self, after_id: int, limit: int) -> list[IndexDoc]:
+        stmt = (
+            select(Post.id, Post.title, Post.description)
+            .where(Post.id > after_id, ~Post.is_hidden)
+            .order_by(Post.id)
+            .limit(limit)
+        )
+        res = await self.session.execute(stmt)
+        return [tuple(row) for row in res]
+
+    @staticmethod
+    def _hit_row(row: Row, rank: float) -> dict[str, Any]:
+        """Строка выдачи из колонок AUTHOR_COLUMNS и POST_COLUMNS"""
+        split = len(AUTHOR_COLUMNS)
+        return {
+            "author": dict(zip(AUTHOR_FIELDS, row[:split])),
+            "post": dict(zip(POST_FIELDS, row[split : split + len(POST_FIELDS)])),
+            "rank": rank,
+        }
+
+
+class EmbeddedSearchRepository(SearchRepository):
+    """
+    Поиск по встроенному индексу: посты находятся и ранжируются в процессе,
+    из базы читается только страница выдачи по первичному ключу
+    """
+
+    def __init__(self, session: AsyncSession, index: SearchIndex):
+        super().__init__(session)
+        self.index = index
+        # Выдача и подсчет одного запроса используют один поиск
+        self._found: dict[str, dict[int, float]] = {}
+
+    async def search_posts_rows(
+        self,
+        query: str,
+        limit: int,
+        offset: int,
+        before: Optional[tuple[float, int]] = None,
+    ) -> list[dict[str, Any]]:
+        logger.debug(
+            "Ищем %d постов по запросу %r во встроенном индексе, начиная с %d ...",
+            limit,
+            query,
+            offset,
+        )
+        hits = top_hits(await self._search(query), limit, offset, before)
+        if not hits:
+            return []
+
+        # Пост, скрытый после записи в индекс, пропускается до обновления индекса
+        stmt = (
+            select(*AUTHOR_COLUMNS, *POST_COLUMNS)
+            .join_from(Post, User, User.id == Post.user_id)
+            .where(Post.id.in_([post_id for _, post_id in hits]), ~Post.is_hidden)
+        )
+        res = await self.session.execute(stmt)
+        id_column = len(AUTHOR_COLUMNS) + POST_FIELDS.index("id")
+        rows = {row[id_column]: row for row in res}
+        return [
+            self._hit_row(rows[post_id], rank)
+            for rank, post_id in hits
+            if post_id in rows
+        ]
+
+    async def count_posts(self, query: str, limit: Optional[int] = None) -> int:
+        found = len(await self._search(query))
+        return found if limit is None else min(found, limit)
+
+    async def _search(self, query: str) -> dict[int, float]:
+        if query not in self._found:
+            snapshot = self.index.snapshot()
+            # Обход списков документов не держит цикл событий
+            self._found[query] = await asyncio.to_thread(
+                snapshot.search, parse_query(query)
+            )
+        return self._found[query]
+
+
+async def get_search_repository(session: SessionDep) -> SearchRepositoryProtocol:
+    if settings.search.backend == "embedded":
+        return EmbeddedSearchRepository(session, search_index)
+    return SearchRepository(session)
+
+
+SearchRepositoryDep = Annotated[
+    SearchRepositoryProtocol, Depends(get_search_repository)
+]
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, ConfigDict
+
+from api.auth.users.schemas import UserSummaryReadSchema
+from api.posts.schemas import PostReadSchema
+
+
+class PostSearchHitSchema(BaseModel):
+    author: UserSummaryReadSchema
+    post: PostReadSchema
+    # Релевантность поста запросу (ts_rank или BM25 встроенного индекса),
+    # по ней отсортирована выдача
+    rank: float
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SearchIndexStatsSchema(BaseModel):
+    # Сегменты встроенного индекса, открытые процессом, от старых к новым
+    segments: list[str]
+    # Документы сегментов, включая замененные более новыми версиями
+    docs: int
+    live_docs: int
+    # Средняя длина документа в словах (слова названия с весом)
+    avg_length: float
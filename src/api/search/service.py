@@ -0,0 +1,106 @@
+import logging
+from typing import Protocol, Annotated, Optional, Any, Sequence
+
+from fastapi import Depends
+
+from core import settings
+from schemas import PaginationSchema, SearchResponseSchema
+from utils.cursor import encode_cursor, decode_cursor
+from utils.serialization import dump_search_response
+from .repository import SearchRepositoryProtocol, SearchRepositoryDep
+from .schemas import PostSearchHitSchema
+
+logger = logging.getLogger(__name__)
+
+
+class SearchServiceProtocol(Protocol):
+
+    async def search_posts(
+        self,
+        query: str,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[PostSearchHitSchema]:
+        """
+        Ищем посты всех пользователей от релевантных к менее релевантным,
+        курсор следующей страницы и число найденных постов
+        (без exact_count не больше search.count_limit)
+        """
+        pass
+
+    async def search_posts_json(
+        self,
+        query: str,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> bytes:
+        """То же, что search_posts, но сразу JSON ответа из строк базы"""
+        pass
+
+
+class SearchService:
+
+    def __init__(self, search_repo: SearchRepositoryProtocol):
+        self.search_repo = search_repo
+
+    async def search_posts(
+        self,
+        query: str,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> SearchResponseSchema[PostSearchHitSchema]:
+        rows, next_cursor, total = await self._search_posts(
+            query, pagination, exact_count
+        )
+        return SearchResponseSchema(
+            detail=[PostSearchHitSchema.model_validate(row) for row in rows],
+            pagination=pagination,
+            total_found=total,
+            next_cursor=next_cursor,
+        )
+
+    async def search_posts_json(
+        self,
+        query: str,
+        pagination: PaginationSchema,
+        exact_count: bool = False,
+    ) -> bytes:
+        # Строки уже в форме PostSearchHitSchema: сразу пишем JSON без валидации
+        rows, next_cursor, total = await self._search_posts(
+            query, pagination, exact_count
+        )
+        return dump_search_response(rows, pagination, total, next_cursor)
+
+    async def _search_posts(
+        self,
+        query: str,
+        pagination: PaginationSchema,
+        exact_count: bool,
+    ) -> tuple[Sequence[dict[str, Any]], Optional[str], int]:
+        before = None
+        if pagination.cursor:
+            before = decode_cursor(pagination.cursor, float, int)
+
+        # Лишний пост показывает, есть ли следующая страница
+        rows = await self.search_repo.search_posts_rows(
+            query,
+            limit=pagination.limit + 1,
+            offset=(pagination.page - 1) * pagination.limit,
+            before=before,
+        )
+        next_cursor = None
+        if len(rows) > pagination.limit:
+            rows = rows[: pagination.limit]
+            next_cursor = encode_cursor(rows[-1]["rank"], rows[-1]["post"]["id"])
+
+        limit = None if exact_count else settings.search.count_limit
+        total = await self.search_repo.count_posts(query, limit=limit)
+        logger.info("Поиск постов по запросу %r: найдено %d", query, total)
+        return rows, next_cursor, total
+
+
+async def get_search_service(search_repo: SearchRepositoryDep) -> SearchServiceProtocol:
+    return SearchService(search_repo)
+
+
+SearchServiceDep = Annotated[SearchServiceProtocol, Depends(get_search_service)]
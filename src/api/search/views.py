@@ -0,0 +1,42 @@
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Response
+
+from api.auth import http_bearer
+from core import settings
+from core.dependencies import PaginationDep
+from schemas import SearchResponseSchema
+from .schemas import PostSearchHitSchema
+from .service import SearchServiceDep
+
+router = APIRouter(
+    prefix="/search",
+    tags=["Поиск"],
+    dependencies=[Depends(http_bearer)],
+)
+
+
+@router.get("/posts", response_model=SearchResponseSchema[PostSearchHitSchema])
+async def search_posts(
+    search_service: SearchServiceDep,
+    pagination: PaginationDep,
+    q: Annotated[
+        str, Query(min_length=1, max_length=settings.search.max_query_length)
+    ],
+    exact_count: bool = False,
+):
+    """
+    Полнотекстовый поиск по названиям и описаниям постов всех пользователей.
+    Запрос в синтаксисе поисковиков: "точная фраза", or, -исключить.
+    Выдача от релевантных постов к менее релевантным с пагинацией по курсору
+    """
+
+    if settings.api.trusted_serialization:
+        content = await search_service.search_posts_json(
+            query=q, pagination=pagination, exact_count=exact_count
+        )
+        return Response(content=content, media_type="application/json")
+
+    return await search_service.search_posts(
+        query=q, pagination=pagination, exact_count=exact_count
+    )
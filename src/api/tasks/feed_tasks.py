@@ -1,9 +1,14 @@
 import logging
-from typing import Annotated
+from typing import Annotated, Sequence, Optional
 
-from taskiq import TaskiqDepends
+from taskiq import TaskiqDepends, Context
 
-from api.feeds.service import FeedServiceProtocol, get_feed_service
+from api.feeds.batcher import FanOutBatcher
+from api.feeds.repository import FeedRepository
+from api.feeds.schemas import FanOutBatchReportSchema
+from api.feeds.service import FeedServiceProtocol, FeedService, get_feed_service
+from api.follows.repository import FollowsRepository
+from core import settings, db_helper
 from core.broker import broker
 
 logger = logging.getLogger(__name__)
@@ -12,15 +17,231 @@ logger = logging.getLogger(__name__)
 FeedServiceTaskiqDep = Annotated[FeedServiceProtocol, TaskiqDepends(get_feed_service)]
 
 
-@broker.task(task_name="create_event_for_users")
+async def create_events_for_batch(
+    requests: Sequence[tuple[int, int]],
+) -> FanOutBatchReportSchema:
+    # Пачка живет дольше любой из задач, поэтому у нее своя сессия
+    async with db_helper.session() as session:
+        feed_service = FeedService(FeedRepository(session), FollowsRepository(session))
+        report = await feed_service.create_events_for_posts(requests)
+
+    logger.info(
+        "Пачка рассылки: %d постов от %d авторов (%d подтягиваемых), "
+        "добавлено %d событий за %d запросов и %.1f мс, %.0f событий/с",
+        report.posts,
+        report.authors,
+        report.pulled,
+        report.inserted,
+        report.chunks,
+        report.elapsed_ms,
+        report.throughput,
+    )
+    return report
+
+
+fanout_batcher = FanOutBatcher(
+    create_events_for_batch,
+    max_size=settings.feed.fanout_batch_size,
+    window=settings.feed.fanout_batch_window,
+)
+
+
+@broker.task(task_name="create_event_for_users", retry_on_error=True)
 async def create_event_for_users(
     feed_service: FeedServiceTaskiqDep,
+    context: Annotated[Context, TaskiqDepends()],
     author_id: int,
     post_id: int,
 ) -> None:
     logger.info(f"Отправляем задачу на обновление событий {author_id = }, {post_id = }")
-    await feed_service.create_event_for_users(author_id, post_id)
+    task_id = context.message.task_id
+    ranges = await feed_service.plan_fan_out(task_id, author_id, post_id)
+
+    # Большую рассылку выполняют параллельно несколько воркеров
+    if len(ranges) > 1:
+        for chunk_no, (after_follower_id, upto_follower_id) in enumerate(ranges):
+            await create_event_chunk.kiq(
+                task_id=task_id,
+                chunk_no=chunk_no,
+                author_id=author_id,
+                post_id=post_id,
+                after_follower_id=after_follower_id,
+                upto_follower_id=upto_follower_id,
+            )
+        logger.info("Рассылка поста #%d разделена на %d задач", post_id, len(ranges))
+        return
+    if not ranges:
+        return
+
+    if settings.feed.fanout_batching:
+        await fanout_batcher.submit(author_id, post_id)
+    else:
+        report = await feed_service.create_event_for_users(author_id, post_id)
+        logger.info(
+            "Подписчики пользователя #%d увидят его новый пост #%d! "
+            "Добавлено %d событий в %d пачках за %.1f мс",
+            author_id,
+            post_id,
+            report.inserted,
+            len(report.chunks),
+            report.elapsed_ms,
+        )
+    await feed_service.complete_fan_out_chunk(task_id, 0)
+    return
+
+
+@broker.task(task_name="create_events_for_posts", retry_on_error=True)
+async def create_events_for_posts(
+    feed_service: FeedServiceTaskiqDep,
+    author_id: int,
+    post_ids: list[int],
+) -> None:
+    # Повтор безопасен: уже добавленные новости пропускаются
+    logger.info(
+        "Рассылаем пачку из %d постов пользователя #%d ...", len(post_ids), author_id
+    )
+    report = await feed_service.create_events_for_author_posts(author_id, post_ids)
+    logger.info(
+        "Пачка постов пользователя #%d разослана: %d подтягиваемых, "
+        "добавлено %d событий за %d запросов и %.1f мс",
+        author_id,
+        report.pulled,
+        report.inserted,
+        report.chunks,
+        report.elapsed_ms,
+    )
+    return
+
+
+@broker.task(task_name="create_event_chunk", retry_on_error=True)
+async def create_event_chunk(
+    feed_service: FeedServiceTaskiqDep,
+    task_id: str,
+    chunk_no: int,
+    author_id: int,
+    post_id: int,
+    after_follower_id: int,
+    upto_follower_id: Optional[int],
+) -> None:
+    # Повтор безопасен: уже добавленные новости пропускаются
+    inserted = await feed_service.create_events_for_range(
+        author_id, post_id, after_follower_id, upto_follower_id
+    )
+    await feed_service.complete_fan_out_chunk(task_id, chunk_no)
+    logger.info(
+        "Диапазон #%d рассылки поста #%d (%d, %s]: добавлено %d событий",
+        chunk_no,
+        post_id,
+        after_follower_id,
+        upto_follower_id,
+        inserted,
+    )
+    return
+
+
+@broker.task(task_name="retract_post_events", retry_on_error=True)
+async def retract_post_events(
+    feed_service: FeedServiceTaskiqDep,
+    post_id: int,
+) -> None:
+    logger.info("Удаляем пост #%d из лент подписчиков ...", post_id)
+    deleted = await feed_service.retract_post(post_id)
+    logger.info("Пост #%d удален из %d лент", post_id, deleted)
+    return
+
+
+@broker.task(task_name="backfill_follower_feed", retry_on_error=True)
+async def backfill_follower_feed(
+    feed_service: FeedServiceTaskiqDep,
+    follower_id: int,
+    author_id: int,
+) -> None:
+    inserted = await feed_service.backfill_follower(follower_id, author_id)
+    logger.info(
+        "В ленту пользователя #%d добавлено %d постов пользователя #%d",
+        follower_id,
+        inserted,
+        author_id,
+    )
+    return
+
+
+@broker.task(task_name="retract_follower_feed", retry_on_error=True)
+async def retract_follower_feed(
+    feed_service: FeedServiceTaskiqDep,
+    follower_id: int,
+    author_id: int,
+) -> None:
+    deleted = await feed_service.retract_follower(follower_id, author_id)
+    logger.info(
+        "Из ленты пользователя #%d удалено %d постов пользователя #%d",
+        follower_id,
+        deleted,
+        author_id,
+    )
+    return
+
+
+@broker.task(task_name="refresh_feed_items", retry_on_error=True)
+async def refresh_feed_items(
+    feed_service: FeedServiceTaskiqDep,
+    post_id: Optional[int] = None,
+    author_id: Optional[int] = None,
+) -> None:
+    await feed_service.refresh_feed_items(post_id=post_id, author_id=author_id)
+    logger.info(
+        f"Готовые новости обновлены после изменения {post_id = }, {author_id = }"
+    )
+    return
+
+
+async def enqueue_feed_items_refresh(
+    post_id: Optional[int] = None,
+    author_id: Optional[int] = None,
+) -> None:
+    """Ставит обновление готовых новостей, если лента отдается из них"""
+    if settings.feed.compact_payloads:
+        await refresh_feed_items.kiq(post_id=post_id, author_id=author_id)
+
+
+@broker.task(
+    task_name="reconcile_feed_counters",
+    schedule=[{"cron": settings.feed.counters_reconcile_cron}],
+)
+async def reconcile_feed_counters(feed_service: FeedServiceTaskiqDep) -> None:
+    logger.info("Сверяем счетчики новостей с лентами пользователей ...")
+    fixed = await feed_service.reconcile_counters()
+    logger.info("Сверка счетчиков новостей завершена, исправлено %d", fixed)
+    return
+
+
+@broker.task(
+    task_name="refresh_feed_rankings",
+    schedule=[{"cron": settings.feed.ranking_cron}],
+)
+async def refresh_feed_rankings(feed_service: FeedServiceTaskiqDep) -> None:
+    refreshed = await feed_service.refresh_rankings()
+    # Задача идет каждую минуту, поэтому пишем в лог только работу
+    if refreshed:
+        logger.info("Пересчитан рейтинг %d постов", refreshed)
+    return
+
+
+@broker.task(
+    task_name="trim_feeds",
+    schedule=[{"cron": settings.feed.retention_cron}],
+)
+async def trim_feeds(feed_service: FeedServiceTaskiqDep) -> None:
+    logger.info("Очищаем ленты пользователей от старых новостей ...")
+    report = await feed_service.trim_feeds()
     logger.info(
-        "Подписчики пользователя #%d увидят его новый пост #%d!", author_id, post_id
+        "Очистка лент завершена: удалено %d новостей по сроку и %d сверх лимита "
+        "у %d пользователей, %d пачек за %.1f мс. Удалено %d записей прогресса",
+        report.deleted_by_age,
+        report.deleted_by_size,
+        report.trimmed_recipients,
+        report.batches,
+        report.elapsed_ms,
+        report.deleted_progress,
     )
     return
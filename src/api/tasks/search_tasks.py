@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.search.index import SearchIndexWriter, search_index_writer
+from api.search.repository import SearchRepository
+from core import settings, db_helper
+from core.broker import broker
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_index(session: AsyncSession, writer: SearchIndexWriter) -> int:
+    """Строит индекс заново по всем видимым постам, возвращает их число"""
+    search_repo = SearchRepository(session)
+    since = await asyncio.to_thread(writer.generation)
+    builder = writer.builder()
+    after_id = 0
+    while docs := await search_repo.get_index_docs_batch(
+        after_id, settings.search.rebuild_batch
+    ):
+        for doc in docs:
+            builder.add(*doc)
+        after_id = docs[-1][0]
+    await asyncio.to_thread(writer.replace, builder, since)
+    return len(builder.doc_ids)
+
+
+async def enqueue_search_index_update(post_ids: list[int]) -> None:
+    """Ставит обновление встроенного индекса, если поиск идет по нему"""
+    if settings.search.backend == "embedded" and post_ids:
+        await update_search_index.kiq(post_ids=post_ids)
+
+
+@broker.task(task_name="update_search_index", retry_on_error=True)
+async def update_search_index(post_ids: list[int]) -> None:
+    # Повтор безопасен: сегмент заменяет прежние версии тех же постов.
+    # Удаленные и скрытые посты не читаются и пропадают из выдачи
+    async with db_helper.session() as session:
+        docs = await SearchRepository(session).get_index_docs(post_ids)
+    await asyncio.to_thread(search_index_writer.add, docs, deleted=post_ids)
+    logger.info(
+        "Поисковый индекс обновлен: %d постов из %d видимы", len(docs), len(post_ids)
+    )
+    return
+
+
+@broker.task(task_name="rebuild_search_index")
+async def rebuild_search_index() -> None:
+    logger.info("Пересобираем поисковый индекс ...")
+    async with db_helper.session() as session:
+        indexed = await rebuild_index(session, search_index_writer)
+    logger.info("Поисковый индекс пересобран: %d постов", indexed)
+    return
+
+
+@broker.task(
+    task_name="merge_search_index",
+    schedule=[{"cron": settings.search.merge_cron}],
+)
+async def merge_search_index() -> None:
+    if settings.search.backend != "embedded":
+        return
+    merged = await asyncio.to_thread(search_index_writer.merge)
+    # Задача идет по расписанию, поэтому пишем в лог только работу
+    if merged:
+        logger.info("Слито %d сегментов поискового индекса", merged)
+    return
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Sequence
+
+from core import settings, db_helper
+from .repository import VotesRepository, VoteDelta
+from .schemas import VoteBufferStatsSchema
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """
+    Буфер голосов в памяти процесса API
+    * голоса складываются в приращения счета по постам
+    * приращения пишутся в posts одним запросом раз в interval секунд
+      или раньше, когда в буфере max_posts постов
+    * при ошибке записи приращения возвращаются в буфер до следующей попытки
+    """
+
+    def __init__(
+        self,
+        write: Callable[[Sequence[VoteDelta]], Awaitable[int]],
+        interval: float,
+        max_posts: int,
+    ):
+        self.write = write
+        self.interval = interval
+        self.max_posts = max_posts
+
+        # id поста -> [счет, голоса за, голоса против]
+        self._deltas: dict[int, list[int]] = {}
+        self._pending_votes = 0
+        # Когда в буфер попал самый старый незаписанный голос
+        self._oldest: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._early: Optional[asyncio.Task] = None
+
+        self.flushes = 0
+        self.flushed_posts = 0
+        self.flushed_votes = 0
+        self.failures = 0
+        self.last_flush_lag: Optional[float] = None
+        self.max_flush_lag = 0.0
+        self.last_flush_ms: Optional[float] = None
+
+    def add(self, post_id: int, previous: int, value: int) -> None:
+        """Учитывает смену голоса пользователя с previous на value"""
+        delta = self._deltas.setdefault(post_id, [0, 0, 0])
+        delta[0] += value - previous
+        delta[1] += (value == 1) - (previous == 1)
+        delta[2] += (value == -1) - (previous == -1)
+        self._pending_votes += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+        if len(self._deltas) >= self.max_posts and not self._lock.locked():
+            if self._early is None or self._early.done():
+                self._early = asyncio.create_task(self._flush_logged())
+
+    async def flush(self) -> int:
+        """Пишет накопленные приращения, возвращает число обновленных постов"""
+        async with self._lock:
+            if not self._deltas:
+                return 0
+
+            deltas, self._deltas = self._deltas, {}
+            votes, self._pending_votes = self._pending_votes, 0
+            oldest, self._oldest = self._oldest, None
+
+            # Голос и его отмена между записями взаимно гасятся
+            rows = [
+                (post_id, *delta) for post_id, delta in deltas.items() if any(delta)
+            ]
+            started = time.monotonic()
+            try:
+                updated = await self.write(rows)
+            except Exception:
+                self.failures += 1
+                self._restore(deltas, votes, oldest)
+                raise
+
+            self.flushes += 1
+            self.flushed_posts += len(rows)
+            self.flushed_votes += votes
+            self.last_flush_ms = (time.monotonic() - started) * 1000
+            self.last_flush_lag = time.monotonic() - oldest
+            self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+            logger.debug(
+                "Записаны %d голосов за %d постов за %.1f мс, задержка %.2f с",
+                votes,
+                len(rows),
+                self.last_flush_ms,
+                self.last_flush_lag,
+            )
+            return updated
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает периодическую запись и пишет оставшиеся голоса"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._flush_logged()
+
+    def stats(self) -> VoteBufferStatsSchema:
+        return VoteBufferStatsSchema(
+            pending_posts=len(self._deltas),
+            pending_votes=self._pending_votes,
+            pending_age=(
+                None if self._oldest is None else time.monotonic() - self._oldest
+            ),
+            flushes=self.flushes,
+            flushed_posts=self.flushed_posts,
+            flushed_votes=self.flushed_votes,
+            failures=self.failures,
+            last_flush_lag=self.last_flush_lag,
+            max_flush_lag=self.max_flush_lag,
+            last_flush_ms=self.last_flush_ms,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Не удалось записать голоса, повторим позже: %r", e)
+
+    def _restore(
+        self,
+        deltas: dict[int, list[int]],
+        votes: int,
+        oldest: Optional[float],
+    ) -> None:
+        for post_id, delta in deltas.items():
+            current = self._deltas.setdefault(post_id, [0, 0, 0])
+            for idx, value in enumerate(delta):
+                current[idx] += value
+        self._pending_votes += votes
+        if oldest is not None and (self._oldest is None or oldest < self._oldest):
+            self._oldest = oldest
+
+
+async def write_vote_deltas(deltas: Sequence[VoteDelta]) -> int:
+    # Запись идет вне запросов, поэтому у нее своя сессия
+    async with db_helper.session() as session:
+        return await VotesRepository(session).apply_vote_deltas(deltas)
+
+
+vote_buffer = VoteBuffer(
+    write_vote_deltas,
+    interval=settings.votes.flush_interval,
+    max_posts=settings.votes.max_pending_posts,
+)
@@ -0,0 +1,19 @@
+from sqlalchemy import UniqueConstraint, ForeignKey, Index, SmallInteger
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models import Base, DateMixin
+
+
+class PostVote(Base, DateMixin):
+    """Голос пользователя за пост: 1 - за, -1 - против, 0 - голос снят"""
+
+    __tablename__ = "post_votes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "post_id", name="unique_post_votes"),
+        # Голоса удаляются вместе с постом
+        Index("ix_post_votes_post_id", "post_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    post_id: Mapped[int] = mapped_column(ForeignKey("posts.id", ondelete="CASCADE"))
+    value: Mapped[int] = mapped_column(SmallInteger)
@@ -0,0 +1,151 @@
+import logging
+from typing import Protocol, Annotated, Optional, Sequence
+
+from fastapi import Depends
+from sqlalchemy import (
+    Integer,
+    column,
+    exists,
+    literal,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio.session import AsyncSession
+
+from api.posts.models import Post
+from core.dependencies import SessionDep
+from .models import PostVote
+
+logger = logging.getLogger(__name__)
+
+# Приращения счета поста: id поста, счет, голоса за, голоса против
+VoteDelta = tuple[int, int, int, int]
+
+
+class VotesRepositoryProtocol(Protocol):
+
+    async def set_vote(
+        self,
+        user_id: int,
+        post_id: int,
+        value: int,
+    ) -> tuple[bool, Optional[int]]:
+        """
+        Ставим голос пользователя одним запросом
+        * возвращает, есть ли пост, и прежний голос (0 - голоса не было)
+        * прежний голос None, если одновременно с этим запросом первый
+          голос за пост поставил тот же пользователь: голос нужно повторить
+        """
+        pass
+
+    async def apply_vote_deltas(self, deltas: Sequence[VoteDelta]) -> int:
+        """
+        Прибавляем накопленные приращения к счету постов одним запросом,
+        возвращаем число обновленных постов
+        """
+        pass
+
+
+class VotesRepository:
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def set_vote(
+        self,
+        user_id: int,
+        post_id: int,
+        value: int,
+    ) -> tuple[bool, Optional[int]]:
+        logger.debug(
+            "Пользователь #%d голосует %d за пост #%d ...", user_id, value, post_id
+        )
+        post = (
+            select(Post.id).where(Post.id == post_id, ~Post.is_hidden).cte("post")
+        )
+        # Блокировка строки голоса: параллельный голос того же пользователя
+        # дождется этого и увидит его как прежний
+        old = (
+            select(PostVote.value)
+            .filter_by(user_id=user_id, post_id=post_id)
+            .with_for_update()
+            .cte("old")
+        )
+        updated = (
+            update(PostVote)
+            .filter_by(user_id=user_id, post_id=post_id)
+            .where(exists(old.select()), exists(post.select()))
+            .values(value=value)
+            .returning(PostVote.id)
+            .cte("updated")
+        )
+        inserted = (
+            insert(PostVote)
+            .from_select(
+                ["user_id", "post_id", "value"],
+                select(literal(user_id), post.c.id, literal(value)).where(
+                    ~exists(old.select())
+                ),
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "post_id"])
+            .returning(PostVote.id)
+            .cte("inserted")
+        )
+        query = select(
+            exists(post.select()),
+            old.select().scalar_subquery(),
+            exists(updated.select()),
+            exists(inserted.select()),
+        )
+        res = await self.session.execute(query)
+        post_exists, old_value, is_updated, is_inserted = res.one()
+        await self.session.commit()
+
+        if not post_exists:
+            return False, None
+        if is_updated:
+            return True, old_value
+        if is_inserted:
+            return True, 0
+        return True, None
+
+    async def apply_vote_deltas(self, deltas: Sequence[VoteDelta]) -> int:
+        logger.debug("Записываем голоса за %d постов ...", len(deltas))
+        if not deltas:
+            return 0
+
+        # Посты идут по возрастанию id: пачки разных процессов блокируют
+        # общие посты в одном порядке
+        rows = values(
+            column("post_id", Integer),
+            column("score", Integer),
+            column("upvotes", Integer),
+            column("downvotes", Integer),
+            name="deltas",
+        ).data(sorted(deltas))
+        stmt = (
+            update(Post)
+            .where(Post.id == rows.c.post_id)
+            .values(
+                score=Post.score + rows.c.score,
+                upvotes=Post.upvotes + rows.c.upvotes,
+                downvotes=Post.downvotes + rows.c.downvotes,
+                # Рейтинг hot пересчитает фоновая задача
+                rank_dirty=True,
+                # Голоса не меняют время редактирования поста
+                updated_at=Post.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        res = await self.session.execute(stmt)
+        await self.session.commit()
+        return res.rowcount
+
+
+async def get_votes_repository(session: SessionDep) -> VotesRepositoryProtocol:
+    return VotesRepository(session)
+
+
+VotesRepositoryDep = Annotated[VotesRepositoryProtocol, Depends(get_votes_repository)]
@@ -0,0 +1,30 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class VoteCreateSchema(BaseModel):
+    value: Literal[-1, 0, 1]
+
+
+class VoteReadSchema(BaseModel):
+    post_id: int
+    value: int
+    # Прежний голос пользователя, 0 - голоса не было
+    previous: int
+
+
+class VoteBufferStatsSchema(BaseModel):
+    # Посты и голоса, ждущие записи в posts
+    pending_posts: int
+    pending_votes: int
+    # Сколько секунд ждет самый старый голос в буфере
+    pending_age: Optional[float]
+    flushes: int
+    flushed_posts: int
+    flushed_votes: int
+    failures: int
+    # Задержка записи: сколько ждал самый старый голос записанной пачки
+    last_flush_lag: Optional[float]
+    max_flush_lag: float
+    last_flush_ms: Optional[float]
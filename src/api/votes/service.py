@@ -0,0 +1,54 @@
+import logging
+from typing import Protocol, Annotated
+
+from fastapi import Depends
+
+from api.posts.exceptions import PostNotFoundException
+from .buffer import VoteBuffer, vote_buffer
+from .repository import VotesRepositoryProtocol, VotesRepositoryDep
+from .schemas import VoteReadSchema
+
+logger = logging.getLogger(__name__)
+
+
+class VotesServiceProtocol(Protocol):
+
+    async def vote(self, user_id: int, post_id: int, value: int) -> VoteReadSchema:
+        """
+        Ставим голос пользователя за пост. Голос пишется сразу,
+        а счет поста - пачкой из буфера голосов
+        """
+        pass
+
+
+class VotesService:
+
+    def __init__(self, votes_repo: VotesRepositoryProtocol, buffer: VoteBuffer):
+        self.votes_repo = votes_repo
+        self.buffer = buffer
+
+    async def vote(self, user_id: int, post_id: int, value: int) -> VoteReadSchema:
+        post_exists, previous = await self.votes_repo.set_vote(user_id, post_id, value)
+        # Первый голос за пост одновременно поставил тот же пользователь:
+        # теперь его строка видна и станет прежним голосом
+        if post_exists and previous is None:
+            post_exists, previous = await self.votes_repo.set_vote(
+                user_id, post_id, value
+            )
+        if not post_exists:
+            logger.warning(PostNotFoundException.message)
+            raise PostNotFoundException
+
+        if previous != value:
+            self.buffer.add(post_id, previous=previous, value=value)
+        logger.info(
+            "Пользователь #%d проголосовал %d за пост #%d", user_id, value, post_id
+        )
+        return VoteReadSchema(post_id=post_id, value=value, previous=previous)
+
+
+async def get_votes_service(votes_repo: VotesRepositoryDep) -> VotesServiceProtocol:
+    return VotesService(votes_repo, vote_buffer)
+
+
+VotesServiceDep = Annotated[VotesServiceProtocol, Depends(get_votes_service)]
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+
+from api.auth import ActiveUserDep, http_bearer
+from .schemas import VoteCreateSchema, VoteReadSchema
+from .service import VotesServiceDep
+
+router = APIRouter(
+    prefix="/posts",
+    tags=["Голоса"],
+    dependencies=[Depends(http_bearer)],
+)
+
+
+@router.put("/{post_id}/vote", response_model=VoteReadSchema)
+async def vote_for_post(
+    active_user: ActiveUserDep,
+    votes_service: VotesServiceDep,
+    vote_data: VoteCreateSchema,
+    post_id: int,
+):
+    """
+    Голос за пост (1), против (-1) или отмена голоса (0).
+    Счет поста обновляется с задержкой до votes.flush_interval секунд
+    """
+    return await votes_service.vote(
+        user_id=active_user.id, post_id=post_id, value=vote_data.value
+    )
@@ -1,8 +1,14 @@
 import taskiq_fastapi
+from taskiq import SimpleRetryMiddleware
 from taskiq_aio_pika import AioPikaBroker
 
 from core import settings
 
-broker = AioPikaBroker(url=settings.broker.AMQP_DSN)
+broker = AioPikaBroker(
+    url=settings.broker.AMQP_DSN, qos=settings.broker.qos
+).with_middlewares(
+    # Повторяются только задачи с меткой retry_on_error=True
+    SimpleRetryMiddleware(default_retry_count=settings.broker.retries),
+)
 
 taskiq_fastapi.init(broker, app_or_path="main:app")
@@ -1,6 +1,6 @@
 from datetime import timedelta
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional
 
 from authx.types import AlgorithmType, TokenLocation, SameSitePolicy
 from pydantic import BaseModel
@@ -20,6 +20,9 @@ class RunConfig(BaseModel):
 class ApiConfig(BaseModel):
     title: str = "Micro-reddit"
     version: str = "0.4"
+    # Списки постов и ленты пишутся в JSON прямо из строк базы,
+    # без сборки pydantic-схем и повторной проверки response_model
+    trusted_serialization: bool = True
 
 
 class FilesConfig(BaseModel):
@@ -39,6 +42,9 @@ class FilesConfig(BaseModel):
     alembic_dir: Path = base_dir / "migrations"
     alembic_ini: Path = base_dir / "alembic.ini"
 
+    # Встроенный поисковый индекс: каталог общий для API и воркеров
+    search_index_dir: Path = base_dir / "search_index"
+
 
 class LogsConfig(BaseModel):
     level: Literal["DEBUG", "INFO"] = "INFO"
@@ -80,11 +86,132 @@ class JWTConfig(BaseModel):
     cookie_session: bool = False
 
 
+class FeedConfig(BaseModel):
+    # Рассылка событий подписчикам
+    fanout_chunk_size: int = 5000
+    # Воркер копит задачи рассылки и выполняет их пачкой: не больше
+    # fanout_batch_size постов или через fanout_batch_window секунд
+    fanout_batching: bool = True
+    fanout_batch_size: int = 100
+    fanout_batch_window: float = 0.2
+    # Рассылка автора с fanout_parallel_threshold подписчиками и больше делится
+    # на диапазоны по fanout_subtask_size подписчиков - отдельные задачи,
+    # которые воркеры выполняют параллельно (None - не делить)
+    fanout_parallel_threshold: Optional[int] = 4000
+    fanout_subtask_size: int = 1000
+    # Сколько хранится прогресс рассылки по задаче
+    fanout_progress_ttl: timedelta = timedelta(days=1)
+    # Посты авторов с большим числом подписчиков не рассылаются,
+    # а подтягиваются в ленту при чтении (None - рассылать всегда)
+    celebrity_threshold: Optional[int] = 10_000
+    # Сверка счетчиков новостей с users_feed
+    counters_reconcile_batch: int = 1000
+    counters_reconcile_cron: str = "*/30 * * * *"
+    # Хранение ленты: не больше max_entries новостей на получателя
+    # и не старше max_age (None - без ограничения)
+    retention_max_entries: Optional[int] = 1000
+    retention_max_age: Optional[timedelta] = timedelta(days=30)
+    retention_batch: int = 5000
+    retention_cron: str = "15 * * * *"
+    # Удаление поста из лент пачками
+    retraction_batch: int = 5000
+    # Сколько последних постов автора попадает в ленту нового подписчика
+    backfill_posts: int = 20
+    # Пересчет рейтинга hot постов с изменившимся счетом и его копирование
+    # в ленты: ranking_batch постов за транзакцию
+    ranking_batch: int = 100
+    ranking_cron: str = "* * * * *"
+    # Лента отдается из готовых JSON новостей о постах (feed_items) без
+    # загрузки постов и авторов при каждом чтении
+    compact_payloads: bool = False
+    # Число hash-секций users_feed по recipient_id. Должно совпадать с числом,
+    # зафиксированным в миграции секционирования: по нему секции создаются
+    # вне миграций (metadata.create_all). Для смены нужна новая миграция
+    partitions: int = 16
+
+
+class PostsConfig(BaseModel):
+    # Без exact_count посты пользователя считаются не дальше этого числа
+    count_limit: int = 1000
+    # Первые страницы общей ленты отдаются из снимка в памяти процесса:
+    # front_snapshot_size последних постов, снимок обновляется в фоне,
+    # если он старше front_refresh секунд
+    front_snapshot_size: int = 500
+    front_refresh: float = 5
+
+
+class FeedCacheConfig(BaseModel):
+    enabled: bool = True
+    # Сколько последних постов ленты хранится на пользователя
+    timeline_size: int = 800
+    # Общий лимит памяти под ленты, байт
+    max_memory: int = 64 * 1024 * 1024
+    # Через сколько секунд лента перечитывается из базы целиком. Только так
+    # из кеша уходят подтягиваемые посты, вышедшие за срок хранения
+    ttl: float = 300
+
+
+class PostCacheConfig(BaseModel):
+    enabled: bool = True
+    # Сколько постов хранится в кеше процесса
+    max_entries: int = 10_000
+    # Через сколько секунд пост перечитывается из базы. Кеш другого
+    # процесса не узнает об изменении поста, пока не истечет ttl
+    ttl: float = 30
+
+
+class VotesConfig(BaseModel):
+    # Голоса копятся в памяти процесса API и пишутся в счет постов
+    # раз в flush_interval секунд или раньше, когда в буфере
+    # max_pending_posts постов
+    flush_interval: float = 1
+    max_pending_posts: int = 10_000
+
+
+class CommentsConfig(BaseModel):
+    # Глубина дерева комментариев по умолчанию и наибольшая
+    default_depth: int = 3
+    max_depth: int = 10
+    # Сколько ответов отдается вместе со страницей комментариев верхнего
+    # уровня: ближние уровни дерева заполняются первыми
+    max_replies: int = 500
+    # Без exact_count комментарии верхнего уровня считаются не дальше этого числа
+    count_limit: int = 1000
+
+
+class SearchConfig(BaseModel):
+    # Без exact_count найденные посты считаются не дальше этого числа
+    count_limit: int = 1000
+    # Длина поискового запроса в символах
+    max_query_length: int = 256
+    # Движок поиска: postgres - полнотекстовый поиск в базе, embedded -
+    # встроенный индекс BM25 в памяти процессов API. Встроенный индекс
+    # пополняется задачами при изменении постов, процессы API
+    # проверяют его обновления не чаще раза в index_refresh секунд
+    backend: Literal["postgres", "embedded"] = "postgres"
+    index_refresh: float = 1
+    # Сегменты изменений сливаются между собой, когда сегментов больше
+    # max_segments, а все сегменты в один - по merge_cron
+    max_segments: int = 16
+    merge_cron: str = "*/30 * * * *"
+    # Пересборка индекса читает посты пачками
+    rebuild_batch: int = 10_000
+    # BM25: слово названия весит как title_weight слов описания
+    title_weight: int = 3
+    bm25_k1: float = 1.2
+    bm25_b: float = 0.75
+
+
 class BrokerConfig(BaseModel):
     username: str
     password: str
     host: str
     port: str
+    # Сколько сообщений воркер берет заранее. Пачка рассылки
+    # не наберется больше этого числа
+    qos: int = 100
+    # Сколько раз повторяется упавшая задача с retry_on_error=True
+    retries: int = 3
 
     @property
     def AMQP_DSN(self):
@@ -96,6 +223,13 @@ class Settings(BaseSettings):
     run: RunConfig = RunConfig()
     files: FilesConfig = FilesConfig()
     log: LogsConfig = LogsConfig()
+    feed: FeedConfig = FeedConfig()
+    feed_cache: FeedCacheConfig = FeedCacheConfig()
+    posts: PostsConfig = PostsConfig()
+    post_cache: PostCacheConfig = PostCacheConfig()
+    votes: VotesConfig = VotesConfig()
+    comments: CommentsConfig = CommentsConfig()
+    search: SearchConfig = SearchConfig()
 
     db: DatabaseConfig
     broker: BrokerConfig
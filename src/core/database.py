@@ -2,6 +2,7 @@ import logging
 from typing import AsyncGenerator
 
 from asyncpg.exceptions import ConnectionDoesNotExistError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
@@ -13,6 +14,9 @@ from .exceptions import UnavailableServiceException
 
 logger = logging.getLogger(__name__)
 
+# Код ошибки Postgres при нарушении уникальности
+UNIQUE_VIOLATION = "23505"
+
 
 class Database:
 
@@ -41,6 +45,10 @@ class Database:
         logger.debug("Подключение к базе данных разорвано")
         await self._engine.dispose()
 
+    def session(self) -> AsyncSession:
+        """Сессия для кода вне запроса, например фоновых задач"""
+        return self._session_factory()
+
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         async with self._session_factory() as session:
             try:
@@ -49,4 +57,9 @@ class Database:
                 raise UnavailableServiceException(str(e))
 
 
+def is_unique_violation(exc: IntegrityError) -> bool:
+    """Запрос нарушил ограничение уникальности"""
+    return getattr(exc.orig, "sqlstate", None) == UNIQUE_VIOLATION
+
+
 db_helper = Database(url=str(settings.db.POSTGRES_DSN), echo=bool(settings.db.echo))
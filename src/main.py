@@ -8,6 +8,7 @@ from fastapi.responses import ORJSONResponse
 from sqlalchemy import text
 
 from api import router as main_router
+from api.votes.buffer import vote_buffer
 from core import AppException, settings, db_helper, broker
 from core.dependencies import SessionDep
 from core.logger import setup_logging
@@ -22,10 +23,13 @@ async def lifespan(_: FastAPI):
     # Startup
     if not broker.is_worker_process:
         await broker.startup()
+    vote_buffer.start()
 
     yield
     # Shutdown
 
+    # Голоса, накопленные с последней записи, не должны потеряться
+    await vote_buffer.stop()
     if not broker.is_worker_process:
         await broker.shutdown()
 
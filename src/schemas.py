@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -8,9 +10,11 @@ class BaseResponseSchema(BaseModel):
 class PaginationSchema(BaseModel):
     limit: int = Field(10, ge=1, le=50)
     page: int = Field(1, ge=1)
+    cursor: Optional[str] = None
 
 
 class SearchResponseSchema[T](BaseModel):
     detail: list[T]
     pagination: PaginationSchema
     total_found: int
+    next_cursor: Optional[str] = None
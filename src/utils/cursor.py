@@ -0,0 +1,38 @@
+import base64
+import binascii
+from datetime import datetime
+
+import orjson
+
+from core.exceptions import BadRequestException
+
+
+def encode_cursor(*values) -> str:
+    """Упаковывает ключ последней записи страницы в непрозрачный курсор"""
+    return base64.urlsafe_b64encode(orjson.dumps(values)).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> tuple:
+    """Распаковывает курсор и проверяет типы значений ключа"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = orjson.loads(raw)
+    except (binascii.Error, ValueError):
+        raise BadRequestException("Некорректный курсор пагинации")
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise BadRequestException("Некорректный курсор пагинации")
+
+    # Время хранится в курсоре строкой ISO 8601
+    try:
+        values = [
+            datetime.fromisoformat(v) if t is datetime and isinstance(v, str) else v
+            for v, t in zip(values, types)
+        ]
+    except ValueError:
+        raise BadRequestException("Некорректный курсор пагинации")
+
+    if not all(isinstance(v, t) for v, t in zip(values, types)):
+        raise BadRequestException("Некорректный курсор пагинации")
+
+    return tuple(values)
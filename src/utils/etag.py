@@ -0,0 +1,28 @@
+import hashlib
+from typing import Any, Optional
+
+from .serialization import dump_json
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Слабый ETag из версии ответа, а не из его байтов:
+    части (id, время изменения, счетчики) сериализуются и хешируются
+    """
+    digest = hashlib.blake2b(dump_json(parts), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Есть ли etag в заголовке If-None-Match (слабое сравнение, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    """Заголовки ответа с ETag: клиент сверяет ответ с сервером перед повтором"""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -0,0 +1,36 @@
+from typing import Any, Optional, Sequence
+
+import orjson
+from pydantic import BaseModel
+
+from schemas import PaginationSchema
+
+
+def dump_json(content: Any) -> bytes:
+    """
+    Сериализует строки из базы в JSON без pydantic-схем.
+    Время в UTC пишется с суффиксом Z, как это делает pydantic
+    """
+    return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def schema_columns(schema: type[BaseModel], model: type) -> list:
+    """Колонки модели в порядке полей схемы ответа"""
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+def dump_search_response(
+    detail: Sequence[Any] | orjson.Fragment,
+    pagination: PaginationSchema,
+    total_found: int,
+    next_cursor: Optional[str],
+) -> bytes:
+    """JSON ответа в форме SearchResponseSchema"""
+    return dump_json(
+        {
+            "detail": detail,
+            "pagination": pagination.model_dump(mode="json"),
+            "total_found": total_found,
+            "next_cursor": next_cursor,
+        }
+    )
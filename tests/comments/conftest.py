@@ -0,0 +1,36 @@
+import uuid
+
+import pytest_asyncio
+from sqlalchemy import text
+
+from core import db_helper
+
+
+@pytest_asyncio.fixture(scope="function")
+async def commenter_fixture(client):
+    """Пользователь и его пост для комментариев"""
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"commenter-{suffix}@example.com",
+        "password": "qwerty123",
+        "username": f"commenter-{suffix}",
+    }
+    resp = await client.post("/api/users/register", json=user_data)
+    assert resp.status_code == 201
+
+    resp = await client.post("/api/users/login", json=user_data)
+    assert resp.status_code == 200
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.get("/api/users/me", headers=headers)
+    async for session in db_helper.session_getter():
+        post_id = await session.scalar(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) VALUES (:user_id, 'commented post', NULL, now(), now()) "
+                "RETURNING id"
+            ),
+            {"user_id": resp.json()["id"]},
+        )
+        await session.commit()
+    return {"headers": headers, "post_id": post_id}
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import text
+
+from core import db_helper
+
+
+async def _comment(client, fixture, body: str, parent_id: int = None) -> dict:
+    resp = await client.post(
+        f"/api/posts/{fixture['post_id']}/comments",
+        json={"body": body, "parent_id": parent_id},
+        headers=fixture["headers"],
+    )
+    assert resp.status_code == 201
+    return resp.json()
+
+
+def _shape(nodes: list) -> list:
+    return [(node["body"], _shape(node["replies"])) for node in nodes]
+
+
+@pytest.mark.asyncio
+class TestComments:
+
+    async def test_comment_tree(self, client, commenter_fixture):
+        first = await _comment(client, commenter_fixture, "first")
+        reply = await _comment(client, commenter_fixture, "reply", first["id"])
+        await _comment(client, commenter_fixture, "nested", reply["id"])
+        await _comment(client, commenter_fixture, "second")
+        assert reply["depth"] == 1 and reply["parent_id"] == first["id"]
+
+        url = f"/api/posts/{commenter_fixture['post_id']}/comments"
+        resp = await client.get(url, params={"depth": 3})
+        assert resp.status_code == 200
+        body = resp.json()
+        assert body["total_found"] == 2
+        assert _shape(body["detail"]) == [
+            ("second", []),
+            ("first", [("reply", [("nested", [])])]),
+        ]
+        assert body["detail"][1]["replies_count"] == 1
+
+        # Ответы глубже depth не загружаются, но учтены в replies_count
+        resp = await client.get(url, params={"depth": 2})
+        reply_node = resp.json()["detail"][1]["replies"][0]
+        assert reply_node["replies"] == [] and reply_node["replies_count"] == 1
+
+    async def test_comment_top_sort_pagination(self, client, commenter_fixture):
+        ids = [
+            (await _comment(client, commenter_fixture, f"root {idx}"))["id"]
+            for idx in range(3)
+        ]
+        reply = await _comment(client, commenter_fixture, "reply", ids[0])
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text("UPDATE comments SET score = id - :base WHERE id = ANY(:ids)"),
+                {"base": ids[2], "ids": [ids[0], ids[1]]},
+            )
+            await session.commit()
+
+        url = f"/api/posts/{commenter_fixture['post_id']}/comments"
+        params = {"sort": "top", "limit": 1}
+        seen = []
+        while True:
+            body = (await client.get(url, params=params)).json()
+            seen.extend(
+                (node["id"], [r["id"] for r in node["replies"]])
+                for node in body["detail"]
+            )
+            if body["next_cursor"] is None:
+                break
+            params["cursor"] = body["next_cursor"]
+
+        # Счет: root 2 - 0, root 1 - -1, root 0 - -2
+        assert seen == [(ids[2], []), (ids[1], []), (ids[0], [reply["id"]])]
+
+    async def test_comment_not_found(self, client, commenter_fixture):
+        headers = commenter_fixture["headers"]
+        resp = await client.post(
+            "/api/posts/0/comments", json={"body": "text"}, headers=headers
+        )
+        assert resp.status_code == 404
+        assert (await client.get("/api/posts/0/comments")).status_code == 404
+
+        resp = await client.post(
+            f"/api/posts/{commenter_fixture['post_id']}/comments",
+            json={"body": "text", "parent_id": 0},
+            headers=headers,
+        )
+        assert resp.status_code == 404
+        assert resp.json()["detail"] == "Комментарий не найден"
@@ -5,8 +5,8 @@ from alembic import command
 from alembic.config import Config
 from httpx import AsyncClient, ASGITransport
 
-from src.core import settings, db_helper
-from src.main import app
+from core import settings, db_helper
+from main import app
 
 
 @pytest_asyncio.fixture(scope="function", autouse=True)
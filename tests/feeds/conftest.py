@@ -0,0 +1,90 @@
+import uuid
+
+import pytest_asyncio
+from sqlalchemy import text
+
+from core import db_helper
+
+
+@pytest_asyncio.fixture(scope="function")
+async def reader_fixture(client):
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"reader-{suffix}@example.com",
+        "password": "qwerty123",
+        "username": f"reader-{suffix}",
+    }
+    resp = await client.post("/api/users/register", json=user_data)
+    assert resp.status_code == 201
+
+    resp = await client.post("/api/users/login", json=user_data)
+    assert resp.status_code == 200
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.get("/api/users/me", headers=headers)
+    assert resp.status_code == 200
+    return {"id": resp.json()["id"], "headers": headers}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def feed_fixture(reader_fixture):
+    """Автор с 25 постами, которые уже разосланы читателю"""
+    async for session in db_helper.session_getter():
+        await _seed_feed(session, reader_fixture["id"])
+    return reader_fixture
+
+
+@pytest_asyncio.fixture(scope="function")
+async def followers_fixture():
+    """Автор и 5 его подписчиков с пустыми лентами"""
+    async for session in db_helper.session_getter():
+        author_id = await _create_user(session, "author")
+        follower_ids = [await _create_user(session, "follower") for _ in range(5)]
+        await session.execute(
+            text(
+                "INSERT INTO follows (follower_id, followee_id, created_at, "
+                "updated_at) SELECT unnest(CAST(:follower_ids AS int[])), "
+                ":author_id, now(), now()"
+            ),
+            {"follower_ids": follower_ids, "author_id": author_id},
+        )
+        await session.commit()
+    return {"author_id": author_id, "follower_ids": follower_ids}
+
+
+async def _create_user(session, prefix: str) -> int:
+    suffix = uuid.uuid4().hex[:8]
+    return await session.scalar(
+        text(
+            "INSERT INTO users (username, email, is_active, is_superuser, created_at, updated_at) "
+            "VALUES (:username, :email, true, false, now(), now()) RETURNING id"
+        ),
+        {"username": f"{prefix}-{suffix}", "email": f"{prefix}-{suffix}@example.com"},
+    )
+
+
+async def _seed_feed(session, reader_id: int) -> None:
+    author_id = await _create_user(session, "author")
+    await session.execute(
+        text(
+            "INSERT INTO posts (user_id, title, description, created_at, updated_at) "
+            "SELECT :author_id, 'post ' || g, NULL, now(), now() FROM generate_series(1, 25) g"
+        ),
+        {"author_id": author_id},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO users_feed (author_id, recipient_id, post_id, hot_score, "
+            "score) SELECT user_id, :reader_id, id, hot_score, score FROM posts "
+            "WHERE user_id = :author_id"
+        ),
+        {"author_id": author_id, "reader_id": reader_id},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO users_feed_counters (recipient_id, events_count) "
+            "VALUES (:reader_id, 25)"
+        ),
+        {"reader_id": reader_id},
+    )
+    await session.commit()
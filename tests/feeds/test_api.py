@@ -0,0 +1,954 @@
+import asyncio
+import re
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from api.feeds.batcher import FanOutBatcher
+from api.feeds.cache import timeline_cache
+from api.feeds.repository import FeedRepository
+from api.feeds.schemas import FanOutBatchReportSchema
+from api.feeds.service import FeedService
+from api.follows import views as follows_views
+from api.follows.repository import FollowsRepository
+from api.posts.repository import PostRepository
+from api.posts.service import PostService
+from api.tasks.feed_tasks import (
+    backfill_follower_feed,
+    create_event_chunk,
+    create_event_for_users,
+    create_events_for_batch,
+    retract_follower_feed,
+)
+from core import db_helper, settings
+
+
+async def _create_posts(session, author_id: int, count: int) -> list[int]:
+    res = await session.scalars(
+        text(
+            "INSERT INTO posts (user_id, title, created_at, updated_at) "
+            "SELECT :author_id, :prefix || g, now(), now() "
+            "FROM generate_series(1, :count) g RETURNING id"
+        ),
+        {"author_id": author_id, "count": count, "prefix": uuid.uuid4().hex},
+    )
+    post_ids = sorted(res.all())
+    await session.commit()
+    return post_ids
+
+
+async def _get_feeds(session, recipient_ids: list[int]) -> dict[int, list[int]]:
+    """Разосланные посты по получателям, от новых к старым"""
+    res = await session.execute(
+        text(
+            "SELECT recipient_id, post_id FROM users_feed "
+            "WHERE recipient_id = ANY(:ids) ORDER BY post_id DESC"
+        ),
+        {"ids": recipient_ids},
+    )
+    feeds = {recipient_id: [] for recipient_id in recipient_ids}
+    for recipient_id, post_id in res.all():
+        feeds[recipient_id].append(post_id)
+    return feeds
+
+
+async def _get_counters(session, recipient_ids: list[int]) -> dict[int, int]:
+    res = await session.execute(
+        text(
+            "SELECT recipient_id, events_count FROM users_feed_counters "
+            "WHERE recipient_id = ANY(:ids)"
+        ),
+        {"ids": recipient_ids},
+    )
+    counters = {recipient_id: 0 for recipient_id in recipient_ids}
+    counters.update(res.all())
+    return counters
+
+
+@pytest.mark.asyncio
+class TestFeedPagination:
+
+    async def test_feed_cursor_pagination(self, client, feed_fixture):
+        headers = feed_fixture["headers"]
+
+        resp = await client.get("/api/feed", params={"limit": 10}, headers=headers)
+        assert resp.status_code == 200
+        page = resp.json()
+        assert page["total_found"] == 25
+
+        post_ids = [item["post"]["id"] for item in page["detail"]]
+        while page["next_cursor"]:
+            resp = await client.get(
+                "/api/feed",
+                params={"limit": 10, "cursor": page["next_cursor"]},
+                headers=headers,
+            )
+            assert resp.status_code == 200
+            page = resp.json()
+            post_ids += [item["post"]["id"] for item in page["detail"]]
+
+        assert len(post_ids) == 25
+        assert post_ids == sorted(post_ids, reverse=True)
+
+    async def test_feed_invalid_cursor(self, client, reader_fixture):
+        resp = await client.get(
+            "/api/feed",
+            params={"cursor": "not-a-cursor"},
+            headers=reader_fixture["headers"],
+        )
+        assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+class TestFanOut:
+
+    async def test_fan_out_by_chunks(self, followers_fixture, monkeypatch):
+        author_id = followers_fixture["author_id"]
+        follower_ids = followers_fixture["follower_ids"]
+        monkeypatch.setattr(settings.feed, "fanout_chunk_size", 2)
+
+        async for session in db_helper.session_getter():
+            post_ids = await _create_posts(session, author_id, 2)
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            for post_id in post_ids:
+                report = await service.create_event_for_users(author_id, post_id)
+                assert report.inserted == len(follower_ids)
+                assert len(report.chunks) == 3 and not report.pulled
+
+            # Повтор рассылки не дублирует новости и счетчики
+            report = await service.create_event_for_users(author_id, post_ids[0])
+            assert report.inserted == 0
+
+            feeds = await _get_feeds(session, [author_id, *follower_ids])
+            counters = await _get_counters(session, [author_id, *follower_ids])
+
+        assert feeds == {
+            author_id: [],
+            **{follower_id: post_ids[::-1] for follower_id in follower_ids},
+        }
+        assert counters == {author_id: 0, **{i: 2 for i in follower_ids}}
+
+
+@pytest.mark.asyncio
+class TestFeedCounters:
+
+    async def test_reconcile_counters(self, followers_fixture):
+        author_id = followers_fixture["author_id"]
+        follower_ids = followers_fixture["follower_ids"]
+        async for session in db_helper.session_getter():
+            post_ids = await _create_posts(session, author_id, 2)
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            await service.create_event_for_users(author_id, post_ids[0])
+
+            # Один счетчик разошелся с лентой, другой потерян
+            await session.execute(
+                text(
+                    "UPDATE users_feed_counters SET events_count = 7 "
+                    "WHERE recipient_id = :id"
+                ),
+                {"id": follower_ids[1]},
+            )
+            await session.execute(
+                text("DELETE FROM users_feed_counters WHERE recipient_id = :id"),
+                {"id": follower_ids[2]},
+            )
+            await session.commit()
+
+        # Рассылка, идущая во время сверки, не теряет своего увеличения
+        async for fan_out in db_helper.session_getter():
+            await fan_out.execute(
+                text(
+                    "INSERT INTO users_feed (author_id, recipient_id, post_id) "
+                    "VALUES (:author_id, :recipient_id, :post_id)"
+                ),
+                {
+                    "author_id": author_id,
+                    "recipient_id": follower_ids[0],
+                    "post_id": post_ids[1],
+                },
+            )
+            await fan_out.execute(
+                text(
+                    "UPDATE users_feed_counters SET events_count = events_count + 1 "
+                    "WHERE recipient_id = :id"
+                ),
+                {"id": follower_ids[0]},
+            )
+            async for session in db_helper.session_getter():
+                service = FeedService(
+                    FeedRepository(session), FollowsRepository(session)
+                )
+                reconcile = asyncio.create_task(service.reconcile_counters())
+                await asyncio.sleep(0.2)
+                assert not reconcile.done()
+                await fan_out.commit()
+                assert await reconcile >= 2
+
+        async for session in db_helper.session_getter():
+            counters = await _get_counters(session, follower_ids)
+        assert counters == {follower_ids[0]: 2, **{i: 1 for i in follower_ids[1:]}}
+
+
+@pytest.mark.asyncio
+class TestHybridFeed:
+
+    async def test_pushed_and_pulled_posts(
+        self, client, reader_fixture, followers_fixture, monkeypatch
+    ):
+        headers = reader_fixture["headers"]
+        reader_id = reader_fixture["id"]
+        # У популярного автора 6 подписчиков, у обычного - один читатель
+        celebrity_id = followers_fixture["author_id"]
+        author_id = followers_fixture["follower_ids"][0]
+        monkeypatch.setattr(settings.feed, "celebrity_threshold", 3)
+
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "INSERT INTO follows (follower_id, followee_id, created_at, "
+                    "updated_at) SELECT :reader_id, unnest(CAST(:ids AS int[])), "
+                    "now(), now()"
+                ),
+                {"reader_id": reader_id, "ids": [celebrity_id, author_id]},
+            )
+            await session.commit()
+
+            # Посты авторов чередуются, чтобы страницы смешивали обе ветки
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            post_ids = []
+            for _ in range(3):
+                for user_id in (celebrity_id, author_id):
+                    (post_id,) = await _create_posts(session, user_id, 1)
+                    report = await service.create_event_for_users(user_id, post_id)
+                    assert report.pulled is (user_id == celebrity_id)
+                    post_ids.append(post_id)
+
+            feeds = await _get_feeds(session, [reader_id])
+        assert feeds[reader_id] == post_ids[::-2]
+
+        for exact_count in (False, True):
+            seen = []
+            params = {"limit": 4, "exact_count": exact_count}
+            while True:
+                resp = await client.get("/api/feed", params=params, headers=headers)
+                assert resp.status_code == 200
+                body = resp.json()
+                assert body["total_found"] == 6
+                seen += [item["post"]["id"] for item in body["detail"]]
+                if body["next_cursor"] is None:
+                    break
+                params["cursor"] = body["next_cursor"]
+            assert seen == post_ids[::-1]
+
+
+@pytest.mark.asyncio
+class TestTimelineCache:
+
+    async def _read_feed(self, client, headers) -> tuple[list[int], int]:
+        resp = await client.get("/api/feed", params={"limit": 10}, headers=headers)
+        assert resp.status_code == 200
+        body = resp.json()
+        return [item["post"]["id"] for item in body["detail"]], body["total_found"]
+
+    async def test_out_of_order_fan_out(
+        self, client, reader_fixture, followers_fixture
+    ):
+        headers = reader_fixture["headers"]
+        author_id = followers_fixture["author_id"]
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "INSERT INTO follows (follower_id, followee_id, created_at, "
+                    "updated_at) VALUES (:reader_id, :author_id, now(), now())"
+                ),
+                {"reader_id": reader_fixture["id"], "author_id": author_id},
+            )
+            post_ids = await _create_posts(session, author_id, 5)
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            for post_id in post_ids[:3] + post_ids[4:]:
+                await service.create_event_for_users(author_id, post_id)
+
+        expected = post_ids[:3] + post_ids[4:]
+        assert await self._read_feed(client, headers) == (expected[::-1], 4)
+
+        # Лента не менялась: второе чтение отдается из кеша
+        hits = timeline_cache.hits
+        assert await self._read_feed(client, headers) == (expected[::-1], 4)
+        assert timeline_cache.hits == hits + 1
+
+        # Пост старше закешированных разослан уже после чтения ленты
+        async for session in db_helper.session_getter():
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            await service.create_event_for_users(author_id, post_ids[3])
+        assert await self._read_feed(client, headers) == (post_ids[::-1], 5)
+
+    async def test_pulled_posts_and_follows(
+        self, client, reader_fixture, followers_fixture, monkeypatch
+    ):
+        headers = reader_fixture["headers"]
+        celebrity_id = followers_fixture["author_id"]
+        monkeypatch.setattr(settings.feed, "celebrity_threshold", 3)
+
+        # Подтягиваемые посты не копируются в ленту при подписке
+        async def kiq(**kwargs):
+            pass
+
+        monkeypatch.setattr(follows_views.backfill_follower_feed, "kiq", kiq)
+        monkeypatch.setattr(follows_views.retract_follower_feed, "kiq", kiq)
+
+        async for session in db_helper.session_getter():
+            post_ids = await _create_posts(session, celebrity_id, 2)
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            report = await service.create_event_for_users(celebrity_id, post_ids[0])
+            assert report.pulled
+
+        # Подписка сдвигает версию ленты, и закешированная пустая лента
+        # перечитывается
+        assert await self._read_feed(client, headers) == ([], 0)
+        resp = await client.post(f"/api/follows/{celebrity_id}", headers=headers)
+        assert resp.status_code == 201
+        assert await self._read_feed(client, headers) == (post_ids[:1], 1)
+
+        # Новый подтягиваемый пост обновляет закешированную ленту
+        refreshes = timeline_cache.refreshes
+        async for session in db_helper.session_getter():
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            report = await service.create_event_for_users(celebrity_id, post_ids[1])
+            assert report.pulled
+        assert await self._read_feed(client, headers) == (post_ids[::-1], 2)
+        assert timeline_cache.refreshes == refreshes + 1
+
+        resp = await client.delete(f"/api/follows/{celebrity_id}", headers=headers)
+        assert resp.status_code == 204
+        assert await self._read_feed(client, headers) == ([], 0)
+
+    async def test_deleted_post(self, client, reader_fixture, followers_fixture):
+        headers = reader_fixture["headers"]
+        author_id = followers_fixture["author_id"]
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "INSERT INTO follows (follower_id, followee_id, created_at, "
+                    "updated_at) VALUES (:reader_id, :author_id, now(), now())"
+                ),
+                {"reader_id": reader_fixture["id"], "author_id": author_id},
+            )
+            post_ids = await _create_posts(session, author_id, 5)
+            feed_service = FeedService(
+                FeedRepository(session), FollowsRepository(session)
+            )
+            for post_id in post_ids:
+                await feed_service.create_event_for_users(author_id, post_id)
+
+        params = {"limit": 2}
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        assert [item["post"]["id"] for item in resp.json()["detail"]] == [
+            post_ids[4],
+            post_ids[3],
+        ]
+
+        # Скрытый пост пропадает из закешированной ленты сразу,
+        # а после очистки лент - и из числа новостей
+        async for session in db_helper.session_getter():
+            post_service = PostService(session, PostRepository(session))
+            await post_service.delete_post(author_id, post_ids[4])
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        assert [item["post"]["id"] for item in resp.json()["detail"]] == [
+            post_ids[3],
+            post_ids[2],
+        ]
+
+        async for session in db_helper.session_getter():
+            feed_service = FeedService(
+                FeedRepository(session), FollowsRepository(session)
+            )
+            assert await feed_service.retract_post(post_ids[4]) == 6
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        body = resp.json()
+        assert [item["post"]["id"] for item in body["detail"]] == [
+            post_ids[3],
+            post_ids[2],
+        ]
+        assert body["total_found"] == 4
+
+
+@pytest.mark.asyncio
+class TestFollowFeed:
+
+    async def test_backfill_and_retract(
+        self, client, reader_fixture, followers_fixture, monkeypatch
+    ):
+        headers = reader_fixture["headers"]
+        reader_id = reader_fixture["id"]
+        author_id = followers_fixture["author_id"]
+        monkeypatch.setattr(settings.feed, "backfill_posts", 3)
+        async for session in db_helper.session_getter():
+            post_ids = await _create_posts(session, author_id, 4)
+
+        # Фоновые задачи выполняются после запроса и после чтения ленты
+        tasks = []
+
+        async def kiq(**kwargs):
+            tasks.append(kwargs)
+
+        monkeypatch.setattr(follows_views.backfill_follower_feed, "kiq", kiq)
+        monkeypatch.setattr(follows_views.retract_follower_feed, "kiq", kiq)
+
+        async def read_feed():
+            resp = await client.get("/api/feed", headers=headers)
+            assert resp.status_code == 200
+            body = resp.json()
+            return [item["post"]["id"] for item in body["detail"]], body["total_found"]
+
+        resp = await client.post(f"/api/follows/{author_id}", headers=headers)
+        assert resp.status_code == 201
+        assert tasks.pop() == {"follower_id": reader_id, "author_id": author_id}
+        assert await read_feed() == ([], 0)
+
+        async for session in db_helper.session_getter():
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            await backfill_follower_feed(
+                feed_service=service, follower_id=reader_id, author_id=author_id
+            )
+        assert await read_feed() == (post_ids[:0:-1], 3)
+
+        resp = await client.delete(f"/api/follows/{author_id}", headers=headers)
+        assert resp.status_code == 204
+        assert tasks.pop() == {"follower_id": reader_id, "author_id": author_id}
+        assert await read_feed() == (post_ids[:0:-1], 3)
+
+        async for session in db_helper.session_getter():
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            await retract_follower_feed(
+                feed_service=service, follower_id=reader_id, author_id=author_id
+            )
+        assert await read_feed() == ([], 0)
+
+
+@pytest.mark.asyncio
+class TestFeedRetention:
+
+    async def test_trim_feeds(
+        self, client, reader_fixture, followers_fixture, monkeypatch
+    ):
+        headers = reader_fixture["headers"]
+        author_id = followers_fixture["author_id"]
+        recipient_ids = [reader_fixture["id"], *followers_fixture["follower_ids"]]
+        monkeypatch.setattr(settings.feed, "retention_max_entries", 3)
+        monkeypatch.setattr(settings.feed, "retention_batch", 2)
+
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "INSERT INTO follows (follower_id, followee_id, created_at, "
+                    "updated_at) VALUES (:reader_id, :author_id, now(), now())"
+                ),
+                {"reader_id": reader_fixture["id"], "author_id": author_id},
+            )
+            post_ids = await _create_posts(session, author_id, 6)
+            # Два старых поста вышли за срок хранения
+            await session.execute(
+                text(
+                    "UPDATE posts SET created_at = now() - CAST(:age AS interval) "
+                    "WHERE id = ANY(:ids)"
+                ),
+                {
+                    "age": settings.feed.retention_max_age * 2,
+                    "ids": post_ids[:2],
+                },
+            )
+            await session.commit()
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            for post_id in post_ids:
+                await service.create_event_for_users(author_id, post_id)
+
+        resp = await client.get("/api/feed", headers=headers)
+        assert resp.json()["total_found"] == 6
+
+        async for session in db_helper.session_getter():
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            report = await service.trim_feeds()
+            assert report.deleted_by_age >= 2 * len(recipient_ids)
+            assert report.deleted_by_size >= len(recipient_ids)
+
+            feeds = await _get_feeds(session, recipient_ids)
+            counters = await _get_counters(session, recipient_ids)
+        assert feeds == {i: post_ids[:2:-1] for i in recipient_ids}
+        assert counters == {i: 3 for i in recipient_ids}
+
+        # Закешированная лента перечитывается после очистки
+        resp = await client.get("/api/feed", headers=headers)
+        body = resp.json()
+        assert [item["post"]["id"] for item in body["detail"]] == post_ids[:2:-1]
+        assert body["total_found"] == 3
+
+        # Лимит 0 очищает ленту целиком
+        async for session in db_helper.session_getter():
+            repo = FeedRepository(session)
+            assert await repo.trim_recipient_events(recipient_ids[1], 0, 10) == 3
+            counters = await _get_counters(session, recipient_ids[1:2])
+        assert counters == {recipient_ids[1]: 0}
+
+
+@pytest.mark.asyncio
+class TestFeedPartitions:
+
+    async def test_hash_partitions(self):
+        async for session in db_helper.session_getter():
+            res = await session.execute(
+                text(
+                    "SELECT CAST(p.partstrat AS text), a.attname "
+                    "FROM pg_partitioned_table p "
+                    "JOIN pg_attribute a ON a.attrelid = p.partrelid "
+                    "AND a.attnum = p.partattrs[0] "
+                    "WHERE p.partrelid = CAST('users_feed' AS regclass)"
+                )
+            )
+            strategy, key = res.one()
+            partitions = await session.scalar(
+                text(
+                    "SELECT count(*) FROM pg_inherits "
+                    "WHERE inhparent = CAST('users_feed' AS regclass)"
+                )
+            )
+        assert (strategy, key) == ("h", "recipient_id")
+        assert partitions == settings.feed.partitions
+
+    async def test_fan_out_read_and_trim(self, followers_fixture):
+        author_id = followers_fixture["author_id"]
+        follower_ids = followers_fixture["follower_ids"]
+        async for session in db_helper.session_getter():
+            post_ids = await _create_posts(session, author_id, 3)
+            repo = FeedRepository(session)
+            service = FeedService(repo, FollowsRepository(session))
+            for post_id in post_ids:
+                await service.create_event_for_users(author_id, post_id)
+
+            # Повтор рассылки упирается в уникальность внутри секции
+            report = await service.create_event_for_users(author_id, post_ids[0])
+            assert report.inserted == 0
+
+            # Лента получателя целиком лежит в одной секции,
+            # и чтение по получателю идет только в нее
+            res = await session.execute(
+                text(
+                    "SELECT recipient_id, count(DISTINCT tableoid) FROM users_feed "
+                    "WHERE recipient_id = ANY(:ids) GROUP BY recipient_id"
+                ),
+                {"ids": follower_ids},
+            )
+            assert dict(res.all()) == {i: 1 for i in follower_ids}
+            res = await session.scalars(
+                text(
+                    "EXPLAIN SELECT post_id FROM users_feed "
+                    f"WHERE recipient_id = {int(follower_ids[0])}"
+                )
+            )
+            plan = "\n".join(res.all())
+            assert len(set(re.findall(r"Scan on (users_feed_p\d+) ", plan))) == 1
+
+            feed = await repo.get_feed_post_ids(follower_ids[0], limit=10)
+            assert feed == post_ids[::-1]
+
+            assert await repo.trim_recipient_events(follower_ids[0], 1, 10) == 2
+            feeds = await _get_feeds(session, follower_ids)
+            counters = await _get_counters(session, follower_ids)
+        assert feeds == {
+            follower_ids[0]: post_ids[-1:],
+            **{i: post_ids[::-1] for i in follower_ids[1:]},
+        }
+        assert counters == {follower_ids[0]: 1, **{i: 3 for i in follower_ids[1:]}}
+
+
+@pytest.mark.asyncio
+class TestFanOutBatcher:
+
+    async def test_batcher_flushes_by_size_and_window(self):
+        batches = []
+
+        async def handler(requests):
+            batches.append(list(requests))
+            return FanOutBatchReportSchema(posts=len(requests))
+
+        batcher = FanOutBatcher(handler, max_size=3, window=0.05)
+        reports = await asyncio.gather(
+            *(batcher.submit(1, post_id) for post_id in range(1, 5))
+        )
+
+        # Полная пачка уходит сразу, остаток - по истечении окна
+        assert batches == [[(1, 1), (1, 2), (1, 3)], [(1, 4)]]
+        assert [report.posts for report in reports] == [3, 3, 3, 1]
+
+    async def test_batcher_failure_is_retried(self):
+        async def handler(requests):
+            raise RuntimeError("database is down")
+
+        batcher = FanOutBatcher(handler, max_size=2, window=0.05)
+        results = await asyncio.gather(
+            batcher.submit(1, 1), batcher.submit(1, 2), return_exceptions=True
+        )
+
+        # Ошибка пачки доходит до каждой задачи, и брокер ее повторит
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert create_event_for_users.labels.get("retry_on_error") is True
+
+    async def test_batch_groups_posts_by_author(self, followers_fixture):
+        author_id = followers_fixture["author_id"]
+        follower_ids = followers_fixture["follower_ids"]
+        other_id = follower_ids[0]
+        async for session in db_helper.session_getter():
+            # Автор подписан на одного из своих подписчиков
+            await session.execute(
+                text(
+                    "INSERT INTO follows (follower_id, followee_id, created_at, "
+                    "updated_at) VALUES (:author_id, :other_id, now(), now())"
+                ),
+                {"author_id": author_id, "other_id": other_id},
+            )
+            author_posts = await _create_posts(session, author_id, 2)
+            (other_post,) = await _create_posts(session, other_id, 1)
+
+        # Повторно доставленная задача схлопывается с первой
+        requests = [(author_id, post_id) for post_id in author_posts]
+        requests += [(other_id, other_post), (author_id, author_posts[0])]
+        report = await create_events_for_batch(requests)
+        assert (report.posts, report.authors) == (4, 2)
+        assert report.inserted == 2 * len(follower_ids) + 1
+
+        async for session in db_helper.session_getter():
+            feeds = await _get_feeds(session, [author_id, *follower_ids])
+            counters = await _get_counters(session, [author_id, *follower_ids])
+        assert feeds[author_id] == [other_post]
+        for follower_id in follower_ids:
+            assert feeds[follower_id] == author_posts[::-1]
+        assert counters == {author_id: 1, **{i: 2 for i in follower_ids}}
+
+
+@pytest.mark.asyncio
+class TestFanOutProgress:
+
+    async def test_fan_out_progress(self, client, reader_fixture):
+        headers = reader_fixture["headers"]
+        async for session in db_helper.session_getter():
+            post_id = await session.scalar(
+                text(
+                    "INSERT INTO posts (user_id, title, created_at, updated_at) "
+                    "VALUES (:user_id, 'fan-out', now(), now()) RETURNING id"
+                ),
+                {"user_id": reader_fixture["id"]},
+            )
+            repo = FeedRepository(session)
+            await repo.save_fanout_progress(
+                task_id=f"task-{post_id}",
+                author_id=reader_fixture["id"],
+                post_id=post_id,
+                chunks_total=3,
+            )
+            # Повтор выполненного диапазона не учитывается дважды
+            await repo.complete_fanout_chunk(f"task-{post_id}", 1)
+            await repo.complete_fanout_chunk(f"task-{post_id}", 1)
+
+        resp = await client.get(f"/api/feed/tasks/task-{post_id}", headers=headers)
+        assert resp.status_code == 200
+        progress = resp.json()
+        assert progress["chunks_total"] == 3
+        assert progress["chunks_done"] == 1
+        assert progress["done"] is False
+
+    async def test_parallel_fan_out_retry(self, followers_fixture, monkeypatch):
+        author_id = followers_fixture["author_id"]
+        follower_ids = followers_fixture["follower_ids"]
+        monkeypatch.setattr(settings.feed, "fanout_parallel_threshold", 3)
+        monkeypatch.setattr(settings.feed, "fanout_subtask_size", 2)
+        monkeypatch.setattr(settings.feed, "fanout_chunk_size", 1)
+
+        async for session in db_helper.session_getter():
+            (post_id,) = await _create_posts(session, author_id, 1)
+            repo = FeedRepository(session)
+            service = FeedService(repo, FollowsRepository(session))
+            task_id = f"task-{post_id}"
+
+            # Последний диапазон открыт справа
+            ranges = await service.plan_fan_out(task_id, author_id, post_id)
+            assert ranges == [
+                (0, follower_ids[1]),
+                (follower_ids[1], follower_ids[3]),
+                (follower_ids[3], None),
+            ]
+
+            # Второй диапазон падает после записи части новостей
+            create_events_chunk = repo.create_events_chunk
+            failures = []
+
+            async def flaky_chunk(**kwargs):
+                result = await create_events_chunk(**kwargs)
+                if kwargs["after_follower_id"] == follower_ids[2] and not failures:
+                    failures.append(kwargs)
+                    raise RuntimeError("worker lost")
+                return result
+
+            monkeypatch.setattr(repo, "create_events_chunk", flaky_chunk)
+            chunks = [
+                {
+                    "task_id": task_id,
+                    "chunk_no": chunk_no,
+                    "author_id": author_id,
+                    "post_id": post_id,
+                    "after_follower_id": after_follower_id,
+                    "upto_follower_id": upto_follower_id,
+                }
+                for chunk_no, (after_follower_id, upto_follower_id) in enumerate(
+                    ranges
+                )
+            ]
+            await create_event_chunk(feed_service=service, **chunks[0])
+            with pytest.raises(RuntimeError):
+                await create_event_chunk(feed_service=service, **chunks[1])
+            await create_event_chunk(feed_service=service, **chunks[2])
+
+            progress = await service.get_fan_out_progress(task_id, author_id)
+            assert (progress.chunks_done, progress.done) == (2, False)
+
+            # Повтор брокером дописывает диапазон без дублей
+            await create_event_chunk(feed_service=service, **chunks[1])
+            # Прогресс перечитывается из базы, а не из сессии
+            session.expire_all()
+            progress = await service.get_fan_out_progress(task_id, author_id)
+            assert (progress.chunks_total, progress.chunks_done) == (3, 3)
+            assert progress.done and not progress.pulled
+
+            feeds = await _get_feeds(session, follower_ids)
+            counters = await _get_counters(session, follower_ids)
+        assert feeds == {follower_id: [post_id] for follower_id in follower_ids}
+        assert counters == {follower_id: 1 for follower_id in follower_ids}
+
+    async def test_fan_out_progress_not_found(self, client, reader_fixture):
+        resp = await client.get(
+            "/api/feed/tasks/unknown-task", headers=reader_fixture["headers"]
+        )
+        assert resp.status_code == 404
+
+
+@pytest.mark.asyncio
+class TestCompactFeed:
+
+    async def test_compact_feed_matches_join_path(
+        self, client, feed_fixture, monkeypatch
+    ):
+        headers = feed_fixture["headers"]
+        params = {"limit": 10}
+
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        assert resp.status_code == 200
+        expected = resp.json()
+
+        monkeypatch.setattr(settings.feed, "compact_payloads", True)
+        # Первое чтение собирает готовые новости, второе отдает их как есть
+        for _ in range(2):
+            resp = await client.get("/api/feed", params=params, headers=headers)
+            assert resp.status_code == 200
+            assert resp.json() == expected
+
+    async def test_compact_feed_after_edits(self, client, feed_fixture, monkeypatch):
+        headers = feed_fixture["headers"]
+        params = {"limit": 10}
+        monkeypatch.setattr(settings.feed, "compact_payloads", True)
+
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        assert resp.status_code == 200
+        item = resp.json()["detail"][0]
+        post_id, author_id = item["post"]["id"], item["author"]["id"]
+
+        # Пост и автор меняются без фоновой задачи обновления новостей:
+        # устаревшая новость не отдается и собирается заново
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "UPDATE posts SET title = :title, updated_at = now() "
+                    "WHERE id = :id"
+                ),
+                {"title": "edited post", "id": post_id},
+            )
+            await session.commit()
+            await session.execute(
+                text(
+                    "UPDATE users SET username = :username, updated_at = now() "
+                    "WHERE id = :id"
+                ),
+                {"username": f"edited-{uuid.uuid4().hex[:8]}", "id": author_id},
+            )
+            await session.commit()
+
+        monkeypatch.setattr(settings.feed, "compact_payloads", False)
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        expected = resp.json()
+        assert expected["detail"][0]["post"]["title"] == "edited post"
+        assert expected["detail"][0]["author"]["username"].startswith("edited-")
+
+        monkeypatch.setattr(settings.feed, "compact_payloads", True)
+        for _ in range(2):
+            resp = await client.get("/api/feed", params=params, headers=headers)
+            assert resp.status_code == 200
+            assert resp.json() == expected
+
+
+@pytest.mark.asyncio
+class TestRankedFeed:
+
+    async def test_ranked_feed_order_and_cursor(self, client, feed_fixture):
+        headers = feed_fixture["headers"]
+        resp = await client.get("/api/feed", params={"limit": 50}, headers=headers)
+        new_ids = [item["post"]["id"] for item in resp.json()["detail"]]
+
+        # Голоса за два самых старых поста, рейтинг пересчитывает фоновая задача
+        voted = [new_ids[-1], new_ids[-2]]
+        async for session in db_helper.session_getter():
+            for post_id, score in zip(voted, (100, 5)):
+                await session.execute(
+                    text(
+                        "UPDATE posts SET score = :score, rank_dirty = true "
+                        "WHERE id = :post_id"
+                    ),
+                    {"score": score, "post_id": post_id},
+                )
+            await session.commit()
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            assert await service.refresh_rankings() >= 2
+
+        resp = await client.get(
+            "/api/feed", params={"sort": "top", "limit": 2}, headers=headers
+        )
+        assert resp.status_code == 200
+        assert [item["post"]["id"] for item in resp.json()["detail"]] == voted
+
+        # Посты без голосов опубликованы одновременно и идут от новых к старым
+        seen = []
+        params = {"sort": "hot", "limit": 10}
+        while True:
+            resp = await client.get("/api/feed", params=params, headers=headers)
+            assert resp.status_code == 200
+            body = resp.json()
+            seen += [item["post"]["id"] for item in body["detail"]]
+            if body["next_cursor"] is None:
+                break
+            params["cursor"] = body["next_cursor"]
+        assert seen == voted + new_ids[:-2]
+
+    async def test_ranked_feed_skips_hidden_post(self, client, feed_fixture):
+        headers = feed_fixture["headers"]
+        resp = await client.get("/api/feed", params={"limit": 50}, headers=headers)
+        detail = resp.json()["detail"]
+        new_ids = [item["post"]["id"] for item in detail]
+        author_id = detail[0]["author"]["id"]
+
+        hidden_id = new_ids[-1]
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "UPDATE posts SET score = 100, rank_dirty = true "
+                    "WHERE id = :post_id"
+                ),
+                {"post_id": hidden_id},
+            )
+            await session.commit()
+            service = FeedService(FeedRepository(session), FollowsRepository(session))
+            assert await service.refresh_rankings() >= 1
+
+        # Скрытый пост пропадает из ленты до того, как его удалит фоновая задача
+        async for session in db_helper.session_getter():
+            post_service = PostService(session, PostRepository(session))
+            await post_service.delete_post(author_id, hidden_id)
+
+        for sort in ("hot", "top"):
+            resp = await client.get(
+                "/api/feed", params={"sort": sort, "limit": 50}, headers=headers
+            )
+            assert resp.status_code == 200
+            post_ids = [item["post"]["id"] for item in resp.json()["detail"]]
+            assert post_ids == new_ids[:-1]
+
+
+@pytest.mark.asyncio
+class TestTrustedSerialization:
+
+    async def test_feed_matches_schema_path(self, client, feed_fixture, monkeypatch):
+        headers = feed_fixture["headers"]
+        params = {"limit": 50}
+
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        expected = await client.get("/api/feed", params=params, headers=headers)
+        monkeypatch.setattr(settings.api, "trusted_serialization", True)
+        actual = await client.get("/api/feed", params=params, headers=headers)
+
+        assert expected.status_code == actual.status_code == 200
+        assert len(actual.json()["detail"]) == 25
+        assert actual.json() == expected.json()
+
+
+@pytest.mark.asyncio
+class TestFeedETag:
+
+    async def test_feed_not_modified(self, client, feed_fixture):
+        headers = feed_fixture["headers"]
+        params = {"limit": 5}
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        etag = resp.headers["ETag"]
+        post_id = resp.json()["detail"][0]["post"]["id"]
+
+        conditional = {**headers, "If-None-Match": etag}
+        resp = await client.get("/api/feed", params=params, headers=conditional)
+        assert resp.status_code == 304 and resp.content == b""
+
+        # Другая страница - другой ETag
+        resp = await client.get(
+            "/api/feed", params={"limit": 6}, headers=conditional
+        )
+        assert resp.status_code == 200
+
+        # Изменение поста на странице меняет ETag
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "UPDATE posts SET updated_at = updated_at + interval '1 second' "
+                    "WHERE id = :id"
+                ),
+                {"id": post_id},
+            )
+            await session.commit()
+        resp = await client.get("/api/feed", params=params, headers=conditional)
+        assert resp.status_code == 200
+        assert resp.headers["ETag"] != etag
+
+    async def test_compact_feed_etag_after_edit(
+        self, client, feed_fixture, monkeypatch
+    ):
+        headers = feed_fixture["headers"]
+        params = {"limit": 5}
+        monkeypatch.setattr(settings.feed, "compact_payloads", True)
+        resp = await client.get("/api/feed", params=params, headers=headers)
+        etag = resp.headers["ETag"]
+        post_id = resp.json()["detail"][0]["post"]["id"]
+
+        # Фоновая задача еще не обновила готовую новость, но новый ETag
+        # отдается вместе с новыми данными поста
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "UPDATE posts SET title = :title, updated_at = now() "
+                    "WHERE id = :id"
+                ),
+                {"title": "edited post", "id": post_id},
+            )
+            await session.commit()
+        conditional = {**headers, "If-None-Match": etag}
+        resp = await client.get("/api/feed", params=params, headers=conditional)
+        assert resp.status_code == 200
+        assert resp.json()["detail"][0]["post"]["title"] == "edited post"
+        new_etag = resp.headers["ETag"]
+        assert new_etag != etag
+
+        conditional = {**headers, "If-None-Match": new_etag}
+        resp = await client.get("/api/feed", params=params, headers=conditional)
+        assert resp.status_code == 304
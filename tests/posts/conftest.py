@@ -0,0 +1,41 @@
+import uuid
+
+import pytest_asyncio
+from sqlalchemy import text
+
+from core import db_helper
+
+
+@pytest_asyncio.fixture(scope="function")
+async def author_fixture(client):
+    """Пользователь с 25 постами"""
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"author-{suffix}@example.com",
+        "password": "qwerty123",
+        "username": f"author-{suffix}",
+    }
+    resp = await client.post("/api/users/register", json=user_data)
+    assert resp.status_code == 201
+
+    resp = await client.post("/api/users/login", json=user_data)
+    assert resp.status_code == 200
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.get("/api/users/me", headers=headers)
+    assert resp.status_code == 200
+    user_id = resp.json()["id"]
+
+    # Посты создаются в разное время, последние два - одновременно
+    async for session in db_helper.session_getter():
+        await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) SELECT :user_id, 'post ' || g, 'text ' || g, "
+                "now() - least(25 - g, 23) * interval '1 minute', now() "
+                "FROM generate_series(1, 25) g"
+            ),
+            {"user_id": user_id},
+        )
+        await session.commit()
+    return {"id": user_id, "headers": headers}
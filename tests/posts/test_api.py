@@ -0,0 +1,273 @@
+import asyncio
+
+import pytest
+
+from api.posts import views
+from api.posts.cache import PostCache, LRUCacheBackend, post_cache
+from api.posts.front import front_page_snapshot
+from core import settings
+
+
+@pytest.mark.asyncio
+class TestPostsPagination:
+
+    async def test_posts_cursor_pagination(self, client, author_fixture):
+        headers = author_fixture["headers"]
+        params = {"limit": 10}
+        titles = []
+        while True:
+            resp = await client.get("/api/posts", params=params, headers=headers)
+            assert resp.status_code == 200
+            body = resp.json()
+            assert body["total_found"] == 25
+            titles += [post["title"] for post in body["detail"]]
+            if body["next_cursor"] is None:
+                break
+            params["cursor"] = body["next_cursor"]
+
+        # От новых к старым, одновременные посты - по убыванию id
+        assert titles == [f"post {g}" for g in range(25, 0, -1)]
+
+    async def test_posts_estimated_total(self, client, author_fixture, monkeypatch):
+        headers = author_fixture["headers"]
+        monkeypatch.setattr(settings.posts, "count_limit", 10)
+
+        resp = await client.get("/api/posts", headers=headers)
+        assert resp.json()["total_found"] == 10
+
+        resp = await client.get(
+            "/api/posts", params={"exact_count": True}, headers=headers
+        )
+        assert resp.json()["total_found"] == 25
+
+    async def test_posts_invalid_cursor(self, client, author_fixture):
+        resp = await client.get(
+            "/api/posts",
+            params={"cursor": "not-a-cursor"},
+            headers=author_fixture["headers"],
+        )
+        assert resp.status_code == 400
+
+    async def test_posts_match_schema_path(self, client, author_fixture, monkeypatch):
+        headers = author_fixture["headers"]
+        params = {"limit": 10}
+
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        expected = await client.get("/api/posts", params=params, headers=headers)
+        monkeypatch.setattr(settings.api, "trusted_serialization", True)
+        actual = await client.get("/api/posts", params=params, headers=headers)
+
+        assert expected.status_code == actual.status_code == 200
+        assert actual.json() == expected.json()
+        assert actual.json()["next_cursor"] is not None
+
+
+@pytest.mark.asyncio
+class TestPostsUpdate:
+
+    async def _get_post_id(self, client, headers, title: str) -> int:
+        resp = await client.get("/api/posts", params={"limit": 30}, headers=headers)
+        return next(p["id"] for p in resp.json()["detail"] if p["title"] == title)
+
+    async def test_update_post_keeps_own_title(self, client, author_fixture):
+        headers = author_fixture["headers"]
+        post_id = await self._get_post_id(client, headers, "post 1")
+
+        resp = await client.put(
+            f"/api/posts/{post_id}",
+            json={"title": "post 1", "description": "new text"},
+            headers=headers,
+        )
+        assert resp.status_code == 200
+        assert resp.json()["description"] == "new text"
+
+    async def test_update_post_title_conflict(self, client, author_fixture):
+        headers = author_fixture["headers"]
+        post_id = await self._get_post_id(client, headers, "post 1")
+
+        resp = await client.patch(
+            f"/api/posts/{post_id}", json={"title": "post 2"}, headers=headers
+        )
+        assert resp.status_code == 400
+
+        # После отката сессии пост остается прежним
+        resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+        assert resp.json()["title"] == "post 1"
+
+
+@pytest.mark.asyncio
+class TestPostsBatch:
+
+    async def test_create_posts_batch(self, client, author_fixture, monkeypatch):
+        sent = []
+
+        async def kiq(**kwargs):
+            sent.append(kwargs)
+
+        monkeypatch.setattr(views.create_events_for_posts, "kiq", kiq)
+        titles = ["post 3", "batch 1", "batch 2", "batch 1"]
+        resp = await client.post(
+            "/api/posts/batch",
+            json={"posts": [{"title": t, "description": None} for t in titles]},
+            headers=author_fixture["headers"],
+        )
+        assert resp.status_code == 201
+        body = resp.json()
+        assert [item["status"] for item in body["items"]] == [
+            "conflict",
+            "created",
+            "created",
+            "conflict",
+        ]
+        assert (body["created"], body["conflicts"]) == (2, 2)
+
+        # Одна задача рассылки на все созданные посты
+        post_ids = [item["post_id"] for item in body["items"] if item["post_id"]]
+        assert sent == [{"author_id": author_fixture["id"], "post_ids": post_ids}]
+        assert "task_id" not in body
+
+    async def test_create_posts_batch_limits(self, client, author_fixture):
+        resp = await client.post(
+            "/api/posts/batch", json={"posts": []}, headers=author_fixture["headers"]
+        )
+        assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+class TestPostCache:
+
+    async def test_post_cache_invalidated_on_update(
+        self, client, author_fixture, monkeypatch
+    ):
+        async def kiq(**kwargs):
+            return None
+
+        monkeypatch.setattr(views.retract_post_events, "kiq", kiq)
+        headers = author_fixture["headers"]
+        resp = await client.get("/api/posts", params={"limit": 1}, headers=headers)
+        post_id = resp.json()["detail"][0]["id"]
+
+        hits = post_cache.hits
+        for _ in range(2):
+            resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+            assert resp.json()["description"] == "text 25"
+        assert post_cache.hits == hits + 1
+
+        resp = await client.patch(
+            f"/api/posts/{post_id}", json={"description": "edited"}, headers=headers
+        )
+        assert resp.status_code == 200
+        resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+        assert resp.json()["description"] == "edited"
+
+        resp = await client.delete(f"/api/posts/{post_id}", headers=headers)
+        resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+        assert resp.status_code == 404
+
+    async def test_post_cache_coalesces_misses(self):
+        cache = PostCache(LRUCacheBackend(max_entries=1, ttl=60))
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.01)
+            return b"{}"
+
+        results = await asyncio.gather(
+            *(cache.get_or_load("a", load) for _ in range(5))
+        )
+        assert results == [b"{}"] * 5
+        assert (len(loads), cache.misses, cache.coalesced) == (1, 1, 4)
+
+        await cache.get_or_load("b", load)
+        assert cache.stats().evictions == 1
+
+
+@pytest.mark.asyncio
+class TestFrontPage:
+
+    async def _walk(self, client, headers) -> list[int]:
+        post_ids, params = [], {"limit": 7}
+        while True:
+            resp = await client.get("/api/posts/front", params=params, headers=headers)
+            assert resp.status_code == 200
+            body = resp.json()
+            post_ids += [item["post"]["id"] for item in body["detail"]]
+            if body["next_cursor"] is None:
+                return post_ids
+            params["cursor"] = body["next_cursor"]
+
+    async def test_front_page_beyond_snapshot(
+        self, client, author_fixture, monkeypatch
+    ):
+        headers = author_fixture["headers"]
+        front_page_snapshot.invalidate()
+        from_snapshot = await self._walk(client, headers)
+
+        # Снимок меньше ленты: глубокие страницы читаются из базы
+        monkeypatch.setattr(front_page_snapshot, "size", 10)
+        front_page_snapshot.invalidate()
+        mixed = await self._walk(client, headers)
+
+        assert mixed == from_snapshot
+        assert len(set(mixed)) == len(mixed) >= 25
+
+    async def test_front_page_match_schema_path(
+        self, client, author_fixture, monkeypatch
+    ):
+        headers = author_fixture["headers"]
+        front_page_snapshot.invalidate()
+
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        expected = await client.get("/api/posts/front", headers=headers)
+        monkeypatch.setattr(settings.api, "trusted_serialization", True)
+        actual = await client.get("/api/posts/front", headers=headers)
+
+        assert expected.status_code == actual.status_code == 200
+        assert actual.json() == expected.json()
+        assert actual.json()["detail"][0]["author"]["id"] == author_fixture["id"]
+
+    async def test_front_page_after_update(self, client, author_fixture):
+        headers = author_fixture["headers"]
+        front_page_snapshot.invalidate()
+        resp = await client.get("/api/posts/front", headers=headers)
+        post_id = resp.json()["detail"][0]["post"]["id"]
+
+        resp = await client.patch(
+            f"/api/posts/{post_id}", json={"title": "edited"}, headers=headers
+        )
+        assert resp.status_code == 200
+
+        resp = await client.get("/api/posts/front", headers=headers)
+        assert resp.json()["detail"][0]["post"]["title"] == "edited"
+
+@pytest.mark.asyncio
+class TestPostsETag:
+
+    async def test_post_not_modified(self, client, author_fixture, monkeypatch):
+        headers = author_fixture["headers"]
+        resp = await client.get("/api/posts", params={"limit": 1}, headers=headers)
+        post_id = resp.json()["detail"][0]["id"]
+
+        resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+        etag = resp.headers["ETag"]
+        resp = await client.get(
+            f"/api/posts/{post_id}", headers={**headers, "If-None-Match": etag}
+        )
+        assert resp.status_code == 304 and resp.content == b""
+
+        # Путь через схемы дает тот же ETag
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        resp = await client.get(f"/api/posts/{post_id}", headers=headers)
+        assert resp.headers["ETag"] == etag
+        monkeypatch.setattr(settings.api, "trusted_serialization", True)
+
+        await client.patch(
+            f"/api/posts/{post_id}", json={"description": "etag"}, headers=headers
+        )
+        resp = await client.get(
+            f"/api/posts/{post_id}", headers={**headers, "If-None-Match": etag}
+        )
+        assert resp.status_code == 200
+        assert resp.json()["description"] == "etag"
+        assert resp.headers["ETag"] != etag
@@ -0,0 +1,61 @@
+import uuid
+
+import pytest_asyncio
+from sqlalchemy import text
+
+from api.search import repository
+from api.search.index import SearchIndex, SearchIndexWriter
+from api.tasks import search_tasks
+from core import db_helper, settings
+
+
+@pytest_asyncio.fixture(scope="function")
+async def search_fixture():
+    """
+    Посты со словом, которого нет в других тестах: в названии,
+    в описании, в скрытом посте - и пост без него
+    """
+    suffix = uuid.uuid4().hex[:8]
+    word = "".join(chr(ord("a") + int(char, 16)) for char in suffix)
+    async for session in db_helper.session_getter():
+        author_id = await session.scalar(
+            text(
+                "INSERT INTO users (username, email, is_active, is_superuser, "
+                "created_at, updated_at) VALUES (:username, :email, true, false, "
+                "now(), now()) RETURNING id"
+            ),
+            {
+                "username": f"searcher-{suffix}",
+                "email": f"searcher-{suffix}@example.com",
+            },
+        )
+        res = await session.execute(
+            text(
+                "INSERT INTO posts (user_id, title, description, is_hidden, "
+                "created_at, updated_at) VALUES "
+                "(:author_id, :word || ' в названии', 'описание', false, "
+                "now(), now()), "
+                "(:author_id, 'заголовок', 'про ' || :word || ' в описании', false, "
+                "now(), now()), "
+                "(:author_id, :word || ' скрытый', NULL, true, now(), now()), "
+                "(:author_id, 'другой пост', NULL, false, now(), now()) "
+                "RETURNING id"
+            ),
+            {"author_id": author_id, "word": word},
+        )
+        await session.commit()
+    return {"word": word, "post_ids": list(res.scalars())}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def embedded_index(tmp_path, monkeypatch, search_fixture):
+    """Встроенный индекс в отдельном каталоге, построенный по постам базы"""
+    monkeypatch.setattr(settings.search, "backend", "embedded")
+    index = SearchIndex(tmp_path, refresh=0, k1=1.2, b=0.75)
+    writer = SearchIndexWriter(tmp_path, title_weight=3, max_segments=16)
+    monkeypatch.setattr(repository, "search_index", index)
+    monkeypatch.setattr(search_tasks, "search_index_writer", writer)
+
+    async for session in db_helper.session_getter():
+        await search_tasks.rebuild_index(session, writer)
+    return {**search_fixture, "index": index}
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import text
+
+from api.search.index import SearchIndex
+from api.tasks.search_tasks import update_search_index, merge_search_index
+from core import settings, db_helper
+
+
+@pytest.mark.asyncio
+class TestSearchPosts:
+
+    async def test_search_ranking_and_cursor(self, client, search_fixture):
+        word = search_fixture["word"]
+        title_id, description_id, *_ = search_fixture["post_ids"]
+
+        resp = await client.get("/api/search/posts", params={"q": word})
+        assert resp.status_code == 200
+        body = resp.json()
+        # Совпадение в названии весит больше, скрытый пост не находится
+        assert [hit["post"]["id"] for hit in body["detail"]] == [
+            title_id,
+            description_id,
+        ]
+        assert body["total_found"] == 2
+        assert body["detail"][0]["rank"] > body["detail"][1]["rank"]
+
+        params = {"q": word, "limit": 1}
+        seen = []
+        while True:
+            body = (await client.get("/api/search/posts", params=params)).json()
+            seen += [hit["post"]["id"] for hit in body["detail"]]
+            if body["next_cursor"] is None:
+                break
+            params["cursor"] = body["next_cursor"]
+        assert seen == [title_id, description_id]
+
+    async def test_search_query_syntax(self, client, search_fixture, monkeypatch):
+        word = search_fixture["word"]
+        title_id = search_fixture["post_ids"][0]
+
+        monkeypatch.setattr(settings.api, "trusted_serialization", False)
+        resp = await client.get(
+            "/api/search/posts", params={"q": f"{word} -заголовок"}
+        )
+        assert [hit["post"]["id"] for hit in resp.json()["detail"]] == [title_id]
+
+        # Запрос из одних стоп-слов ничего не находит
+        resp = await client.get("/api/search/posts", params={"q": "и в"})
+        assert resp.status_code == 200 and resp.json()["total_found"] == 0
+
+        resp = await client.get("/api/search/posts", params={"q": ""})
+        assert resp.status_code == 422
+
+
+@pytest.mark.asyncio
+class TestEmbeddedSearch:
+
+    async def test_embedded_ranking_and_cursor(self, client, embedded_index):
+        word = embedded_index["word"]
+        title_id, description_id, *_ = embedded_index["post_ids"]
+
+        params = {"q": word, "limit": 1}
+        seen, ranks = [], []
+        while True:
+            body = (await client.get("/api/search/posts", params=params)).json()
+            assert body["total_found"] == 2
+            seen += [hit["post"]["id"] for hit in body["detail"]]
+            ranks += [hit["rank"] for hit in body["detail"]]
+            if body["next_cursor"] is None:
+                break
+            params["cursor"] = body["next_cursor"]
+        # Совпадение в названии весит больше, скрытый пост не находится
+        assert seen == [title_id, description_id]
+        assert ranks[0] > ranks[1]
+
+    async def test_embedded_incremental_update(self, client, embedded_index):
+        word = embedded_index["word"]
+        title_id, description_id, hidden_id, other_id = embedded_index["post_ids"]
+
+        async for session in db_helper.session_getter():
+            await session.execute(
+                text(
+                    "UPDATE posts SET is_hidden = (id = :title_id), "
+                    "title = CASE WHEN id = :other_id THEN :word ELSE title END "
+                    "WHERE id IN (:title_id, :other_id)"
+                ),
+                {"title_id": title_id, "other_id": other_id, "word": word},
+            )
+            await session.commit()
+        await update_search_index(post_ids=[title_id, other_id])
+
+        async def found() -> list[int]:
+            resp = await client.get("/api/search/posts", params={"q": word})
+            return [hit["post"]["id"] for hit in resp.json()["detail"]]
+
+        assert await found() == [other_id, description_id]
+
+        # После слияния новый процесс открывает индекс из одного сегмента
+        await merge_search_index()
+        index = SearchIndex(embedded_index["index"].directory, 0, k1=1.2, b=0.75)
+        assert len(index.snapshot().segments) == 1
+        assert await found() == [other_id, description_id]
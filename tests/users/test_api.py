@@ -17,6 +17,37 @@ class TestUserRegister:
         return user_data
 
 
+@pytest.mark.asyncio
+class TestUserUpdate:
+
+    async def _register(self, client, username: str) -> dict:
+        user_data = {
+            "email": f"{username}@example.com",
+            "password": "qwerty123",
+            "username": username,
+        }
+        resp = await client.post("/api/users/register", json=user_data)
+        assert resp.status_code == 201
+        resp = await client.post("/api/users/login", json=user_data)
+        return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    async def test_user_update_username(self, client):
+        headers = await self._register(client, "update-first")
+        await self._register(client, "update-second")
+
+        resp = await client.patch(
+            "/api/users/me", json={"username": "update-second"}, headers=headers
+        )
+        assert resp.status_code == 400
+
+        resp = await client.patch(
+            "/api/users/me", json={"username": "update-third"}, headers=headers
+        )
+        assert resp.status_code == 200
+        assert resp.json()["username"] == "update-third"
+        assert resp.json()["updated_at"] > resp.json()["created_at"]
+
+
 # @pytest.mark.asyncio
 # class TestUserLogin:
 #     pass
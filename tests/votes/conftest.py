@@ -0,0 +1,41 @@
+import uuid
+
+import pytest_asyncio
+from sqlalchemy import text
+
+from core import db_helper
+
+
+async def _register(client) -> dict:
+    suffix = uuid.uuid4().hex[:8]
+    user_data = {
+        "email": f"voter-{suffix}@example.com",
+        "password": "qwerty123",
+        "username": f"voter-{suffix}",
+    }
+    resp = await client.post("/api/users/register", json=user_data)
+    assert resp.status_code == 201
+
+    resp = await client.post("/api/users/login", json=user_data)
+    assert resp.status_code == 200
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    resp = await client.get("/api/users/me", headers=headers)
+    return {"id": resp.json()["id"], "headers": headers}
+
+
+@pytest_asyncio.fixture(scope="function")
+async def voters_fixture(client):
+    """Два голосующих пользователя и пост первого из них"""
+    voters = [await _register(client), await _register(client)]
+    async for session in db_helper.session_getter():
+        post_id = await session.scalar(
+            text(
+                "INSERT INTO posts (user_id, title, description, created_at, "
+                "updated_at) VALUES (:user_id, 'voted post', NULL, now(), now()) "
+                "RETURNING id"
+            ),
+            {"user_id": voters[0]["id"]},
+        )
+        await session.commit()
+    return {"voters": voters, "post_id": post_id}
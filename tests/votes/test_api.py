@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import text
+
+from api.votes.buffer import vote_buffer
+from core import db_helper
+
+
+async def _get_post_counters(post_id: int) -> tuple:
+    async for session in db_helper.session_getter():
+        res = await session.execute(
+            text(
+                "SELECT score, upvotes, downvotes, rank_dirty FROM posts WHERE id = :id"
+            ),
+            {"id": post_id},
+        )
+        return tuple(res.one())
+
+
+@pytest.mark.asyncio
+class TestVotes:
+
+    async def test_votes_flushed_in_batch(self, client, voters_fixture):
+        post_id = voters_fixture["post_id"]
+        first, second = voters_fixture["voters"]
+        url = f"/api/posts/{post_id}/vote"
+
+        resp = await client.put(url, json={"value": 1}, headers=first["headers"])
+        assert resp.json() == {"post_id": post_id, "value": 1, "previous": 0}
+        await client.put(url, json={"value": -1}, headers=second["headers"])
+        resp = await client.put(url, json={"value": -1}, headers=first["headers"])
+        assert resp.json()["previous"] == 1
+
+        # До записи буфера счет поста не меняется
+        assert await _get_post_counters(post_id) == (0, 0, 0, False)
+        assert vote_buffer.stats().pending_votes >= 3
+
+        await vote_buffer.flush()
+        assert await _get_post_counters(post_id) == (-2, 0, 2, True)
+        assert vote_buffer.stats().pending_votes == 0
+
+    async def test_vote_validation(self, client, voters_fixture):
+        headers = voters_fixture["voters"][0]["headers"]
+        resp = await client.put(
+            "/api/posts/0/vote", json={"value": 1}, headers=headers
+        )
+        assert resp.status_code == 404
+
+        resp = await client.put(
+            f"/api/posts/{voters_fixture['post_id']}/vote",
+            json={"value": 2},
+            headers=headers,
+        )
+        assert resp.status_code == 422